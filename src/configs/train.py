@@ -10,6 +10,17 @@ class TrainPipelineConfig(TrainPipelineConfig_):
 
     Attributes:
         input_keys: List of keys of input features to be used for the policy.
+        action_chunks: If True, the action chunks of the samples are served from the precomputed store of the dataset
+                       (seeing `src/scripts/data/build_action_chunks.py`) instead of being queried from its parquet rows.
+        action_transform: If set (e.g. 'ee_delta_gripper'), the actions of a dataset converted with absolute actions ('ee_absolute')
+                          are transformed on the fly in the dataloader workers (seeing `src/data/misc/relative.py`).
     """
     
     input_keys: list[str] = None
+    action_chunks: bool = False
+    action_transform: str | None = None
+
+    def validate(self):
+        super().validate()
+        if self.action_chunks and self.action_transform is not None:
+            raise ValueError('`action_chunks` serves the stored actions, it cannot be combined with `action_transform`')
@@ -2,6 +2,8 @@ import math
 from dataclasses import dataclass, field
 from typing import List, Optional
 
+from .misc.imu import IMU_KEYS
+
 
 @dataclass
 class DataProcessorConfig:
@@ -10,45 +12,135 @@ class DataProcessorConfig:
 
     Attributes:
         overwrite: If True, existing data in the specified root directory will be overwritten.
-        check_only: If True, only checks the configuration without creating a dataset.
-        source_data_roots: List of source data directories to process.
+        incremental: If True, the existing dataset is kept and only source episodes that are new since the last run
+                     (according to the conversion manifest of the dataset) are appended to it. Episodes that changed since
+                     they were converted are reported and skipped, as appending them would duplicate their previous episode.
+                     Interrupted runs are resumed by running again. Every conversion records its source episodes in the manifest,
+                     datasets with episodes missing from it (e.g. merged with `src/scripts/data/merge_datasets.py`) are refused.
+        check_only: If True, only validates the source episodes without creating a dataset
+                    (for Pika data, a parallel scan of the directory listings, seeing `src/data/misc/validate.py`).
+        check_workers: Number of threads scanning episodes in `check_only` mode.
+        check_max_gap: Maximum time in seconds between consecutive frames of a topic in `check_only` mode.
+        check_min_rate_ratio: Minimum rate of every topic as a fraction of `fps` in `check_only` mode.
+        check_report_path: Path of the JSON lines report written in `check_only` mode (if None, only a summary is printed).
+        source_data_roots: List of source data directories to process, or uncompressed tar / zip archives of them.
+                           Directories may also hold one archive per episode (`episode0.tar`, ...), read without extraction.
         image_height: Height of the camera frames.
         image_width: Width of the camera frames.
+        image_decoder: Backend decoding the camera frames ('imageio', 'opencv', 'turbojpeg' or 'auto' to pick the fastest).
+                       Frames larger than (image_height, image_width) are decoded at reduced size and resized to it.
         rgb_dirs: List of directories containing RGB images.
         rgb_names: List of names for RGB images in the dataset.
         use_depth: If True, depth images will be included in the dataset.
         depth_dirs: List of directories containing depth images (if applicable).
         depth_names: List of names for depth images in the dataset (if applicable).
+        depth_storage: How depth images are stored, one of 'parquet' (raw uint16 features), 'ffv1' (lossless 16-bit videos)
+                       or 'chunked' (compressed arrays), the latter two outside of the LeRobot features
+                       (seeing `src/data/misc/depth.py` for details).
+        depth_frames_per_chunk: Number of depth frames compressed together with `depth_storage` 'chunked'
+                                (larger chunks favor sequential over random reads).
         action_name: Name of the action data field.
         action_dirs: List of directories containing action data.
         action_keys_list: List of action keys for each arm.
         position_nonoop_threshold: Threshold for considering a position action as a noop.
         rotation_nonoop_threshold: Threshold for considering a rotation action as a noop.
         gripper_nonoop_threshold: Threshold for considering a gripper action as a noop.
+        nonoop_filter: How noop frames are filtered out, 'keyframe' (compare to the last kept frame),
+                       'pairwise' (compare to the previous frame) or 'none'.
+        trim_idle: If True, the leading and trailing segments of an episode where no arm moves faster than the idle velocity
+                   thresholds are cut before any image is decoded (seeing `trim_idle` in `src/data/misc/filters.py`).
+        idle_position_velocity: Threshold on the speed of a position for trimming idle segments, in meters per second.
+        idle_rotation_velocity: Threshold on the angular speed of a rotation for trimming idle segments, in radians per second.
+        idle_gripper_velocity: Threshold on the speed of a gripper for trimming idle segments, in gripper units per second.
+        idle_min_active_frames: Number of consecutive moving frames that start or end the motion (hysteresis against noise spikes).
+        idle_margin: Duration in seconds of the idle frames kept before the start and after the end of the motion.
         transform_type: Type of transformation to apply to actions (e.g., 'absolute', 'delta_base', 'delta_gripper').
+        extra_transform_types: Additional action transforms converted in the same pass, each into its own dataset `<repo_id>_<transform_type>`
+                               which shares the videos, depth and IMU files of the dataset and differs only in its action column
+                               (seeing `src/data/misc/variants.py`).
+        variant_link_mode: How the variant datasets share the files of the dataset, 'link' (hard links) or 'copy'.
         use_state: If True, state information will be included in the dataset.
         state_name: Name of the state data field (if applicable).
+        use_imu: If True, the IMU topics are included in the dataset.
+        imu_name: Name of the IMU data field (if applicable).
+        imu_dirs: List of directories containing IMU data (if applicable).
+        imu_keys: List of (flattened) IMU keys of each IMU topic, e.g. 'angular_velocity.x'.
+        imu_resample: How the high-rate IMU samples are aligned to the frames, 'mean' (mean of the samples since the previous frame),
+                      'last' (last sample), 'stack' (last `imu_num_samples` samples) or 'native' (kept at their native rate
+                      in a per-episode side table instead of a feature, seeing `src/data/misc/imu.py` for details).
+        imu_num_samples: Number of stacked IMU samples per frame with `imu_resample` 'stack'.
+        sync_method: How topics of different lengths are aligned, 'auto' (match by filename timestamps only if lengths differ),
+                     'nearest' / 'previous' (always match to the nearest / previous sample), 'none' (require equal lengths)
+                     or 'interpolate' (resample the episode to `fps`: image frames are matched to the nearest tick and
+                     action topics are interpolated at every tick, linearly and by SLERP for roll / pitch / yaw).
+        sync_reference: Topic directory used as the reference clock (if None, a clock at `fps` over the shared time span).
+        sync_max_skew: Maximum time difference in seconds between a reference tick and its matched samples,
+                       ticks exceeding it in any topic are dropped.
+        use_json_cache: If True, per-frame JSON topics are read through a columnar sidecar cache of each episode.
+        json_cache_root: Directory of the sidecar caches (if None, the cache is written inside each episode directory).
+        use_source_index: If True, episodes and the frames of their topics are listed from a parquet index of every source root,
+                          updated incrementally (seeing `src/data/misc/index.py`).
+        source_index_root: Directory of the source indexes (if None, the index is written inside each source root).
+        source_index_refresh: If True, topic directories changed since they were indexed are listed again, and new episodes
+                              are added. If False, an existing index is trusted as it is, without touching the source roots.
         instruction_path: Path to the instruction file.
         default_instruction: Default instruction to use if none is provided.
         repo_id: Save repository ID for the dataset.
         data_root: Save root directory for storing the dataset.
-        fps: Frames per second for the video.
+        fps: Frames per second for the video (source frames are only resampled to it by the timestamp based `sync_method`s).
         video_backend: Backend to use for video processing (e.g., 'opencv', 'ffmpeg').
+        prefetch_threads: Number of threads decoding frames ahead of the dataset writer (0 decodes synchronously).
+        prefetch_depth: Maximum number of frames decoded ahead of the dataset writer, and waiting in the asynchronous
+                        image writer, which bounds the memory used by a conversion regardless of the episode length.
+        prefetch_max_mb: Memory cap in MB of the frames decoded ahead of the dataset writer.
+        image_writer_threads: Number of threads of the LeRobot asynchronous image writer (0 writes images synchronously).
+        stream_video: If True, camera frames are piped straight into one video encoder per camera while the episode is added,
+                      instead of being written as temporary PNG images and encoded when the episode is saved
+                      (only the few frames sampled for the episode statistics are written). Requires LeRobot v2.1.
+        encoding_workers: Number of background processes encoding the videos of saved episodes, one job per camera,
+                          while the next episodes are added (0 encodes them in `save_episode`). Requires LeRobot v2.1.
+        max_encoding_episodes: Maximum number of saved episodes whose videos are being encoded at a time.
+        num_workers: Number of worker processes converting episodes in parallel, each into its own shard
+                     which is merged into the final dataset at the end (1 means sequential conversion).
+        action_chunk_size: If > 0, the action chunks of every frame (`action_chunk_size` actions starting at offset `action_chunk_start`)
+                           are precomputed into memory-mapped arrays after the conversion, for training with `ActionChunkDataset`
+                           (seeing `src/data/misc/chunks.py`). It should match the `action_delta_indices` of the policy,
+                           e.g. `chunk_size` for ACT, or `horizon` with `action_chunk_start` = 1 - `n_obs_steps` for diffusion.
+        action_chunk_start: Offset of the first action of a chunk, relative to the frame.
+        profile: If True, the stages of the conversion (listing, JSON parsing, decoding, transforms, `add_frame`, `save_episode`, ...)
+                 are timed and counted per episode and per run, and a summary is printed at the end
+                 (seeing `src/data/misc/profiling.py`). Sampling profilers such as py-spy can be attached to the run as well.
+        profile_path: Path of the exported profile, JSON or CSV (if it ends with '.csv'), if `profile` is True.
+        profile_cprofile_path: Path of the cProfile stats of the run (one file per worker with `num_workers` > 1), if `profile` is True.
+        shard_index: Index of the job shard converted by this process, when the episodes are split over `num_shards` jobs
+                     (e.g. on several nodes), each converting a contiguous part of the episode list into its own dataset
+                     to be merged with `src/scripts/data/merge_datasets.py`.
+        num_shards: Number of job shards the episodes are split over (1 converts all episodes).
+                    Shards are contiguous parts of the current episode list, whose boundaries move when episodes are added,
+                    so sharded jobs can not be `incremental`: convert new episodes into new shards, or without sharding.
     """
 
     overwrite: bool = True
+    incremental: bool = False
     check_only: bool = False
+    check_workers: int = 16
+    check_max_gap: float = 0.1
+    check_min_rate_ratio: float = 0.9
+    check_report_path: Optional[str] = None
 
     source_data_roots: List[str] = field(default_factory=lambda: [])
 
     image_height: int = 480
     image_width: int = 640
+    image_decoder: str = 'imageio'
     rgb_dirs: List[str] = field(default_factory=lambda: [])
     rgb_names: List[str] = field(default_factory=lambda: [])
 
     use_depth: bool = False
     depth_dirs: List[str] = field(default_factory=lambda: [])
     depth_names: List[str] = field(default_factory=lambda: [])
+    depth_storage: str = 'parquet'
+    depth_frames_per_chunk: int = 1
 
     action_name: str = 'action'
     action_dirs: List[str] = field(default_factory=lambda: [])
@@ -57,11 +149,37 @@ class DataProcessorConfig:
     position_nonoop_threshold: float = 1e-3
     rotation_nonoop_threshold: float = math.radians(1.0)
     gripper_nonoop_threshold: float = 1e-2
+    nonoop_filter: str = 'keyframe'
+    trim_idle: bool = False
+    idle_position_velocity: float = 0.02
+    idle_rotation_velocity: float = math.radians(5.0)
+    idle_gripper_velocity: float = 0.1
+    idle_min_active_frames: int = 5
+    idle_margin: float = 0.5
     transform_type: str = 'ee_absolute'
+    extra_transform_types: List[str] = field(default_factory=list)
+    variant_link_mode: str = 'link'
 
     use_state: bool = False
     state_name: str = 'observation.state'
 
+    use_imu: bool = False
+    imu_name: str = 'observation.imu'
+    imu_dirs: List[str] = field(default_factory=lambda: [])
+    imu_keys: List[str] = field(default_factory=lambda: list(IMU_KEYS))
+    imu_resample: str = 'mean'
+    imu_num_samples: int = 5
+
+    sync_method: str = 'auto'
+    sync_reference: Optional[str] = None
+    sync_max_skew: float = 0.05
+
+    use_json_cache: bool = False
+    json_cache_root: Optional[str] = None
+    use_source_index: bool = False
+    source_index_root: Optional[str] = None
+    source_index_refresh: bool = True
+
     instruction_path: str = 'instructions.json'
     default_instruction: str = 'do something'
 
@@ -70,8 +188,30 @@ class DataProcessorConfig:
     fps: int = 30
     video_backend: str = 'pyav'
 
+    prefetch_threads: int = 0
+    prefetch_depth: int = 16
+    prefetch_max_mb: int = 1024
+    image_writer_threads: int = 0
+    stream_video: bool = False
+    encoding_workers: int = 0
+    max_encoding_episodes: int = 2
+
+    action_chunk_size: int = 0
+    action_chunk_start: int = 0
+
+    profile: bool = False
+    profile_path: Optional[str] = None
+    profile_cprofile_path: Optional[str] = None
+
+    num_workers: int = 1
+    shard_index: int = 0
+    num_shards: int = 1
+
     def __post_init__(self):
         self.action_len = sum(len(keys) for keys in self.action_keys_list)
+        if self.incremental and self.num_shards > 1:
+            raise ValueError('`incremental` can not be used with `num_shards` > 1: shard boundaries move when episodes '
+                             'are added, so episodes would be converted again into another shard.')
 
 
 @dataclass
@@ -99,6 +239,9 @@ class RGBSingleArmDataProcessorConfig(DataProcessorConfig):
         ['x', 'y', 'z', 'roll', 'pitch', 'yaw'],
         ['angle'],
     ])
+    imu_dirs: List[str] = field(default_factory=lambda: [
+        'imu/9axis/pika_l',
+    ])
     transform_type: str = 'ee_delta_gripper'
 
 
@@ -135,6 +278,10 @@ class RGBMultiArmDataProcessorConfig(DataProcessorConfig):
         ['x', 'y', 'z', 'roll', 'pitch', 'yaw'],
         ['angle'],
     ])
+    imu_dirs: List[str] = field(default_factory=lambda: [
+        'imu/9axis/pika_l',
+        'imu/9axis/pika_r',
+    ])
     transform_type: str = 'ee_delta_gripper'
 
 
@@ -1,8 +1,14 @@
+import dataclasses
+import functools
 import itertools
+import multiprocessing
 import os
 import numpy as np
 import shutil
+import sys
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
 try:
@@ -15,14 +21,60 @@ except:
     _LEROBOT_VERSION = '2.0'
 
 from .configuration_data_processor import DataProcessorConfig
-from .misc.images import load_image
+from .misc.chunks import write_action_chunks
+from .misc.depth import create_depth_info, open_depth_writer
+from .misc.filters import select_keyframes, trim_idle
+from .misc.imu import get_imu_names, get_imu_path, resample_imu, write_imu_table
+from .misc.manifest import ConversionManifest, remove_partial_episodes
+from .misc.layout import INFO_PATH
+from .misc.merge import merge_datasets, reconcile_episodes_meta
+from .misc.prefetch import FramePrefetcher
+from .misc.profiling import StageProfiler
 from .misc.transforms import get_transform
+from .misc.variants import build_variant_dataset, get_variant_actions_path, get_variant_root, write_variant_actions
+from .misc.video import AsyncEpisodeEncoder, VideoStreamEncoder, encode_missing_videos
 
 
 def get_lerobot_default_root():
     return os.path.expanduser('~/.cache/huggingface/lerobot')
 
 
+def select_shard(episode_paths, shard_index, num_shards):
+    """
+    Select the contiguous part of the episodes converted by a job shard, so that merging the shards in order
+    gives the same episode order as converting all episodes at once.
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f'Shard index {shard_index} is out of range for {num_shards} shards.')
+    shard_indices = np.array_split(np.arange(len(episode_paths)), num_shards)[shard_index]
+    return [episode_paths[i] for i in shard_indices]
+
+
+def _convert_shard(processor_cls, config, episode_paths):
+    """
+    Convert a list of episodes into a standalone shard dataset, run inside a worker process.
+    """
+    start_time = time.perf_counter()
+    processor = processor_cls(config)
+    episode_indices = []
+    for episode_path in episode_paths:
+        episode_index = processor.dataset.meta.total_episodes
+        processor.profiler.start_episode(episode_path)
+        processor._add_episode(episode_path)
+        processor.profiler.end_episode()
+        episode_indices.append(episode_index if processor.dataset.meta.total_episodes > episode_index else None)
+    processor._finish_video_encoding()
+    processor.profiler.close()
+    return {
+        'root': str(processor.dataset.root),
+        'episode_indices': episode_indices,
+        'num_episodes': len(episode_paths),
+        'num_frames': processor.dataset.meta.total_frames,
+        'elapsed': time.perf_counter() - start_time,
+        'profile': processor.profiler.to_dict() if processor.profiler.enabled else None,
+    }
+
+
 class DummyDataProcessor(object):
     """
     A dummy data processor for creating a LeRobot dataset with dummy data.
@@ -54,10 +106,15 @@ class DummyDataProcessor(object):
 
     def __init__(self, config: DataProcessorConfig):
         self.config = config
+        self.profiler = StageProfiler(self.config.profile, self.config.profile_cprofile_path)
+        self.manifest = None
+        self.video_encoder = None
+        self.depth_info = None
 
-        if self.config.overwrite:
+        if self.config.overwrite and not self.config.incremental:
             if self.config.data_root is not None:
-                data_root = self.config.data_root
+                # only the dataset itself, other datasets (e.g. job shards) may share the data root
+                data_root = os.path.join(self.config.data_root, self.config.repo_id)
                 if os.path.exists(data_root):
                     print(f'Overwriting data root: {data_root}? (y/n)', end=' ')
                     if input().strip().lower() != 'y':
@@ -75,6 +132,8 @@ class DummyDataProcessor(object):
                     shutil.rmtree(data_root, ignore_errors=True)
         
         self.transform = get_transform(self.config.transform_type, self.config.action_len > 7)
+        self.extra_transforms = {transform_type: get_transform(transform_type, self.config.action_len > 7)
+                                 for transform_type in self.config.extra_transform_types}
         self.create_dataset()
 
     def create_dataset(self):
@@ -102,7 +161,16 @@ class DummyDataProcessor(object):
                 'names': action_keys_flatten,
             }
 
-        if self.config.use_depth:
+        if self.config.use_imu and self.config.imu_resample != 'native':
+            imu_names = get_imu_names(self.config.imu_dirs, self.config.imu_keys, 
+                                      self.config.imu_resample, self.config.imu_num_samples)
+            features[self.config.imu_name] = {
+                'dtype': 'float64',
+                'shape': (len(imu_names),),
+                'names': imu_names,
+            }
+
+        if self.config.use_depth and self.config.depth_storage == 'parquet':
             depth_config = {
                 'dtype': 'uint16',
                 'shape': (self.config.image_height, self.config.image_width),
@@ -114,72 +182,476 @@ class DummyDataProcessor(object):
         if self.config.data_root is not None:
             self.config.data_root = os.path.join(self.config.data_root, self.config.repo_id)
         
+        if self.config.incremental and self._open_existing_dataset():
+            return
+
         self.dataset = LeRobotDataset.create(
             repo_id=self.config.repo_id,
             root=self.config.data_root,
             fps=self.config.fps,
             video_backend=self.config.video_backend,
             features=features,
+            image_writer_threads=self.config.image_writer_threads,
         )
+        # the source episodes of every conversion are recorded, so that later `incremental` runs can append to the dataset
+        if self.config.incremental or len(self.config.source_data_roots) > 0:
+            self.manifest = ConversionManifest(self.dataset.root)
+
+    def _open_existing_dataset(self):
+        """
+        Open the existing dataset to append episodes to it, after cleaning up what a crashed run left behind.
+        Returns False if there is no dataset with committed episodes to append to.
+        """
+        if self.config.data_root is not None:
+            dataset_root = self.config.data_root
+        else:
+            dataset_root = os.path.join(get_lerobot_default_root(), self.config.repo_id)
+        info_path = os.path.join(dataset_root, INFO_PATH)
+        if not os.path.exists(info_path):
+            return False
+
+        total_episodes = reconcile_episodes_meta(dataset_root)
+        removed = remove_partial_episodes(dataset_root, total_episodes)
+        if len(removed) > 0:
+            print(f'Removed {len(removed)} files of partially converted episodes: {removed}')
+        
+        if total_episodes == 0:
+            shutil.rmtree(dataset_root)
+            return False
+
+        encoded = encode_missing_videos(dataset_root)
+        if len(encoded) > 0:
+            print(f'Encoded the missing videos of {len(encoded)} episodes left by an interrupted run: {encoded}')
+        shutil.rmtree(os.path.join(dataset_root, 'images'), ignore_errors=True)
+
+        self.manifest = ConversionManifest(dataset_root)
+        self.manifest.recover(total_episodes)
+        missing = self.manifest.missing_episodes(total_episodes)
+        if len(missing) > 0:
+            raise ValueError(f'{len(missing)} of the {total_episodes} episodes of {dataset_root} are not recorded in its conversion '
+                             f'manifest (e.g. episodes merged with `merge_datasets`), their source episodes would be converted '
+                             f'again: reconvert the dataset without `incremental`.')
+        self.dataset = LeRobotDataset(
+            repo_id=self.config.repo_id, 
+            root=dataset_root, 
+            video_backend=self.config.video_backend,
+        )
+        if self.config.image_writer_threads > 0:
+            self.dataset.start_image_writer(num_threads=self.config.image_writer_threads)
+        print(f'Appending to existing dataset {dataset_root} with {total_episodes} episodes.')
+        return True
     
     def process_data(self):
         num_episodes = 3
-        for episode_idx in range(num_episodes):
-            print(f'Processing episode {episode_idx + 1}/{num_episodes}')
-            self._add_episode('dummy')
-    
-    def _add_episode(self, episode_path):
-        raw_outputs = self._load_episode(episode_path)
-        
+        self._process_episodes(['dummy'] * num_episodes)
+
+    def _process_episodes(self, episode_paths):
+        if self.config.num_shards > 1:
+            num_episodes = len(episode_paths)
+            episode_paths = select_shard(episode_paths, self.config.shard_index, self.config.num_shards)
+            print(f'Shard {self.config.shard_index}/{self.config.num_shards}: {len(episode_paths)} of {num_episodes} episodes.')
+
         if self.config.check_only:
-            print(f'Check only mode, skipping adding episode {episode_path}')
+            self._check_episodes(episode_paths)
+            return
+
+        if self.config.incremental:
+            num_episodes = len(episode_paths)
+            episode_paths = self.manifest.filter(episode_paths)
+            print(f'Incremental mode: {len(episode_paths)} of {num_episodes} episodes are new.')
+
+        if self.config.num_workers > 1 and len(episode_paths) > 1:
+            self._process_episodes_parallel(episode_paths)
+        else:
+            self._process_episodes_sequential(episode_paths)
+        # also run without new episodes, e.g. to complete the chunks and variants of an interrupted run
+        self._write_action_chunks()
+        self._write_variants()
+        self._finish_profiling()
+
+    def _process_episodes_sequential(self, episode_paths):
+        for episode_idx, episode_path in enumerate(episode_paths):
+            print(f'Processing episode {episode_idx + 1}/{len(episode_paths)}: {episode_path}')
+            self.profiler.start_episode(episode_path)
+            if self.manifest is None:
+                self._add_episode(episode_path)
+                self.profiler.end_episode()
+                continue
+
+            episode_index = self.dataset.meta.total_episodes
+            self.manifest.start(episode_path, episode_index)
+            self._add_episode(episode_path)
+            self.manifest.finish(episode_path, episode_index if self.dataset.meta.total_episodes > episode_index else None)
+            self.profiler.end_episode()
+        with self.profiler.stage('finish_encoding'):
+            self._finish_video_encoding()
+
+    def _write_action_chunks(self):
+        if self.config.action_chunk_size <= 0:
+            return
+        with self.profiler.stage('action_chunks'):
+            chunks_dir = write_action_chunks(
+                self.dataset.root, 
+                self.config.action_chunk_size, 
+                self.config.action_chunk_start, 
+                self.config.action_name,
+            )
+        print(f'Wrote the action chunks of {self.dataset.meta.total_frames} frames to {chunks_dir}')
+
+    def _write_variants(self):
+        """
+        Build the dataset of every extra transform from the converted dataset, sharing its videos (see `extra_transform_types`).
+        Incremental runs only add the new episodes to the variants.
+        """
+        for transform_type in self.config.extra_transform_types:
+            variant_root = get_variant_root(self.dataset.root, transform_type)
+            with self.profiler.stage('variants'):
+                num_episodes = build_variant_dataset(
+                    self.dataset.root, 
+                    variant_root, 
+                    transform_type, 
+                    self.config.action_name, 
+                    self.config.variant_link_mode,
+                    append=self.config.incremental,
+                )
+                if self.config.action_chunk_size > 0:
+                    write_action_chunks(variant_root, self.config.action_chunk_size, self.config.action_chunk_start, self.config.action_name)
+            print(f'Wrote {num_episodes} episodes of the {transform_type} variant of {self.dataset.meta.total_episodes} episodes '
+                  f'to {variant_root}')
+
+    def _finish_profiling(self):
+        if not self.profiler.enabled:
             return
+        self.profiler.close()
+        print(self.profiler.summary())
+        if self.config.profile_path is not None:
+            self.profiler.export(self.config.profile_path)
+            print(f'Exported the profile to {self.config.profile_path}')
+
+    def _process_episodes_parallel(self, episode_paths):
+        """
+        Split the episodes into contiguous shards converted by a pool of worker processes,
+        then merge the shards in order into the dataset, so that episode indices match the sequential conversion.
+        """
+        num_workers = min(self.config.num_workers, len(episode_paths))
+        dataset_root = str(self.dataset.root)
+        shards_root = os.path.join(os.path.dirname(dataset_root), f'.{os.path.basename(dataset_root)}_shards')
+        shutil.rmtree(shards_root, ignore_errors=True)
+
+        shard_configs, shard_episode_paths = [], []
+        for shard_idx, shard_indices in enumerate(np.array_split(np.arange(len(episode_paths)), num_workers)):
+            shard_configs.append(dataclasses.replace(
+                self.config,
+                overwrite=False,
+                incremental=False,
+                num_workers=1,
+                repo_id=f'shard_{shard_idx:03d}',
+                data_root=shards_root,
+                profile_cprofile_path=None if self.config.profile_cprofile_path is None
+                                      else f'{self.config.profile_cprofile_path}.{shard_idx:03d}',
+            ))
+            shard_episode_paths.append([episode_paths[i] for i in shard_indices])
+        
+        print(f'Converting {len(episode_paths)} episodes with {num_workers} workers into {shards_root}')
+        start_time = time.perf_counter()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context) as executor:
+            futures = [executor.submit(_convert_shard, type(self), shard_config, paths)
+                       for shard_config, paths in zip(shard_configs, shard_episode_paths)]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start_time
+
+        for shard_idx, result in enumerate(results):
+            print(f'Worker {shard_idx}: {result["num_episodes"]} episodes, {result["num_frames"]} frames '
+                  f'in {result["elapsed"]:.1f}s ({result["num_frames"] / result["elapsed"]:.1f} frames/s)')
+            if result['profile'] is not None:
+                self.profiler.merge(result['profile'])
+        num_frames = sum(result['num_frames'] for result in results)
+        print(f'Total: {len(episode_paths)} episodes, {num_frames} frames in {elapsed:.1f}s ({num_frames / elapsed:.1f} frames/s)')
+
+        if self.manifest is not None:
+            # record where every episode will land before merging, so that an interrupted merge can be recovered
+            episode_index = self.dataset.meta.total_episodes
+            for paths, result in zip(shard_episode_paths, results):
+                for episode_path, shard_episode_index in zip(paths, result['episode_indices']):
+                    self.manifest.start(episode_path, None if shard_episode_index is None else episode_index)
+                    episode_index += shard_episode_index is not None
+
+        with self.profiler.stage('merge'):
+            merged = merge_datasets(dataset_root, [result['root'] for result in results], mode='move')
+        shutil.rmtree(shards_root, ignore_errors=True)
+        self.dataset.meta = type(self.dataset.meta)(self.dataset.repo_id, root=self.dataset.root)
+
+        if self.manifest is not None:
+            merged_indices = {(src_root, src_index): dst_index for src_root, src_index, dst_index in merged}
+            for paths, result in zip(shard_episode_paths, results):
+                for episode_path, shard_episode_index in zip(paths, result['episode_indices']):
+                    self.manifest.finish(episode_path, merged_indices.get((result['root'], shard_episode_index)))
+    
+    def _check_episodes(self, episode_paths):
+        for episode_path in episode_paths:
+            self._load_episode(episode_path)
+            print(f'Check only mode, loaded episode {episode_path}')
+
+    def _add_episode(self, episode_path):
+        with self.profiler.stage('load_episode'):
+            raw_outputs = self._load_episode(episode_path)
 
-        raw_images = raw_outputs['raw_images']
         raw_actions = raw_outputs['raw_actions']
         instruction = raw_outputs['instruction']
-        if self.config.use_depth:
-            raw_depths = raw_outputs['raw_depths']
         
-        indexs = list(range(len(raw_images[self.config.rgb_names[0]])))
-        state = np.concatenate([raw_actions[action_dir][0] for action_dir in self.config.action_dirs])
+        states = np.concatenate([np.stack(raw_actions[action_dir]) for action_dir in self.config.action_dirs], axis=1)
 
-        for i in tqdm(indexs[1:], desc=f'Adding episode {episode_path}'):
-            next_state = np.concatenate([raw_actions[action_dir][i] for action_dir in self.config.action_dirs])
-            if not self._check_nonoop_actions(state, next_state):
-                print(f'Skipping frame {i} due to non-noop actions.')
-                continue
+        with self.profiler.stage('filter'):
+            start, end = self._trim_idle(states, raw_outputs.get('frame_timestamps'), desc=episode_path)
+            keyframes = start + self._select_keyframes(states[start:end])
+        if len(keyframes) < len(states):
+            print(f'Skipping {len(states) - len(keyframes)} frames due to noop actions.')
+        with self.profiler.stage('transform'):
+            actions = self.transform.batch(states[keyframes])
+            self._write_variant_actions(states[keyframes])
+        with self.profiler.stage('imu'):
+            imus = self._resample_imu(raw_outputs, keyframes)
+        self.profiler.count('source_frames', len(states))
+        self.profiler.count('frames', len(actions))
 
-            action = self.transform(state, next_state)
+        if self.config.stream_video:
+            self._add_streamed_episode(raw_outputs, keyframes, states, actions, imus, desc=episode_path)
+            return
 
-            frame = {rgb_name: load_image(raw_images[rgb_name][i]) 
-                     for rgb_name in self.config.rgb_names}
-            frame[self.config.action_name] = action.copy()
+        depth_writers = self._open_depth_writers()
+        try:
+            frames = self._iter_frames(raw_outputs, keyframes[1:], desc=episode_path)
+            for frame, state, action, imu in tqdm(zip(frames, states[keyframes[:-1]], actions, imus),
+                                                  total=len(actions), desc=f'Adding episode {episode_path}'):
+                frame[self.config.action_name] = action.copy()
 
-            if self.config.use_state:
-                frame[self.config.state_name] = state.copy()
+                if self.config.use_state:
+                    frame[self.config.state_name] = state.copy()
 
-            if self.config.use_depth:
-                frame.update({depth_name: load_image(raw_depths[depth_name][i]) 
-                              for depth_name in self.config.depth_names})
+                if imu is not None:
+                    frame[self.config.imu_name] = imu
+
+                with self.profiler.stage('depth_write'):
+                    for depth_name, depth_writer in depth_writers.items():
+                        depth_writer.write(frame.pop(depth_name))
+                
+                with self.profiler.stage('add_frame'):
+                    if _LEROBOT_VERSION == '2.0':
+                        self.dataset.add_frame(frame)
+                    elif _LEROBOT_VERSION == '2.1':
+                        self.dataset.add_frame(frame, task=instruction)
+                    else:
+                        raise ValueError(f'Unsupported LeRobot version: {_LEROBOT_VERSION}')
+                with self.profiler.stage('throttle'):
+                    self._throttle_image_writer()
+
+            for depth_writer in depth_writers.values():
+                depth_writer.close()
+        except BaseException:
+            for depth_writer in depth_writers.values():
+                depth_writer.abort()
+            raise
             
-            if _LEROBOT_VERSION == '2.0':
-                self.dataset.add_frame(frame)
+        with self.profiler.stage('save_episode'):
+            if self.config.encoding_workers > 0 and len(self.config.rgb_names) > 0:
+                self._save_episode_async()
+            elif _LEROBOT_VERSION == '2.0':
+                self.dataset.save_episode(task=instruction)
             elif _LEROBOT_VERSION == '2.1':
-                self.dataset.add_frame(frame, task=instruction)
+                self.dataset.save_episode()
             else:
                 raise ValueError(f'Unsupported LeRobot version: {_LEROBOT_VERSION}')
 
-            state = next_state
-            
-        if _LEROBOT_VERSION == '2.0':
-            self.dataset.save_episode(task=instruction)
-        elif _LEROBOT_VERSION == '2.1':
+    def _write_variant_actions(self, states):
+        """
+        Save the actions of the next episode for every extra transform (see `extra_transform_types`).
+        """
+        if len(self.extra_transforms) == 0:
+            return
+        actions_path = self.dataset.root / get_variant_actions_path(self.dataset.meta.total_episodes, self.dataset.meta.chunks_size)
+        write_variant_actions(actions_path, {transform_type: transform.batch(states) 
+                                             for transform_type, transform in self.extra_transforms.items()})
+
+    def _resample_imu(self, raw_outputs, keyframes):
+        """
+        Resample the IMU samples of an episode onto its frames (see `imu_resample`), one row per frame,
+        or write them at their native rate into the side table of the episode ('native').
+        Rows are `None` if the IMU is not a feature of the dataset.
+        """
+        if not self.config.use_imu:
+            return itertools.repeat(None)
+        
+        raw_imu = raw_outputs['raw_imu']
+        frame_timestamps = raw_outputs['frame_timestamps'][keyframes]
+        if self.config.imu_resample == 'native':
+            imu_path = self.dataset.root / get_imu_path(self.dataset.meta.total_episodes, self.dataset.meta.chunks_size)
+            imu_names = get_imu_names(self.config.imu_dirs, self.config.imu_keys)
+            write_imu_table(imu_path, raw_imu['timestamps'], raw_imu['values'], imu_names, frame_timestamps)
+            return itertools.repeat(None)
+
+        # frame i holds the samples since the previous kept frame, up to the image it is given (see `_iter_frames`)
+        imus = resample_imu(raw_imu['timestamps'], raw_imu['values'], frame_timestamps, 
+                            self.config.imu_resample, self.config.imu_num_samples)
+        return imus[1:]
+
+    def _open_depth_writers(self):
+        """
+        Open one writer per depth stream of the next episode, if depth is stored outside of the parquet files.
+        """
+        if not self.config.use_depth or self.config.depth_storage == 'parquet':
+            return {}
+
+        if self.depth_info is None:
+            self.depth_info = create_depth_info(
+                self.dataset.root,
+                self.config.depth_storage,
+                self.config.depth_names,
+                self.config.image_height,
+                self.config.image_width,
+                self.config.fps,
+                chunks_size=self.dataset.meta.chunks_size,
+                frames_per_chunk=self.config.depth_frames_per_chunk,
+            )
+        episode_index = self.dataset.meta.total_episodes
+        return {
+            depth_name: open_depth_writer(self.depth_info, self.dataset.root, depth_name, episode_index, 
+                                          max_pending=self.config.prefetch_depth)
+            for depth_name in self.config.depth_names
+        }
+
+    def _save_episode_async(self):
+        """
+        Save the episode without encoding its videos, which are encoded from the temporary images 
+        by the background encoder pool while the next episodes are added (see `encoding_workers`).
+        """
+        if _LEROBOT_VERSION != '2.1':
+            raise ValueError(f'`encoding_workers` requires LeRobot v2.1, got {_LEROBOT_VERSION}')
+
+        if self.video_encoder is None:
+            dataset_root = str(self.dataset.root)
+            self.video_encoder = AsyncEpisodeEncoder(
+                os.path.join(os.path.dirname(dataset_root), f'.{os.path.basename(dataset_root)}_encoding'),
+                self.config.fps,
+                num_workers=self.config.encoding_workers,
+                max_pending_episodes=self.config.max_encoding_episodes,
+            )
+            # let LeRobot defer the encoding of every episode, the videos are put in place by the encoder pool
+            self.dataset.batch_encoding_size = sys.maxsize
+
+        episode_index = self.dataset.meta.total_episodes
+        self.dataset.save_episode()
+
+        videos = {}
+        for key in self.dataset.meta.video_keys:
+            image_dir = self.dataset._get_image_file_path(episode_index, key, 0).parent
+            video_path = self.dataset.root / self.dataset.meta.get_video_file_path(episode_index, key)
+            videos[key] = (image_dir, video_path)
+        for finished_index in self.video_encoder.submit(episode_index, videos):
+            self._commit_episode_videos(finished_index)
+
+    def _commit_episode_videos(self, episode_index):
+        self.dataset.episodes_since_last_encoding -= 1
+        # the videos exist, so this only records the video info of the first episode
+        self.dataset.encode_episode_videos(episode_index)
+        for key in self.dataset.meta.video_keys:
+            shutil.rmtree(self.dataset._get_image_file_path(episode_index, key, 0).parent, ignore_errors=True)
+
+    def _finish_video_encoding(self):
+        """
+        Wait for the videos of all saved episodes, in order.
+        """
+        if self.video_encoder is None:
+            return
+        for finished_index in self.video_encoder.drain():
+            self._commit_episode_videos(finished_index)
+        self.video_encoder.close()
+        self.video_encoder = None
+        self.dataset.batch_encoding_size = 1
+
+    def _add_streamed_episode(self, raw_outputs, keyframes, states, actions, imus, desc=''):
+        """
+        Add an episode with its camera frames encoded straight into the episode videos (see `stream_video`).
+        Only the frames sampled by LeRobot for the image statistics are written as temporary images,
+        `save_episode` then skips encoding since the videos already exist.
+        """
+        if _LEROBOT_VERSION != '2.1':
+            raise ValueError(f'`stream_video` requires LeRobot v2.1, got {_LEROBOT_VERSION}')
+        from lerobot.datasets.compute_stats import sample_indices
+        from lerobot.datasets.utils import validate_frame
+
+        instruction = raw_outputs['instruction']
+        episode_index = self.dataset.meta.total_episodes
+        if self.dataset.episode_buffer is None:
+            self.dataset.episode_buffer = self.dataset.create_episode_buffer()
+        episode_buffer = self.dataset.episode_buffer
+        stats_indices = set(sample_indices(len(actions)))
+
+        depth_writers = self._open_depth_writers()
+        encoders = {}
+        for rgb_name in self.config.rgb_names:
+            video_path = self.dataset.root / self.dataset.meta.get_video_file_path(episode_index, rgb_name)
+            encoders[rgb_name] = VideoStreamEncoder(
+                video_path, 
+                self.config.fps, 
+                self.config.image_width, 
+                self.config.image_height, 
+                max_pending=self.config.prefetch_depth,
+            )
+
+        try:
+            frames = self._iter_frames(raw_outputs, keyframes[1:], desc=desc)
+            for frame_index, (frame, state, action, imu) in enumerate(tqdm(zip(frames, states[keyframes[:-1]], actions, imus),
+                                                                           total=len(actions), desc=f'Adding episode {desc}')):
+                frame[self.config.action_name] = action.copy()
+                if self.config.use_state:
+                    frame[self.config.state_name] = state.copy()
+                if imu is not None:
+                    frame[self.config.imu_name] = imu
+                with self.profiler.stage('depth_write'):
+                    for depth_name, depth_writer in depth_writers.items():
+                        depth_writer.write(frame.pop(depth_name))
+                validate_frame(frame, self.dataset.features)
+
+                episode_buffer['frame_index'].append(frame_index)
+                episode_buffer['timestamp'].append(frame_index / self.config.fps)
+                episode_buffer['task'].append(instruction)
+                for key, value in frame.items():
+                    if key not in encoders:
+                        episode_buffer[key].append(value)
+                        continue
+
+                    with self.profiler.stage('encode'):
+                        encoders[key].write(value)
+                    image_path = self.dataset._get_image_file_path(episode_index, key, frame_index)
+                    if frame_index in stats_indices:
+                        image_path.parent.mkdir(parents=True, exist_ok=True)
+                        self.dataset._save_image(value, image_path)
+                    episode_buffer[key].append(str(image_path))
+                episode_buffer['size'] += 1
+                with self.profiler.stage('throttle'):
+                    self._throttle_image_writer()
+
+            with self.profiler.stage('encode'):
+                for writer in itertools.chain(encoders.values(), depth_writers.values()):
+                    writer.close()
+        except BaseException:
+            for writer in itertools.chain(encoders.values(), depth_writers.values()):
+                writer.abort()
+            self.dataset.episode_buffer = None
+            raise
+
+        with self.profiler.stage('save_episode'):
             self.dataset.save_episode()
-        else:
-            raise ValueError(f'Unsupported LeRobot version: {_LEROBOT_VERSION}')
+        for rgb_name in self.config.rgb_names:
+            image_dir = self.dataset._get_image_file_path(episode_index, rgb_name, 0).parent
+            shutil.rmtree(image_dir, ignore_errors=True)
         
     def _load_episode(self, episode_path):
+        """
+        Load the lightweight part of an episode: image sources (paths, or frame indices for dummy data),
+        actions, instruction and IMU samples (with the timestamps of the frames). Images are only read frame by frame by `_iter_frames`.
+        """
         num_frames_per_episode = 100
 
         raw_images = defaultdict(list)
@@ -188,8 +660,7 @@ class DummyDataProcessor(object):
         
         for frame_idx in range(num_frames_per_episode):
             for rgb_name in self.config.rgb_names:
-                image = np.random.randint(0, 255, (self.config.image_height, self.config.image_width, 3), dtype=np.uint8)
-                raw_images[rgb_name].append(image)
+                raw_images[rgb_name].append(frame_idx)
             
             for action_dir, action_keys in zip(self.config.action_dirs, self.config.action_keys_list):
                 action_data = np.random.rand(len(action_keys))
@@ -201,28 +672,108 @@ class DummyDataProcessor(object):
             'instruction': instruction
         }
 
+        outputs['frame_timestamps'] = np.arange(num_frames_per_episode) / self.config.fps
+        if self.config.use_imu:
+            imu_rate = 5 * self.config.fps
+            num_imu_samples = num_frames_per_episode * 5
+            outputs['raw_imu'] = {
+                'timestamps': np.arange(num_imu_samples) / imu_rate,
+                'values': np.random.rand(num_imu_samples, len(self.config.imu_dirs) * len(self.config.imu_keys)),
+            }
+
         if self.config.use_depth:
             raw_depths = defaultdict(list)
             for frame_idx in range(num_frames_per_episode):
                 for depth_name in self.config.depth_names:
-                    depth_image = np.random.randint(0, 65535, (self.config.image_height, self.config.image_width), dtype=np.uint16)
-                    raw_depths[depth_name].append(depth_image)
+                    raw_depths[depth_name].append(frame_idx)
             outputs['raw_depths'] = raw_depths
         
         return outputs
+
+    def _read_image(self, source):
+        return np.random.randint(0, 255, (self.config.image_height, self.config.image_width, 3), dtype=np.uint8)
+
+    def _read_depth(self, source):
+        return np.random.randint(0, 65535, (self.config.image_height, self.config.image_width), dtype=np.uint16)
+
+    def _load_frame(self, raw_outputs, index):
+        with self.profiler.stage('decode'):
+            frame = {rgb_name: self._read_image(raw_outputs['raw_images'][rgb_name][index]) 
+                     for rgb_name in self.config.rgb_names}
+            if self.config.use_depth:
+                frame.update({depth_name: self._read_depth(raw_outputs['raw_depths'][depth_name][index]) 
+                              for depth_name in self.config.depth_names})
+        return frame
+
+    def _iter_frames(self, raw_outputs, indices, desc=''):
+        """
+        Stream the decoded images of the given frames, so that at most `prefetch_depth` frames 
+        (bounded by `prefetch_max_mb`) are held in memory at a time, regardless of the episode length.
+        """
+        if self.config.prefetch_threads <= 0:
+            for index in indices:
+                yield self._load_frame(raw_outputs, index)
+            return
+
+        frames = FramePrefetcher(
+            functools.partial(self._load_frame, raw_outputs), 
+            indices, 
+            num_threads=self.config.prefetch_threads,
+            depth=self.config.prefetch_depth,
+            max_bytes=self.config.prefetch_max_mb << 20,
+        )
+        try:
+            yield from frames
+        finally:
+            frames.close()
+        print(f'Prefetch stats of episode {desc}: {frames.stats}')
+
+    def _throttle_image_writer(self):
+        """
+        Wait until the asynchronous image writer holds at most `prefetch_depth` frames,
+        so that a slow writer does not accumulate decoded images in memory.
+        """
+        image_writer = getattr(self.dataset, 'image_writer', None)
+        if image_writer is None:
+            return
+
+        num_images = len(self.config.rgb_names)
+        max_pending_images = max(1, self.config.prefetch_depth) * num_images
+        while image_writer.queue.qsize() > max_pending_images:
+            time.sleep(1e-3)
     
-    def _check_nonoop_actions(self, states, actions):
-        assert len(states) == len(actions), "States and actions must have the same length."
-
-        for i in range(0, len(states), 7):
-            position_diff = np.linalg.norm(states[i:i+3] - actions[i:i+3])
-            rotation_diff = np.linalg.norm(states[i+3:i+6] - actions[i+3:i+6])
-            gripper_diff = abs(states[i+6] - actions[i+6])
-            if (
-                position_diff > self.config.position_nonoop_threshold 
-                or rotation_diff > self.config.rotation_nonoop_threshold
-                or gripper_diff > self.config.gripper_nonoop_threshold
-            ):
-                return True
-         
-        return False
\ No newline at end of file
+    def _trim_idle(self, states, timestamps=None, desc=''):
+        """
+        Range [start, end) of the frames of an episode without its leading and trailing idle segments (see `trim_idle`),
+        speeds are computed from the timestamps of the synchronized frames (at `fps` if None).
+        """
+        if not self.config.trim_idle:
+            return 0, len(states)
+
+        if timestamps is None:
+            timestamps = np.arange(len(states)) / self.config.fps
+        start, end = trim_idle(
+            states,
+            timestamps,
+            self.config.idle_position_velocity,
+            self.config.idle_rotation_velocity,
+            self.config.idle_gripper_velocity,
+            min_active_frames=self.config.idle_min_active_frames,
+            margin=self.config.idle_margin,
+        )
+        num_trimmed = len(states) - (end - start)
+        self.profiler.count('idle_frames', num_trimmed)
+        if num_trimmed > 0:
+            duration = (timestamps[start] - timestamps[0]) + (timestamps[-1] - timestamps[end - 1])
+            print(f'Trimmed {start} leading and {len(states) - end} trailing idle frames of episode {desc}, '
+                  f'saving {num_trimmed} frames ({duration:.1f}s of video before noop filtering).')
+        return start, end
+
+    def _select_keyframes(self, states):
+        return select_keyframes(
+            states,
+            self.config.position_nonoop_threshold,
+            self.config.rotation_nonoop_threshold,
+            self.config.gripper_nonoop_threshold,
+            mode=self.config.nonoop_filter,
+        )
@@ -0,0 +1,230 @@
+"""
+This module is used to read raw Pika episodes directly from uncompressed tar or zip archives, without extracting them.
+A path inside an archive is written as if the archive were a directory, e.g. `/data/pika.tar/episode0/camera/color/x/1.jpg`.
+The members of every archive are indexed once per process (name -> offset and size), and are then read with
+positional reads (`os.pread` for tar, the shared file of `zipfile` for zip), which are safe from the decoding threads.
+The functions of this module fall back to the file system for regular paths, so callers need no special case.
+"""
+
+import io
+import os
+import tarfile
+import threading
+import zipfile
+from collections import defaultdict
+
+
+ARCHIVE_EXTENSIONS = ('.tar', '.zip')
+
+_ARCHIVES = {}
+_LOCK = threading.Lock()
+
+
+class ArchiveIndex(object):
+    """
+    In-memory index of the members of an uncompressed tar or a zip archive.
+    Compressed tar archives (.tar.gz, ...) are not supported, as their members can not be read at random.
+
+    Attributes:
+        path: Path of the archive.
+        members: Member path -> (offset, size) of its data for tar, or its `ZipInfo` for zip.
+        children: Directory path ('' for the root) -> names of its files and subdirectories.
+
+    Examples:
+        ```python
+        archive = ArchiveIndex('/data/pika.tar')
+        archive.listdir('episode0/localization/pose/pika_l')  # ['1700000000.000000.json', ...]
+        data = archive.read('episode0/instructions.json')
+        ```
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.members = {}
+        self.children = defaultdict(set)
+        self.zip_file = None
+        self.fd = None
+
+        if path.endswith('.zip'):
+            self.zip_file = zipfile.ZipFile(path)
+            for info in self.zip_file.infolist():
+                if not info.is_dir():
+                    self._add(info.filename, info)
+        else:
+            try:
+                with tarfile.open(path, 'r:') as tar_file:
+                    for member in tar_file:
+                        if member.isfile():
+                            self._add(member.name, (member.offset_data, member.size))
+            except tarfile.ReadError as e:
+                raise ValueError(f'{path} is not an uncompressed tar archive, compressed archives can not be read '
+                                 f'at random, repack it with `tar cf`') from e
+            self.fd = os.open(path, os.O_RDONLY)
+        self.children = {directory: sorted(names) for directory, names in self.children.items()}
+
+    def _add(self, name, location):
+        name = os.path.normpath(name).lstrip('/')
+        self.members[name] = location
+        while name:
+            parent, child = os.path.split(name)
+            self.children[parent].add(child)
+            name = parent
+
+    def listdir(self, member_path=''):
+        member_path = os.path.normpath(member_path) if member_path else ''
+        if member_path not in self.children:
+            raise FileNotFoundError(f'No such directory in {self.path}: {member_path}')
+        return list(self.children[member_path])
+
+    def exists(self, member_path):
+        member_path = os.path.normpath(member_path) if member_path else ''
+        return member_path in self.members or member_path in self.children
+
+    def isdir(self, member_path):
+        return (os.path.normpath(member_path) if member_path else '') in self.children
+
+    def file_sizes(self, member_path=''):
+        """
+        Sizes of all the files under a directory of the archive, by path relative to the directory.
+        """
+        prefix = f'{os.path.normpath(member_path)}/' if member_path else ''
+        sizes = {}
+        for name, location in self.members.items():
+            if name.startswith(prefix):
+                sizes[name[len(prefix):]] = location.file_size if self.zip_file is not None else location[1]
+        return sizes
+
+    def read(self, member_path):
+        location = self.members.get(os.path.normpath(member_path))
+        if location is None:
+            raise FileNotFoundError(f'No such file in {self.path}: {member_path}')
+        if self.zip_file is not None:
+            return self.zip_file.read(location)
+        offset, size = location
+        return os.pread(self.fd, size, offset)
+
+    def close(self):
+        if self.zip_file is not None:
+            self.zip_file.close()
+        if self.fd is not None:
+            os.close(self.fd)
+
+
+def pack_directory(directory, archive_path):
+    """
+    Pack a directory into an uncompressed tar or a stored (uncompressed) zip archive, holding the directory as its only entry.
+    Images are already compressed, so the archive is about the size of the directory and its members can be read at random.
+
+    Examples:
+        ```python
+        pack_directory('/data/pika/episode0', '/data/pika/episode0.tar')
+        ```
+    """
+    directory = os.path.normpath(directory)
+    name = os.path.basename(directory)
+    if archive_path.endswith('.zip'):
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED) as zip_file:
+            for root, _, filenames in os.walk(directory):
+                for filename in sorted(filenames):
+                    path = os.path.join(root, filename)
+                    zip_file.write(path, os.path.join(name, os.path.relpath(path, directory)))
+    else:
+        with tarfile.open(archive_path, 'w') as tar_file:
+            tar_file.add(directory, arcname=name)
+    return archive_path
+
+
+def split_archive_path(path):
+    """
+    Split a path into the archive it is in and the member path inside the archive.
+
+    Returns:
+        Tuple[ArchiveIndex, str]: The (cached) archive index and the member path, or (None, path) for regular paths.
+    """
+    path = os.fspath(path)
+    if '.tar' not in path and '.zip' not in path:
+        return None, path
+    parts = os.path.normpath(path).split(os.sep)
+    for i in range(1, len(parts) + 1):
+        prefix = os.sep.join(parts[:i]) or os.sep
+        if prefix.endswith(ARCHIVE_EXTENSIONS) and (prefix in _ARCHIVES or os.path.isfile(prefix)):
+            return get_archive(prefix), '/'.join(parts[i:])
+    return None, path
+
+
+def get_archive(archive_path):
+    """
+    Get the index of an archive, built on first use and shared by all threads of the process.
+    """
+    archive = _ARCHIVES.get(archive_path)
+    if archive is None:
+        with _LOCK:
+            archive = _ARCHIVES.get(archive_path)
+            if archive is None:
+                archive = _ARCHIVES[archive_path] = ArchiveIndex(archive_path)
+    return archive
+
+
+def is_archive_path(path):
+    return split_archive_path(path)[0] is not None
+
+
+def listdir(path):
+    archive, member_path = split_archive_path(path)
+    if archive is None:
+        return os.listdir(path)
+    return archive.listdir(member_path)
+
+
+def exists(path):
+    archive, member_path = split_archive_path(path)
+    if archive is None:
+        return os.path.exists(path)
+    return archive.exists(member_path)
+
+
+def isdir(path):
+    archive, member_path = split_archive_path(path)
+    if archive is None:
+        return os.path.isdir(path)
+    return archive.isdir(member_path)
+
+
+def list_file_sizes(path):
+    """
+    Sizes of the files of a directory (not of its subdirectories), by name.
+    """
+    archive, member_path = split_archive_path(path)
+    if archive is None:
+        with os.scandir(path) as entries:
+            return {entry.name: entry.stat().st_size for entry in entries if entry.is_file()}
+    if not archive.isdir(member_path):
+        raise FileNotFoundError(f'No such directory in {archive.path}: {member_path}')
+    return {name: size for name, size in archive.file_sizes(member_path).items() if '/' not in name}
+
+
+def getmtime_ns(path):
+    """
+    Modification time of a file or directory, or of the archive it is in.
+    """
+    archive, _ = split_archive_path(path)
+    return os.stat(path if archive is None else archive.path).st_mtime_ns
+
+
+def read_bytes(path):
+    archive, member_path = split_archive_path(path)
+    if archive is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    return archive.read(member_path)
+
+
+def open_file(path, mode='r'):
+    """
+    Open a file for reading ('r' or 'rb'), like `open`, including files inside archives.
+    """
+    archive, member_path = split_archive_path(path)
+    if archive is None:
+        return open(path, mode)
+    data = archive.read(member_path)
+    return io.BytesIO(data) if 'b' in mode else io.StringIO(data.decode('utf-8'))
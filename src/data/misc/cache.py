@@ -0,0 +1,126 @@
+"""
+This module is used to pack the per-frame JSON files of every topic of a raw Pika episode
+(pose, gripper encoder, IMU, ...) into a single columnar `.npz` sidecar file,
+so that later conversions and inspections read one file per episode instead of one file per frame.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from . import archive
+from .topics import JSON_EXTENSIONS, read_json_topic
+
+
+CACHE_FILENAME = '.pika_cache.npz'
+_SEPARATOR = '::'
+_FILENAMES_KEY = '__filenames__'
+_MTIME_KEY = '__mtime__'
+
+
+def get_cache_path(episode_path, cache_root=None):
+    """
+    Get the sidecar cache path of an episode, inside the episode directory by default (next to the archive
+    for episodes read from an archive), or under `cache_root` (keyed by a hash of the episode path) for read-only source directories.
+    """
+    if cache_root is None:
+        index, member_path = archive.split_archive_path(episode_path)
+        if index is not None:
+            return os.path.join(f'{index.path}.pika_cache', member_path, CACHE_FILENAME)
+        return os.path.join(episode_path, CACHE_FILENAME)
+    episode_hash = hashlib.sha1(os.path.abspath(episode_path).encode()).hexdigest()[:16]
+    return os.path.join(cache_root, f'{os.path.basename(episode_path)}_{episode_hash}.npz')
+
+
+class EpisodeCache(object):
+    """
+    Columnar cache of the JSON topics of one episode.
+    Each topic stores its filenames, the modification time of its directory (used as the cache key)
+    and one column per flattened numeric key.
+
+    Examples:
+        ```python
+        cache = EpisodeCache('/path/to/episode0')
+        filenames = list_topic_files('/path/to/episode0/localization/pose/pika_l', JSON_EXTENSIONS)
+        poses = cache.load('localization/pose/pika_l', filenames, ['x', 'y', 'z', 'roll', 'pitch', 'yaw'])
+        cache.save()  # only writes if a topic was (re-)indexed
+        ```
+    """
+
+    def __init__(self, episode_path, cache_root=None):
+        self.episode_path = episode_path
+        self.cache_path = get_cache_path(episode_path, cache_root)
+        self.topics = {}
+        self.dirty = False
+
+        if os.path.exists(self.cache_path):
+            with np.load(self.cache_path) as data:
+                for name in data.files:
+                    topic, key = name.split(_SEPARATOR)
+                    self.topics.setdefault(topic, {})[key] = data[name]
+
+    def _mtime(self, topic):
+        return archive.getmtime_ns(os.path.join(self.episode_path, topic))
+
+    def index_topic(self, topic):
+        """
+        Parse all JSON files of a topic if it is missing from the cache or its directory changed since it was indexed.
+        """
+        mtime = self._mtime(topic)
+        entry = self.topics.get(topic)
+        if entry is not None and int(entry[_MTIME_KEY]) == mtime:
+            return entry
+
+        topic_dir = os.path.join(self.episode_path, topic)
+        filenames = [filename for filename in archive.listdir(topic_dir) if filename.endswith(JSON_EXTENSIONS)]
+        entry = read_json_topic(topic_dir, filenames)
+        entry[_FILENAMES_KEY] = np.array(filenames)
+        entry[_MTIME_KEY] = np.array(mtime, dtype=np.int64)
+        self.topics[topic] = entry
+        self.dirty = True
+        return entry
+
+    def load(self, topic, filenames, keys):
+        """
+        Load the requested keys of a topic for the given frame filenames.
+
+        Args:
+            topic (str): Topic directory relative to the episode, e.g. 'localization/pose/pika_l'.
+            filenames (List[str]): Frame filenames, in the order they should be returned.
+            keys (List[str]): Flattened keys to load, e.g. ['x', 'y', 'z'] or ['angular_velocity.x'].
+
+        Returns:
+            np.ndarray: Values of shape (len(filenames), len(keys)).
+        """
+        entry = self.index_topic(topic)
+        missing_keys = [key for key in keys if key not in entry]
+        if len(missing_keys) > 0:
+            raise KeyError(f'Keys {missing_keys} not found in topic {topic} of {self.episode_path}')
+
+        rows = {filename: i for i, filename in enumerate(entry[_FILENAMES_KEY].tolist())}
+        indices = np.array([rows[filename] for filename in filenames], dtype=np.int64)
+        return np.stack([entry[key][indices] for key in keys], axis=1)
+
+    def save(self):
+        if not self.dirty:
+            return
+        arrays = {f'{topic}{_SEPARATOR}{key}': value
+                  for topic, entry in self.topics.items() for key, value in entry.items()}
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
+
+
+def build_episode_cache(episode_path, topics, cache_root=None):
+    """
+    Index the given JSON topics of an episode into its sidecar cache, returns the cache path.
+    """
+    cache = EpisodeCache(episode_path, cache_root)
+    for topic in topics:
+        if archive.isdir(os.path.join(episode_path, topic)):
+            cache.index_topic(topic)
+    cache.save()
+    return cache.cache_path
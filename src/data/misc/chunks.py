@@ -0,0 +1,174 @@
+"""
+This module is used to precompute the action chunks of a LeRobot dataset for training, i.e. the windows of
+`action_delta_indices` that ACT / diffusion policies fetch for every sample, and which LeRobot re-assembles
+from the parquet rows on every `__getitem__`. The chunks of all frames are stored once as memory-mapped arrays
+next to the dataset, and `ActionChunkDataset` serves them to training without copies.
+"""
+
+import json
+import os
+
+import numpy as np
+import pyarrow.parquet as pq
+import torch
+
+from .layout import INFO_PATH, load_json, write_json
+from .stats import column_to_numpy
+
+
+# not parquet, LeRobot counts the parquet files of a dataset to check its episodes
+ACTION_CHUNKS_DIR = 'action_chunks'
+ACTION_CHUNKS_INFO = 'info.json'
+
+
+def get_chunk_offsets(start, chunk_size):
+    return list(range(start, start + chunk_size))
+
+
+def compute_action_chunks(actions, offsets):
+    """
+    Action chunks of an episode, padded the same way as LeRobot pads `delta_indices` queries:
+    indices outside the episode are clamped to its first / last frame and flagged in the padding mask.
+
+    Args:
+        actions (np.ndarray): Actions of the episode, of shape (N, D).
+        offsets (List[int]): Frame offsets of the chunk, e.g. `action_delta_indices` of the policy.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Chunks of shape (N, len(offsets), D) and padding mask of shape (N, len(offsets)).
+    """
+    indices = np.arange(len(actions))[:, None] + np.asarray(offsets)[None, :]
+    is_pad = (indices < 0) | (indices >= len(actions))
+    return actions[np.clip(indices, 0, len(actions) - 1)], is_pad
+
+
+def write_action_chunks(dataset_root, chunk_size, start=0, action_key='action'):
+    """
+    Precompute the action chunks of every frame of a dataset into `action_chunks/` as `.npy` arrays
+    (`actions.npy` of shape (num_frames, chunk_size, action_dim) and `is_pad.npy` of shape (num_frames, chunk_size)),
+    rows indexed by the global frame index. The arrays are filled episode by episode through memory maps,
+    so only one episode is held in memory.
+
+    Args:
+        dataset_root (str): Root of the LeRobot dataset.
+        chunk_size (int): Number of actions per chunk.
+        start (int): Offset of the first action of a chunk, relative to the frame (e.g. 1 - n_obs_steps for diffusion).
+        action_key (str): Name of the action feature.
+
+    Returns:
+        str: Directory of the chunk store.
+
+    Examples:
+        ```python
+        # ACT with chunk_size 100
+        write_action_chunks('~/.cache/huggingface/lerobot/lerobot/pika', chunk_size=100)
+        # diffusion with n_obs_steps 2 and horizon 16
+        write_action_chunks('~/.cache/huggingface/lerobot/lerobot/pika', chunk_size=16, start=-1)
+        ```
+    """
+    dataset_root = os.path.expanduser(str(dataset_root))
+    info = load_json(os.path.join(dataset_root, INFO_PATH))
+    shape = info['features'][action_key]['shape']
+    offsets = get_chunk_offsets(start, chunk_size)
+
+    chunks_dir = os.path.join(dataset_root, ACTION_CHUNKS_DIR)
+    os.makedirs(chunks_dir, exist_ok=True)
+    # written under temporary names, so that an interrupted run never leaves a partial store behind
+    actions_path, is_pad_path = os.path.join(chunks_dir, 'actions.tmp.npy'), os.path.join(chunks_dir, 'is_pad.tmp.npy')
+    all_actions = np.lib.format.open_memmap(
+        actions_path, mode='w+', dtype=np.float32, shape=(info['total_frames'], chunk_size, *shape))
+    all_is_pad = np.lib.format.open_memmap(
+        is_pad_path, mode='w+', dtype=np.bool_, shape=(info['total_frames'], chunk_size))
+
+    for episode_index in range(info['total_episodes']):
+        data_path = os.path.join(dataset_root, info['data_path'].format(
+            episode_chunk=episode_index // info['chunks_size'], episode_index=episode_index))
+        table = pq.read_table(data_path, columns=['index', action_key])
+        frame_indices = table.column('index').to_numpy()
+        actions, is_pad = compute_action_chunks(column_to_numpy(table.column(action_key), shape), offsets)
+        all_actions[frame_indices] = actions
+        all_is_pad[frame_indices] = is_pad
+
+    all_actions.flush()
+    all_is_pad.flush()
+    del all_actions, all_is_pad
+    os.replace(actions_path, os.path.join(chunks_dir, 'actions.npy'))
+    os.replace(is_pad_path, os.path.join(chunks_dir, 'is_pad.npy'))
+    write_json({
+        'action_key': action_key,
+        'offsets': offsets,
+        'total_frames': info['total_frames'],
+        'total_episodes': info['total_episodes'],
+    }, os.path.join(chunks_dir, ACTION_CHUNKS_INFO))
+    return chunks_dir
+
+
+class ActionChunkDataset(torch.utils.data.Dataset):
+    """
+    Wrap a `LeRobotDataset` to serve the action chunks of its samples from the precomputed store (seeing `write_action_chunks`)
+    instead of querying them from the parquet rows. The action key is removed from the `delta_indices` of the wrapped dataset,
+    and the chunks are returned as tensors sharing memory with the copy-on-write memory maps (no copy per sample).
+    The memory maps are opened lazily, so that every DataLoader worker maps the files itself.
+    Other attributes (`meta`, `num_frames`, `episode_data_index`, ...) are the ones of the wrapped dataset.
+
+    Attributes:
+        dataset: The wrapped `LeRobotDataset`, whose `delta_indices` of the action must match the offsets of the store.
+        chunks_dir: Directory of the chunk store (`<dataset root>/action_chunks` by default).
+
+    Examples:
+        ```python
+        dataset = ActionChunkDataset(make_dataset(cfg))
+        item = dataset[0]
+        item['action'].shape  # (chunk_size, action_dim)
+        item['action_is_pad'].shape  # (chunk_size,)
+        ```
+    """
+
+    def __init__(self, dataset, chunks_dir=None):
+        self.dataset = dataset
+        self.chunks_dir = chunks_dir or os.path.join(dataset.root, ACTION_CHUNKS_DIR)
+        info_path = os.path.join(self.chunks_dir, ACTION_CHUNKS_INFO)
+        if not os.path.exists(info_path):
+            raise FileNotFoundError(f'No action chunks found at {self.chunks_dir}, '
+                                    f'build them with `src/scripts/data/build_action_chunks.py`')
+        with open(info_path, 'r') as f:
+            info = json.load(f)
+        self.action_key = info['action_key']
+
+        if info['total_frames'] != dataset.meta.total_frames:
+            raise ValueError(f'Action chunks of {info["total_frames"]} frames are stale, '
+                             f'the dataset has {dataset.meta.total_frames} frames, rebuild them')
+        delta_indices = dataset.delta_indices or {}
+        if list(delta_indices.get(self.action_key, [])) != info['offsets']:
+            raise ValueError(f'Action chunks have offsets {info["offsets"][0]}..{info["offsets"][-1]}, '
+                             f'the policy queries {delta_indices.get(self.action_key)}, rebuild them')
+        # with no other queried window, LeRobot skips the window queries entirely
+        dataset.delta_indices = {key: value for key, value in delta_indices.items() if key != self.action_key} or None
+
+        self.actions = None
+        self.is_pad = None
+
+    def _open(self):
+        # copy-on-write maps are writable, so torch can share their memory without a warning or a copy
+        self.actions = np.load(os.path.join(self.chunks_dir, 'actions.npy'), mmap_mode='c')
+        self.is_pad = np.load(os.path.join(self.chunks_dir, 'is_pad.npy'), mmap_mode='c')
+
+    def __getstate__(self):
+        return {**self.__dict__, 'actions': None, 'is_pad': None}
+
+    def __getattr__(self, name):
+        if name == 'dataset':
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        if self.actions is None:
+            self._open()
+        item = self.dataset[idx]
+        index = item['index'].item()
+        item[self.action_key] = torch.from_numpy(self.actions[index])
+        item[f'{self.action_key}_is_pad'] = torch.from_numpy(self.is_pad[index])
+        return item
@@ -0,0 +1,183 @@
+"""
+This module is used to store depth streams next to a LeRobot dataset instead of as raw uint16 parquet columns, either as:
+1. lossless 16-bit FFV1 videos ('ffv1'), intra-only so that every frame is decoded on its own.
+2. chunked compressed arrays ('chunked'), every `frames_per_chunk` frames are byte-shuffled and deflated
+   into one entry of a per-episode npz file, so that a frame is read by inflating its chunk only.
+The storage is described by `meta/depth_info.json` and depth frames are read back with `DepthReader`.
+"""
+
+import json
+import os
+import zipfile
+
+import av
+import numpy as np
+
+from .layout import DEPTH_INFO_PATH, get_depth_path, load_depth_info
+from .video import VideoStreamEncoder
+
+
+DEPTH_STORAGES = ['parquet', 'ffv1', 'chunked']
+_DEPTH_PATHS = {
+    'ffv1': 'depth/chunk-{episode_chunk:03d}/{depth_key}/episode_{episode_index:06d}.mkv',
+    'chunked': 'depth/chunk-{episode_chunk:03d}/{depth_key}/episode_{episode_index:06d}.npz',
+}
+
+
+def create_depth_info(dataset_root, storage, depth_keys, height, width, fps, chunks_size=1000, frames_per_chunk=1):
+    """
+    Write the depth info of a dataset, or load it if it exists (e.g. when appending to a dataset).
+    """
+    if storage not in _DEPTH_PATHS:
+        raise ValueError(f'Unknown depth storage: {storage}, choose from {list(_DEPTH_PATHS)}')
+
+    info = load_depth_info(dataset_root)
+    if info is not None:
+        if info['storage'] != storage or info['keys'] != list(depth_keys):
+            raise ValueError(f'Depth storage of {dataset_root} ({info["storage"]}, {info["keys"]}) '
+                             f'does not match the configuration ({storage}, {list(depth_keys)}).')
+        return info
+
+    info = {
+        'storage': storage,
+        'path': _DEPTH_PATHS[storage],
+        'keys': list(depth_keys),
+        'shape': [height, width],
+        'dtype': 'uint16',
+        'fps': fps,
+        'chunks_size': chunks_size,
+        'frames_per_chunk': frames_per_chunk,
+    }
+    path = os.path.join(dataset_root, DEPTH_INFO_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(info, f, indent=4)
+    return info
+
+
+def _shuffle_bytes(frames):
+    # (N, H, W) uint16 -> (2, N, H, W) uint8, low bytes then high bytes, which deflate much better than interleaved
+    return np.ascontiguousarray(frames.astype('<u2').view(np.uint8).reshape(*frames.shape, 2).transpose(3, 0, 1, 2))
+
+
+def _unshuffle_bytes(planes):
+    return np.ascontiguousarray(planes.transpose(1, 2, 3, 0)).view('<u2')[..., 0]
+
+
+class ChunkedDepthWriter(object):
+    """
+    Write the depth frames of an episode into an npz file, one compressed entry per `frames_per_chunk` frames.
+    Only the current chunk is held in memory.
+    """
+
+    def __init__(self, path, frames_per_chunk=1):
+        self.path = str(path)
+        self.frames_per_chunk = frames_per_chunk
+        self.frames = []
+        self.num_chunks = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.zip_file = zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+
+    def write(self, depth):
+        self.frames.append(depth)
+        if len(self.frames) == self.frames_per_chunk:
+            self._flush()
+
+    def _flush(self):
+        if len(self.frames) == 0:
+            return
+        with self.zip_file.open(f'{self.num_chunks:06d}.npy', 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, _shuffle_bytes(np.stack(self.frames)))
+        self.num_chunks += 1
+        self.frames = []
+
+    def close(self):
+        self._flush()
+        self.zip_file.close()
+
+    def abort(self):
+        self.zip_file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def open_depth_writer(info, dataset_root, depth_key, episode_index, max_pending=16):
+    """
+    Open the writer of a depth stream of an episode, with `write(depth)`, `close()` and `abort()`.
+    """
+    path = os.path.join(dataset_root, get_depth_path(info, depth_key, episode_index))
+    if info['storage'] == 'ffv1':
+        height, width = info['shape']
+        return VideoStreamEncoder(path, info['fps'], width, height, vcodec='ffv1', pix_fmt='gray16le',
+                                  g=1, crf=None, max_pending=max_pending, input_format='gray16le')
+    elif info['storage'] == 'chunked':
+        return ChunkedDepthWriter(path, info['frames_per_chunk'])
+    else:
+        raise ValueError(f'Unknown depth storage: {info["storage"]}')
+
+
+class DepthReader(object):
+    """
+    Random-access reader of the depth frames stored with `depth_storage` 'ffv1' or 'chunked'.
+    The last opened episode file (and decoded chunk) is kept, so that sequential reads are cheap.
+
+    Examples:
+        ```python
+        reader = DepthReader('/path/to/dataset')
+        depth = reader.read('observation.depths.front', episode_index=0, frame_index=10)  # (H, W) uint16
+        depths = reader.read_episode('observation.depths.front', episode_index=0)  # (N, H, W) uint16
+        ```
+    """
+
+    def __init__(self, dataset_root):
+        self.dataset_root = str(dataset_root)
+        self.info = load_depth_info(self.dataset_root)
+        if self.info is None:
+            raise FileNotFoundError(f'No depth info found at {os.path.join(self.dataset_root, DEPTH_INFO_PATH)}')
+        self.opened = {}
+        self.chunk = (None, None)
+
+    def _open(self, depth_key, episode_index):
+        key = (depth_key, episode_index)
+        if key not in self.opened:
+            self.close()
+            path = os.path.join(self.dataset_root, get_depth_path(self.info, depth_key, episode_index))
+            self.opened[key] = av.open(path) if self.info['storage'] == 'ffv1' else np.load(path)
+        return self.opened[key]
+
+    def read(self, depth_key, episode_index, frame_index):
+        if self.info['storage'] == 'ffv1':
+            container = self._open(depth_key, episode_index)
+            stream = container.streams.video[0]
+            pts = int(round(frame_index / self.info['fps'] / stream.time_base))
+            container.seek(pts, stream=stream, backward=True, any_frame=False)
+            for frame in container.decode(stream):
+                if frame.pts >= pts:
+                    return frame.to_ndarray()
+            raise IndexError(f'Frame {frame_index} is out of range for episode {episode_index} of {depth_key}')
+
+        chunk_index, offset = divmod(frame_index, self.info['frames_per_chunk'])
+        chunk_key = (depth_key, episode_index, chunk_index)
+        if self.chunk[0] != chunk_key:
+            self.chunk = (chunk_key, _unshuffle_bytes(self._open(depth_key, episode_index)[f'{chunk_index:06d}']))
+        return self.chunk[1][offset]
+
+    def read_episode(self, depth_key, episode_index):
+        path = os.path.join(self.dataset_root, get_depth_path(self.info, depth_key, episode_index))
+        if self.info['storage'] == 'ffv1':
+            with av.open(path) as container:
+                return np.stack([frame.to_ndarray() for frame in container.decode(video=0)])
+        with np.load(path) as chunks:
+            return np.concatenate([_unshuffle_bytes(chunks[name]) for name in sorted(chunks.files)])
+
+    def close(self):
+        for opened in self.opened.values():
+            opened.close()
+        self.opened = {}
+        self.chunk = (None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,173 @@
+"""
+This module is used to select the frames of an episode to keep, by filtering out no-op frames
+(frames where no arm moves more than the position, rotation or gripper thresholds), including:
+1. Pairwise filtering (a frame is kept if it moved relative to the previous frame)
+2. Keyframe filtering (a frame is kept if it moved relative to the last kept frame, the greedy semantics of the original per-frame loop)
+3. Idle trimming (the leading and trailing segments where the operator holds still are cut before any image is decoded)
+"""
+
+import numpy as np
+
+
+def moved_mask(states, reference_states, position_threshold, rotation_threshold, gripper_threshold):
+    """
+    Check whether the states moved relative to the reference states for any arm.
+
+    Args:
+        states (np.ndarray): States of shape (N, 7 * num_arms).
+        reference_states (np.ndarray): Reference states of shape (N, 7 * num_arms) or (7 * num_arms,).
+        position_threshold (float): Threshold on the norm of the position difference.
+        rotation_threshold (float): Threshold on the norm of the euler angle difference.
+        gripper_threshold (float): Threshold on the absolute gripper difference.
+
+    Returns:
+        np.ndarray: Boolean mask of shape (N,).
+    """
+    diffs = (states - reference_states).reshape(len(states), -1, 7)
+    position_diff = np.linalg.norm(diffs[:, :, :3], axis=-1)
+    rotation_diff = np.linalg.norm(diffs[:, :, 3:6], axis=-1)
+    gripper_diff = np.abs(diffs[:, :, 6])
+    moved = (
+        (position_diff > position_threshold)
+        | (rotation_diff > rotation_threshold)
+        | (gripper_diff > gripper_threshold)
+    )
+    return moved.any(axis=1)
+
+
+def nonoop_mask(states, position_threshold, rotation_threshold, gripper_threshold):
+    """
+    Check for every pair of consecutive states whether any arm moved, returns a boolean mask of shape (T-1,).
+    """
+    return moved_mask(states[1:], states[:-1], position_threshold, rotation_threshold, gripper_threshold)
+
+
+def _first_moved(states, anchor, start, position_threshold, rotation_threshold, gripper_threshold):
+    """
+    Find the first frame from `start` that moved relative to the anchor frame, searching in doubling windows.
+    """
+    window = 16
+    while start < len(states):
+        end = min(start + window, len(states))
+        moved = moved_mask(states[start:end], states[anchor], position_threshold, rotation_threshold, gripper_threshold)
+        if moved.any():
+            return start + int(np.argmax(moved))
+        start, window = end, window * 2
+    return None
+
+
+def select_keyframes(states, position_threshold, rotation_threshold, gripper_threshold, mode='keyframe'):
+    """
+    Select the frames to keep in an episode, the first frame is always kept.
+
+    The 'keyframe' mode reproduces the greedy semantics (compare every frame to the last kept frame)
+    without a per-frame loop: runs of frames that all move relative to their predecessor are accepted at once
+    from the pairwise mask, and a vectorized search is only run after a no-op frame,
+    so the number of Python iterations is the number of idle segments instead of the number of frames.
+
+    Args:
+        states (np.ndarray): States of the whole episode of shape (T, 7 * num_arms).
+        position_threshold (float): Threshold on the norm of the position difference.
+        rotation_threshold (float): Threshold on the norm of the euler angle difference.
+        gripper_threshold (float): Threshold on the absolute gripper difference.
+        mode (str): One of 'keyframe', 'pairwise' or 'none'.
+
+    Returns:
+        np.ndarray: Sorted indices of the kept frames.
+    """
+    num_frames = len(states)
+    if mode == 'none' or num_frames < 2:
+        return np.arange(num_frames)
+
+    thresholds = (position_threshold, rotation_threshold, gripper_threshold)
+    moved_next = nonoop_mask(states, *thresholds)
+    if mode == 'pairwise':
+        return np.concatenate(([0], np.flatnonzero(moved_next) + 1))
+    elif mode != 'keyframe':
+        raise ValueError(f'Unknown nonoop filter mode: {mode}')
+
+    stalls = np.flatnonzero(~moved_next)
+    runs = []
+    anchor = 0
+    while True:
+        # every frame after the anchor is kept until the first frame that does not move relative to its predecessor
+        stall_idx = np.searchsorted(stalls, anchor)
+        run_end = stalls[stall_idx] if stall_idx < len(stalls) else num_frames - 1
+        runs.append(np.arange(anchor, run_end + 1))
+
+        anchor = _first_moved(states, run_end, run_end + 2, *thresholds)
+        if anchor is None:
+            break
+    return np.concatenate(runs)
+
+
+def active_mask(states, dt, position_velocity, rotation_velocity, gripper_velocity):
+    """
+    Check for every pair of consecutive states whether any arm moves faster than the velocity thresholds,
+    euler angle differences are wrapped to [-pi, pi). `dt` is the time in seconds between consecutive states,
+    a scalar or an array of shape (T-1,). Returns a boolean mask of shape (T-1,).
+    """
+    diffs = np.diff(states, axis=0).reshape(len(states) - 1, -1, 7)
+    diffs[:, :, 3:6] = (diffs[:, :, 3:6] + np.pi) % (2 * np.pi) - np.pi
+    dt = np.reshape(dt, (-1, 1))
+    position_speed = np.linalg.norm(diffs[:, :, :3], axis=-1) / dt
+    rotation_speed = np.linalg.norm(diffs[:, :, 3:6], axis=-1) / dt
+    gripper_speed = np.abs(diffs[:, :, 6]) / dt
+    active = (
+        (position_speed > position_velocity)
+        | (rotation_speed > rotation_velocity)
+        | (gripper_speed > gripper_velocity)
+    )
+    return active.any(axis=1)
+
+
+def trim_idle(states, timestamps, position_velocity, rotation_velocity, gripper_velocity, min_active_frames=5, margin=0.0):
+    """
+    Find the active part of an episode, without its leading and trailing idle segments.
+    With hysteresis, motion only starts (ends) at the first (last) run of `min_active_frames` consecutive frames
+    moving faster than the thresholds, so that isolated spikes of sensor noise do not end an idle segment.
+    Speeds are computed from the timestamps of the frames, so that the thresholds hold whatever the rate of the recording.
+
+    Args:
+        states (np.ndarray): States of the whole episode of shape (T, 7 * num_arms).
+        timestamps (np.ndarray): Timestamps in seconds of the states, of shape (T,).
+        position_velocity (float): Threshold on the speed of the position, in units per second.
+        rotation_velocity (float): Threshold on the angular speed of the euler angles, in radians per second.
+        gripper_velocity (float): Threshold on the absolute speed of the gripper, in units per second.
+        min_active_frames (int): Number of consecutive moving frames that start or end the motion.
+        margin (float): Duration in seconds of the idle frames kept before the start and after the end of the motion.
+
+    Returns:
+        Tuple[int, int]: Range [start, end) of the frames to keep, the whole episode if it never moves.
+
+    Examples:
+        ```python
+        start, end = trim_idle(states, np.arange(len(states)) / 30, position_velocity=0.02, rotation_velocity=0.1,
+                               gripper_velocity=0.1, margin=0.5)
+        keyframes = start + select_keyframes(states[start:end], 1e-3, 1e-2, 1e-2)
+        ```
+    """
+    num_frames = len(states)
+    if num_frames < 2:
+        return 0, num_frames
+
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    dt = np.diff(timestamps)
+    # frames matched twice by the synchronization have no time between them, they move at the typical rate
+    valid = dt > 0
+    if not valid.all():
+        dt[~valid] = np.median(dt[valid]) if valid.any() else 1.0
+    active = active_mask(states, dt, position_velocity, rotation_velocity, gripper_velocity)
+    min_active_frames = max(1, min(min_active_frames, len(active)))
+    # runs[i] is True if the transitions i .. i + min_active_frames - 1 all move
+    runs = np.convolve(active, np.ones(min_active_frames, dtype=np.int64), mode='valid') == min_active_frames
+    run_starts = np.flatnonzero(runs)
+    if len(run_starts) == 0:
+        return 0, num_frames
+
+    # transition i goes from frame i to frame i + 1, frames within `margin` seconds of the motion are kept
+    motion_start, motion_end = int(run_starts[0]), int(run_starts[-1]) + min_active_frames
+    tolerance = 1e-6
+    start = int(np.searchsorted(timestamps, timestamps[motion_start] - margin - tolerance, side='left'))
+    end = int(np.searchsorted(timestamps, timestamps[motion_end] + margin + tolerance, side='right'))
+    return min(start, motion_start), max(end, motion_end + 1)
@@ -0,0 +1,108 @@
+"""
+This module is used to ingest the IMU topics of a raw Pika episode (e.g. `imu/9axis/pika_l`, ~150 Hz),
+which are recorded at a much higher rate than the camera frames, either by:
+1. resampling them onto the frames ('mean' / 'last' / 'stack'), as a state feature of the dataset.
+2. keeping them at their native rate ('native') in a per-episode side table next to the dataset,
+   whose samples are tagged with the index of the frame they belong to.
+All resampling is vectorized with `searchsorted` lookups and cumulative sums.
+"""
+
+import os
+
+import numpy as np
+
+from .sync import match_timestamps
+
+
+IMU_KEYS = [
+    'angular_velocity.x', 'angular_velocity.y', 'angular_velocity.z',
+    'linear_acceleration.x', 'linear_acceleration.y', 'linear_acceleration.z',
+    'orientation.x', 'orientation.y', 'orientation.z', 'orientation.w',
+]
+IMU_RESAMPLE_METHODS = ['mean', 'last', 'stack', 'native']
+# not parquet, LeRobot counts the parquet files of a dataset to check its episodes
+IMU_PATH = 'imu/chunk-{episode_chunk:03d}/episode_{episode_index:06d}.npz'
+
+
+def get_imu_names(imu_dirs, imu_keys, method='mean', num_samples=1):
+    """
+    Names of the values of the IMU feature, e.g. 'pika_l.angular_velocity.x' (or 'pika_l.angular_velocity.x[t-1]' for 'stack').
+    """
+    names = [f'{os.path.basename(imu_dir)}.{key}' for imu_dir in imu_dirs for key in imu_keys]
+    if method != 'stack':
+        return names
+    return [f'{name}[t-{k}]' for k in range(num_samples - 1, -1, -1) for name in names]
+
+
+def merge_imu_topics(topics):
+    """
+    Merge IMU topics onto the timestamps of the first one, the samples of the others are matched to the nearest
+    (the IMUs of a Pika recording are sampled together, so they share nearly the same timestamps).
+
+    Args:
+        topics (List[Tuple[np.ndarray, np.ndarray]]): Sorted timestamps (M_i,) and values (M_i, D_i) of every topic.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Timestamps (M,) and values (M, sum(D_i)).
+    """
+    timestamps = topics[0][0]
+    values = [topics[0][1]]
+    for topic_timestamps, topic_values in topics[1:]:
+        indices, _ = match_timestamps(topic_timestamps, timestamps, method='nearest')
+        values.append(topic_values[indices])
+    return timestamps, np.concatenate(values, axis=1)
+
+
+def resample_imu(timestamps, values, frame_timestamps, method='mean', num_samples=1):
+    """
+    Resample IMU samples onto frames. The window of frame i holds the samples in (frame_timestamps[i - 1], frame_timestamps[i]]
+    (all samples up to frame_timestamps[0] for the first frame).
+
+    Args:
+        timestamps (np.ndarray): Sorted timestamps of the IMU samples, of shape (M,).
+        values (np.ndarray): IMU samples, of shape (M, D).
+        frame_timestamps (np.ndarray): Sorted timestamps of the frames, of shape (N,).
+        method (str): 'mean' (mean of the window, or the last sample if the window is empty),
+                      'last' (last sample not after the frame) or 'stack' (last `num_samples` samples not after the frame).
+        num_samples (int): Number of stacked samples for 'stack'.
+
+    Returns:
+        np.ndarray: Resampled values of shape (N, D), or (N, num_samples * D) for 'stack' (oldest sample first).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    ends = np.searchsorted(timestamps, frame_timestamps, side='right')
+    last = np.clip(ends - 1, 0, len(timestamps) - 1)
+
+    if method == 'last':
+        return values[last]
+    elif method == 'stack':
+        indices = np.clip(ends[:, None] - np.arange(num_samples, 0, -1)[None, :], 0, len(timestamps) - 1)
+        return values[indices].reshape(len(frame_timestamps), -1)
+    elif method == 'mean':
+        starts = np.concatenate([[0], ends[:-1]])
+        cumsum = np.concatenate([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+        counts = (ends - starts)[:, None]
+        means = (cumsum[ends] - cumsum[starts]) / np.maximum(counts, 1)
+        return np.where(counts > 0, means, values[last])
+    else:
+        raise ValueError(f'Unknown IMU resample method: {method}, choose from {IMU_RESAMPLE_METHODS}')
+
+
+def get_imu_path(episode_index, chunks_size=1000):
+    return IMU_PATH.format(episode_chunk=episode_index // chunks_size, episode_index=episode_index)
+
+
+def write_imu_table(path, timestamps, values, names, frame_timestamps):
+    """
+    Write the IMU samples of an episode at their native rate, for the samples within (frame_timestamps[0], frame_timestamps[-1]].
+    Arrays are 'timestamp' (seconds since frame_timestamps[0]), 'frame_index' (j for the samples in
+    (frame_timestamps[j], frame_timestamps[j + 1]], i.e. the window of frame j + 1 in `resample_imu`) and one array per name.
+    """
+    mask = (timestamps > frame_timestamps[0]) & (timestamps <= frame_timestamps[-1])
+    columns = {
+        'timestamp': timestamps[mask] - frame_timestamps[0],
+        'frame_index': np.searchsorted(frame_timestamps, timestamps[mask], side='left') - 1,
+    }
+    columns.update({name: values[mask, i] for i, name in enumerate(names)})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, **columns)
@@ -0,0 +1,281 @@
+"""
+This module is used to index the listings of raw Pika episodes, one parquet file per source root, so that conversions,
+validations and statistics find the episodes and the frames of their topics without listing thousands of directories.
+Every (episode, topic) row holds the frame filenames sorted by timestamp, their timestamps and sizes, and the lines of
+`sync.txt`. Rows are keyed by the modification time of the topic directory, and the index is updated incrementally:
+only the topics of new or changed episodes are listed again.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from . import archive
+from .topics import IMAGE_EXTENSIONS, JSON_EXTENSIONS, filename_to_timestamp, list_topic_files, load_sync
+from .validate import scan_topic
+
+
+INDEX_FILENAME = '.pika_index.parquet'
+# mtime of the topic directories that do not exist
+MISSING_MTIME = -1
+
+_SCHEMA = pa.schema([
+    ('episode', pa.string()),
+    ('topic', pa.string()),
+    ('mtime', pa.int64()),
+    ('filenames', pa.list_(pa.string())),
+    ('timestamps', pa.list_(pa.float64())),
+    ('sizes', pa.list_(pa.int64())),
+    ('sync', pa.list_(pa.string())),
+])
+
+
+def get_index_path(source_data_root, index_root=None):
+    """
+    Get the index path of a source root, inside the root by default (next to the archive for archives),
+    or under `index_root` (keyed by a hash of the root path) for read-only source directories.
+    """
+    source_data_root = os.path.normpath(source_data_root)
+    if index_root is None:
+        if source_data_root.endswith(archive.ARCHIVE_EXTENSIONS):
+            return f'{source_data_root}{INDEX_FILENAME}'
+        return os.path.join(source_data_root, INDEX_FILENAME)
+    root_hash = hashlib.sha1(os.path.abspath(source_data_root).encode()).hexdigest()[:16]
+    return os.path.join(index_root, f'{os.path.basename(source_data_root)}_{root_hash}.parquet')
+
+
+def _get_archive_root(archive_path, is_episode):
+    # archives packed from a directory (`tar cf episode0.tar episode0`, `tar cf pika.tar pika`) hold it as their only entry
+    names = archive.listdir(archive_path)
+    if len(names) == 1 and archive.isdir(os.path.join(archive_path, names[0])) \
+            and names[0].startswith('episode') == is_episode:
+        return os.path.join(archive_path, names[0])
+    return archive_path
+
+
+def find_episode_paths(source_data_root):
+    """
+    List the episodes of a source root, sorted by index: `episode<N>` directories, or `episode<N>.tar` / `episode<N>.zip`
+    archives, in a directory or in an archive of the whole root.
+    """
+    if source_data_root.endswith(archive.ARCHIVE_EXTENSIONS):
+        source_data_root = _get_archive_root(source_data_root, is_episode=False)
+    episode_names = {}
+    for name in archive.listdir(source_data_root):
+        index = name[7:][:-4] if name.endswith(archive.ARCHIVE_EXTENSIONS) else name[7:]
+        if name.startswith('episode') and index.isdigit():
+            episode_names[name] = int(index)
+
+    episode_paths = []
+    for name in sorted(episode_names, key=episode_names.get):
+        episode_path = os.path.join(source_data_root, name)
+        if name.endswith(archive.ARCHIVE_EXTENSIONS):
+            episode_path = _get_archive_root(episode_path, is_episode=True)
+        episode_paths.append(episode_path)
+    return episode_paths
+
+
+def scan_topic_dir(topic_dir):
+    """
+    List a topic directory into an index row: frame filenames sorted by timestamp, their timestamps and sizes,
+    and the lines of `sync.txt` (None if it does not exist).
+    """
+    sizes = archive.list_file_sizes(topic_dir)
+    filenames = sorted((name for name in sizes if name.endswith(IMAGE_EXTENSIONS + JSON_EXTENSIONS)), key=filename_to_timestamp)
+    return {
+        'filenames': filenames,
+        'timestamps': [filename_to_timestamp(filename) for filename in filenames],
+        'sizes': [sizes[filename] for filename in filenames],
+        'sync': load_sync(os.path.join(topic_dir, 'sync.txt')) if 'sync.txt' in sizes else None,
+    }
+
+
+class SourceIndex(object):
+    """
+    Index of the episodes of a source root and of the listings of their topics, stored as one parquet file.
+    Rows are read from the parquet table on demand, so large indexes are loaded in milliseconds.
+
+    Attributes:
+        source_data_root: The indexed source root (a directory or an archive).
+        index_path: Path of the parquet file (seeing `get_index_path`).
+        episodes: Indexed episodes, relative to the root and in the order of `find_episode_paths`.
+        topics: Indexed topic directories, relative to the episodes.
+
+    Examples:
+        ```python
+        index = SourceIndex('/path/to/pika/data')
+        episode_paths = index.update(['camera/color/pikaDepthCamera_l', 'localization/pose/pika_l'])
+        index.save()  # only writes if a topic was (re-)listed
+        filenames = index.list_topic_files(episode_paths[0], 'localization/pose/pika_l', JSON_EXTENSIONS)
+        ```
+    """
+
+    def __init__(self, source_data_root, index_root=None):
+        self.source_data_root = os.path.normpath(source_data_root)
+        self.index_path = get_index_path(source_data_root, index_root)
+        self.table = _SCHEMA.empty_table()
+        if os.path.exists(self.index_path):
+            self.table = pq.read_table(self.index_path, schema=_SCHEMA)
+        self._load_rows()
+        self.updates = {}
+        self.dirty = False
+
+    def _load_rows(self):
+        episodes, topics = self.table.column('episode').to_pylist(), self.table.column('topic').to_pylist()
+        self.rows = {key: row for row, key in enumerate(zip(episodes, topics))}
+        self.episodes = list(dict.fromkeys(episodes))
+        self.topics = list(dict.fromkeys(topics))
+        self.mtimes = self.table.column('mtime').to_numpy()
+
+    def _relpath(self, episode_path):
+        return os.path.relpath(os.path.normpath(episode_path), self.source_data_root)
+
+    def episode_paths(self):
+        return [os.path.join(self.source_data_root, episode) for episode in self.episodes]
+
+    def get(self, episode_path, topic):
+        """
+        Get the row of a topic of an episode ({'mtime', 'filenames', 'timestamps', 'sizes', 'sync'}), or None if not indexed.
+        """
+        key = (self._relpath(episode_path), topic)
+        if key in self.updates:
+            return self.updates[key]
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        columns = self.table.slice(row, 1).drop(['episode', 'topic']).to_pydict()
+        return {name: column[0] for name, column in columns.items()}
+
+    def update(self, topics, num_workers=16):
+        """
+        List the episodes of the root, and (re-)list the topics of the episodes that are new or whose topic directories
+        changed since they were indexed (by modification time). Episodes no longer in the root are dropped.
+
+        Args:
+            topics (List[str]): Topic directories to index, relative to the episodes.
+            num_workers (int): Number of threads checking and listing the topic directories.
+
+        Returns:
+            List[str]: Paths of the episodes of the root.
+        """
+        episode_paths = find_episode_paths(self.source_data_root)
+        episodes = [self._relpath(episode_path) for episode_path in episode_paths]
+        topics = list(dict.fromkeys(self.topics + list(topics)))
+        keys = [(episode, topic) for episode in episodes for topic in topics]
+
+        def update_fn(key):
+            topic_dir = os.path.join(self.source_data_root, *key)
+            mtime = archive.getmtime_ns(topic_dir) if archive.isdir(topic_dir) else MISSING_MTIME
+            if key in self.rows and self.mtimes[self.rows[key]] == mtime:
+                return None
+            if mtime == MISSING_MTIME:
+                return {'mtime': mtime, 'filenames': [], 'timestamps': [], 'sizes': [], 'sync': None}
+            return {'mtime': mtime, **scan_topic_dir(topic_dir)}
+
+        with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+            for key, entry in zip(keys, executor.map(update_fn, keys)):
+                if entry is not None:
+                    self.updates[key] = entry
+        self.dirty = self.dirty or len(self.updates) > 0 or episodes != self.episodes
+        self.episodes, self.topics = episodes, topics
+        return episode_paths
+
+    def save(self):
+        if not self.dirty:
+            return
+        # unchanged rows are taken from the table as they are, then the table is put back in episode order
+        rows, new_keys, order = [], [], []
+        for episode in self.episodes:
+            for topic in self.topics:
+                key = (episode, topic)
+                if key in self.updates:
+                    order.append(('new', len(new_keys)))
+                    new_keys.append(key)
+                elif key in self.rows:
+                    order.append(('old', len(rows)))
+                    rows.append(self.rows[key])
+        new_table = pa.table({
+            'episode': [key[0] for key in new_keys],
+            'topic': [key[1] for key in new_keys],
+            **{name: [self.updates[key][name] for key in new_keys] for name in _SCHEMA.names[2:]},
+        }, schema=_SCHEMA)
+        table = pa.concat_tables([self.table.take(pa.array(rows, type=pa.int64())), new_table])
+        table = table.take(pa.array([index if kind == 'old' else len(rows) + index for kind, index in order], type=pa.int64()))
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, self.index_path)
+        self.table = table
+        self._load_rows()
+        self.updates = {}
+        self.dirty = False
+
+    def fingerprint(self, episode_path, topics):
+        """
+        Fingerprint an episode from its rows (modification time, filenames and sizes of the given topics), without touching
+        the source root, seeing `fingerprint_episode` in `src/data/misc/manifest.py`.
+        Files outside of these topics (e.g. the instruction file) are not part of it.
+
+        Returns:
+            Tuple[int, str]: Number of files and hex digest, or None if a topic of the episode is not indexed.
+        """
+        digest = hashlib.sha1()
+        num_files = 0
+        for topic in sorted(topics):
+            entry = self.get(episode_path, topic)
+            if entry is None:
+                return None
+            digest.update(f'{topic}:{entry["mtime"]};'.encode())
+            for filename, size in zip(entry['filenames'], entry['sizes']):
+                digest.update(f'{filename}:{size};'.encode())
+            num_files += len(entry['filenames'])
+        return num_files, digest.hexdigest()
+
+    def list_topic_files(self, episode_path, topic_dir, extensions, use_sync=True):
+        """
+        List the frame filenames of a topic from the index, like `list_topic_files` in `src/data/misc/topics.py`.
+        Topics missing from the index are listed from the episode.
+        """
+        entry = self.get(episode_path, topic_dir)
+        if entry is None:
+            return list_topic_files(os.path.join(episode_path, topic_dir), extensions, use_sync)
+        if entry['mtime'] == MISSING_MTIME:
+            raise FileNotFoundError(f'No topic {topic_dir} in {episode_path}')
+        if use_sync and entry['sync'] is not None:
+            return list(entry['sync'])
+        return [filename for filename in entry['filenames'] if filename.endswith(extensions)]
+
+    def scan_topic(self, episode_path, topic_dir, extensions):
+        """
+        List a topic from the index, like `scan_topic` in `src/data/misc/validate.py`.
+        """
+        entry = self.get(episode_path, topic_dir)
+        if entry is None:
+            return scan_topic(os.path.join(episode_path, topic_dir), extensions)
+        if entry['mtime'] == MISSING_MTIME:
+            raise FileNotFoundError(f'No topic {topic_dir} in {episode_path}')
+        mask = np.array([filename.endswith(extensions) for filename in entry['filenames']], dtype=bool)
+        filenames = {filename for filename, keep in zip(entry['filenames'], mask) if keep}
+        return filenames, np.array(entry['timestamps'], dtype=np.float64)[mask], entry['sync']
+
+    def summary(self):
+        """
+        Number of episodes, and frames and bytes of every topic over all episodes.
+        """
+        table = self.table.select(['topic', 'mtime', 'filenames', 'sizes'])
+        summary = {'episodes': len(self.episodes), 'topics': {}}
+        for topic in self.topics:
+            rows = table.filter(pc.equal(table.column('topic'), topic))
+            summary['topics'][topic] = {
+                'missing': int(pc.sum(pc.equal(rows.column('mtime'), MISSING_MTIME)).as_py() or 0),
+                'frames': int(pc.sum(pc.list_value_length(rows.column('filenames'))).as_py() or 0),
+                'bytes': int(pc.sum(pc.list_flatten(rows.column('sizes'))).as_py() or 0),
+            }
+        return summary
+
@@ -0,0 +1,75 @@
+"""
+This module is used to locate the files of a converted dataset (the LeRobot metadata, and the files that this repository
+stores next to the LeRobot files), and to read and write its metadata. It imports no other module of `src/data/misc`,
+so that both the writers of these files (e.g. `src/data/misc/depth.py`) and the tools moving them between datasets
+(e.g. `src/data/misc/merge.py`) share it.
+"""
+
+import json
+import os
+import shutil
+
+
+INFO_PATH = 'meta/info.json'
+EPISODES_PATH = 'meta/episodes.jsonl'
+EPISODES_STATS_PATH = 'meta/episodes_stats.jsonl'
+TASKS_PATH = 'meta/tasks.jsonl'
+DEPTH_INFO_PATH = 'meta/depth_info.json'
+# columns renumbered when episodes are merged
+INDEX_COLUMNS = ['episode_index', 'index', 'task_index']
+
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_json(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+
+def load_jsonlines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_jsonlines(items, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+def transfer_file(src_path, dst_path, mode):
+    """
+    Transfer a file of a dataset to another dataset, with `mode` 'move', 'link' (hard-link) or 'copy'.
+    """
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    if mode == 'move':
+        shutil.move(src_path, dst_path)
+    elif mode == 'link':
+        os.link(src_path, dst_path)
+    elif mode == 'copy':
+        shutil.copyfile(src_path, dst_path)
+    else:
+        raise ValueError(f'Unknown transfer mode: {mode}')
+
+
+def load_depth_info(dataset_root):
+    """
+    Load the depth info of a dataset (seeing `src/data/misc/depth.py`), or None if its depth is not stored outside of the parquet files.
+    """
+    path = os.path.join(dataset_root, DEPTH_INFO_PATH)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def get_depth_path(info, depth_key, episode_index):
+    return info['path'].format(
+        episode_chunk=episode_index // info['chunks_size'], depth_key=depth_key, episode_index=episode_index)
@@ -0,0 +1,225 @@
+"""
+This module is used to record which source episodes were converted into a LeRobot dataset,
+so that conversions can append only new episodes, report the ones that changed, and resume cleanly after a crash.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from . import archive
+from .topics import find_source_index
+
+
+MANIFEST_PATH = 'meta/conversion_manifest.jsonl'
+# prefix of the fingerprints computed from a source index, which differ from the ones computed from the files
+INDEX_FINGERPRINT_PREFIX = 'index:'
+_EPISODE_FILE_PATTERN = re.compile(r'episode_(\d+)\.(parquet|mp4|mkv|npz)$')
+_EPISODE_DIR_PATTERN = re.compile(r'episode_(\d+)$')
+
+
+def fingerprint_episode(episode_path, source_index=None, topics=()):
+    """
+    Fingerprint a source episode by the relative path, size and modification time of all its files
+    (the modification time of the archive for episodes read from an archive).
+    If a source index covers the episode, the fingerprint is computed from its rows of the given topics instead
+    (seeing `SourceIndex.fingerprint` in `src/data/misc/index.py`), so that no directory of the source root is listed.
+
+    Returns:
+        Tuple[int, str]: Number of files and hex digest.
+    """
+    if source_index is not None:
+        fingerprint = source_index.fingerprint(episode_path, topics)
+        if fingerprint is not None:
+            return fingerprint[0], INDEX_FINGERPRINT_PREFIX + fingerprint[1]
+
+    digest = hashlib.sha1()
+    num_files = 0
+    index, member_path = archive.split_archive_path(episode_path)
+    if index is not None:
+        mtime_ns = os.stat(index.path).st_mtime_ns
+        for name, size in sorted(index.file_sizes(member_path).items()):
+            if not os.path.basename(name).startswith('.'):
+                digest.update(f'{name}:{size}:{mtime_ns};'.encode())
+                num_files += 1
+        return num_files, digest.hexdigest()
+
+    stack = [episode_path]
+    while len(stack) > 0:
+        entries = sorted(os.scandir(stack.pop()), key=lambda entry: entry.name)
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif not entry.name.startswith('.'):
+                stat = entry.stat(follow_symlinks=False)
+                digest.update(f'{os.path.relpath(entry.path, episode_path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+                num_files += 1
+    return num_files, digest.hexdigest()
+
+
+def remove_partial_episodes(dataset_root, total_episodes):
+    """
+    Remove the parquet / video / depth / IMU / variant action files and temporary images left by an episode whose conversion
+    crashed before its metadata was committed (episode index >= `total_episodes`, as returned by `reconcile_episodes_meta`
+    in `src/data/misc/merge.py`).
+    Temporary images of committed episodes are kept, their videos may still have to be encoded.
+    """
+    removed = []
+    for directory in ['data', 'videos', 'depth', 'imu', 'variant_actions']:
+        for root, _, filenames in os.walk(os.path.join(dataset_root, directory)):
+            for filename in filenames:
+                match = _EPISODE_FILE_PATTERN.match(filename)
+                if match is not None and int(match.group(1)) >= total_episodes:
+                    os.remove(os.path.join(root, filename))
+                    removed.append(os.path.join(root, filename))
+
+    images_root = os.path.join(dataset_root, 'images')
+    if os.path.isdir(images_root):
+        for image_key in os.listdir(images_root):
+            for episode_dir in os.listdir(os.path.join(images_root, image_key)):
+                match = _EPISODE_DIR_PATTERN.match(episode_dir)
+                if match is None or int(match.group(1)) >= total_episodes:
+                    shutil.rmtree(os.path.join(images_root, image_key, episode_dir))
+    return removed
+
+
+class ConversionManifest(object):
+    """
+    Append-only manifest of converted source episodes, stored in the dataset at `meta/conversion_manifest.jsonl`.
+    A 'started' record is written before an episode is added and a 'done' record once it is saved,
+    each with the episode path, file count, fingerprint and resulting episode index.
+    Episodes are fingerprinted from the indexes of their source roots if set (seeing `use_source_indexes`).
+
+    Examples:
+        ```python
+        manifest = ConversionManifest(dataset_root)
+        manifest.recover(total_episodes)
+        for episode_path in manifest.filter(episode_paths):
+            manifest.start(episode_path, episode_index)
+            ...  # convert the episode
+            manifest.finish(episode_path, episode_index)
+        ```
+    """
+
+    def __init__(self, dataset_root):
+        self.path = os.path.join(dataset_root, MANIFEST_PATH)
+        self.episodes = {}
+        self.pending = {}
+        self.fingerprints = {}
+        self.changed = []
+        self.source_indexes = None
+        self.source_topics = []
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record['status'] == 'started':
+                        self.pending[record['episode_path']] = record
+                    else:
+                        self.episodes[record['episode_path']] = record
+                        self.pending.pop(record['episode_path'], None)
+
+    def _write(self, record):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def recover(self, total_episodes):
+        """
+        Resolve episodes that were started but not finished by a previous run: those whose episode index
+        was committed to the dataset are marked done, the others are forgotten (and converted again).
+        """
+        for record in list(self.pending.values()):
+            if record['episode_index'] is not None and record['episode_index'] < total_episodes:
+                self._write({**record, 'status': 'done'})
+                self.episodes[record['episode_path']] = {**record, 'status': 'done'}
+        self.pending = {}
+
+    def missing_episodes(self, total_episodes):
+        """
+        Indices of the episodes of the dataset that no converted source episode is recorded for.
+        """
+        recorded = {record['episode_index'] for record in self.episodes.values()}
+        return [episode_index for episode_index in range(total_episodes) if episode_index not in recorded]
+
+    def filter(self, episode_paths):
+        """
+        Keep the episodes that were never converted. Episodes that changed since they were converted are not converted
+        again, as their previous episode would stay in the dataset: they are reported and listed in `changed`,
+        to be reconverted into a new dataset (or after removing the dataset).
+        """
+        new_episode_paths, self.changed, unverified = [], [], []
+        for episode_path in episode_paths:
+            num_files, fingerprint = self._fingerprint(episode_path)
+            self.fingerprints[episode_path] = (num_files, fingerprint)
+            record = self.episodes.get(episode_path)
+            if record is None:
+                new_episode_paths.append(episode_path)
+                continue
+            recorded_from_index = record['fingerprint'].startswith(INDEX_FINGERPRINT_PREFIX)
+            if recorded_from_index == fingerprint.startswith(INDEX_FINGERPRINT_PREFIX):
+                if record['fingerprint'] != fingerprint:
+                    self.changed.append(episode_path)
+            elif recorded_from_index:
+                unverified.append(episode_path)
+            elif fingerprint_episode(episode_path)[1] != record['fingerprint']:
+                self.changed.append(episode_path)
+            else:
+                # recorded before the source index was used, recorded again so that later runs only read the index
+                record = {**record, 'num_files': num_files, 'fingerprint': fingerprint}
+                self.episodes[episode_path] = record
+                self._write(record)
+
+        if len(unverified) > 0:
+            print(f'Skipping {len(unverified)} converted episodes whose fingerprints were computed from a source index, '
+                  f'which is not used by this run: changes to them are not detected.')
+
+        if len(self.changed) > 0:
+            changed = '\n'.join(f'  {episode_path} (episode {self.episodes[episode_path]["episode_index"]})'
+                                for episode_path in self.changed)
+            print(f'Skipping {len(self.changed)} source episodes that changed since they were converted, '
+                  f'reconvert them without `incremental` to replace their episodes:\n{changed}')
+        return new_episode_paths
+
+    def use_source_indexes(self, source_indexes, topics):
+        """
+        Fingerprint the episodes from the rows of the given topics in the indexes of their source roots.
+        """
+        self.source_indexes = source_indexes
+        self.source_topics = list(topics)
+
+    def _fingerprint(self, episode_path):
+        source_index = find_source_index(self.source_indexes, episode_path)
+        return fingerprint_episode(episode_path, source_index, self.source_topics)
+
+    def start(self, episode_path, episode_index):
+        """
+        Record that an episode is about to be converted into the given episode index.
+        """
+        if episode_path not in self.fingerprints:
+            self.fingerprints[episode_path] = self._fingerprint(episode_path)
+        num_files, fingerprint = self.fingerprints[episode_path]
+        record = {
+            'status': 'started',
+            'episode_path': episode_path,
+            'num_files': num_files,
+            'fingerprint': fingerprint,
+            'episode_index': episode_index,
+        }
+        self.pending[episode_path] = record
+        self._write(record)
+
+    def finish(self, episode_path, episode_index):
+        """
+        Record that an episode was converted into the given episode index (None if it produced no episode).
+        """
+        record = {**self.pending.pop(episode_path), 'status': 'done', 'episode_index': episode_index}
+        self.episodes[episode_path] = record
+        self._write(record)
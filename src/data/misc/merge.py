@@ -0,0 +1,249 @@
+"""
+This module is used to merge LeRobot datasets (v2.x layout) sharing the same features into one dataset.
+Only the metadata and the episode / frame / task indices of the parquet files are rewritten,
+videos are moved or copied as they are (no re-encoding).
+"""
+
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .imu import get_imu_path
+from .layout import (
+    DEPTH_INFO_PATH,
+    EPISODES_PATH,
+    EPISODES_STATS_PATH,
+    INFO_PATH,
+    TASKS_PATH,
+    append_jsonlines,
+    get_depth_path,
+    load_depth_info,
+    load_json,
+    load_jsonlines,
+    transfer_file,
+    write_json,
+)
+from .variants import get_variant_actions_path
+
+
+def _rewrite_jsonlines(items, path):
+    with open(path + '.tmp', 'w') as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+    os.replace(path + '.tmp', path)
+
+
+def reconcile_episodes_meta(dataset_root):
+    """
+    Bring `info.json`, `episodes.jsonl` and `episodes_stats.jsonl` of a dataset back in step after an interrupted write.
+    LeRobot commits the info of an episode before appending its jsonl lines, and `merge_datasets` appends the lines
+    before committing the info, so a crash leaves either missing or orphaned lines. The dataset is rolled back to its
+    last fully written episode: lines of later (or duplicated) episodes are dropped, then the info is rewritten.
+    The data and video files of the dropped episodes are left to `remove_partial_episodes` in `src/data/misc/manifest.py`.
+
+    Returns:
+        int: Number of fully written episodes.
+    """
+    info_path = os.path.join(dataset_root, INFO_PATH)
+    info = load_json(info_path)
+    meta = {}
+    for path in [EPISODES_PATH, EPISODES_STATS_PATH]:
+        lines = load_jsonlines(os.path.join(dataset_root, path))
+        items = {}
+        for item in lines:
+            items.setdefault(item['episode_index'], item)
+        meta[path] = (lines, items)
+
+    total_episodes = 0
+    while total_episodes < info['total_episodes'] and all(total_episodes in items for _, items in meta.values()):
+        total_episodes += 1
+
+    # the jsonl files first, so that an interruption here is reconciled again by the next run
+    for path, (lines, items) in meta.items():
+        kept = [items[episode_index] for episode_index in range(total_episodes)]
+        if kept != lines:
+            _rewrite_jsonlines(kept, os.path.join(dataset_root, path))
+
+    if total_episodes != info['total_episodes']:
+        episodes = meta[EPISODES_PATH][1]
+        num_video_keys = sum(feature['dtype'] == 'video' for feature in info['features'].values())
+        info.update({
+            'total_episodes': total_episodes,
+            'total_frames': sum(episodes[episode_index]['length'] for episode_index in range(total_episodes)),
+            'total_videos': total_episodes * num_video_keys,
+            'total_chunks': -(-total_episodes // info['chunks_size']),
+            'splits': {'train': f'0:{total_episodes}'} if total_episodes > 0 else {},
+        })
+        write_json(info, info_path)
+    return total_episodes
+
+
+def _index_stats(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        'min': [values.min().item()],
+        'max': [values.max().item()],
+        'mean': [values.mean().item()],
+        'std': [values.std().item()],
+        'count': [len(values)],
+    }
+
+
+def _check_features(dst_features, src_features, src_root):
+    for key in set(dst_features) | set(src_features):
+        if key not in dst_features or key not in src_features:
+            raise ValueError(f'Feature {key} is not shared by {src_root} and the destination dataset.')
+        dst_feature, src_feature = dst_features[key], src_features[key]
+        if dst_feature['dtype'] != src_feature['dtype'] or list(dst_feature['shape']) != list(src_feature['shape']):
+            raise ValueError(f'Feature {key} of {src_root} does not match the destination dataset: '
+                             f'{src_feature} vs {dst_feature}')
+
+
+def init_dataset_root(dst_root, template_root):
+    """
+    Initialize an empty dataset at `dst_root` with the info (features, fps, paths) of the dataset at `template_root`.
+    """
+    info = load_json(os.path.join(template_root, INFO_PATH))
+    info.update({
+        'total_episodes': 0,
+        'total_frames': 0,
+        'total_tasks': 0,
+        'total_videos': 0,
+        'total_chunks': 0,
+        'splits': {},
+    })
+    write_json(info, os.path.join(dst_root, INFO_PATH))
+    depth_info = load_depth_info(template_root)
+    if depth_info is not None:
+        write_json(depth_info, os.path.join(dst_root, DEPTH_INFO_PATH))
+
+
+def merge_datasets(dst_root, src_roots, mode='copy'):
+    """
+    Append all episodes of the source datasets, in order, to the destination dataset.
+
+    Args:
+        dst_root (str): Root of the destination dataset. It is initialized from the first source if it does not exist.
+        src_roots (List[str]): Roots of the source datasets.
+        mode (str): How parquet and video files are transferred, one of 'copy', 'move' or 'link' (hard-link).
+
+    Returns:
+        List[Tuple[str, int, int]]: (source root, source episode index, destination episode index) for every merged episode.
+    """
+    src_roots = [str(src_root) for src_root in src_roots]
+    dst_root = str(dst_root)
+    if not os.path.exists(os.path.join(dst_root, INFO_PATH)):
+        init_dataset_root(dst_root, src_roots[0])
+    else:
+        reconcile_episodes_meta(dst_root)
+
+    info = load_json(os.path.join(dst_root, INFO_PATH))
+    video_keys = [key for key, feature in info['features'].items() if feature['dtype'] == 'video']
+    tasks = {task['task']: task['task_index'] for task in load_jsonlines(os.path.join(dst_root, TASKS_PATH))}
+    depth_info = load_depth_info(dst_root)
+
+    merged = []
+    for src_root in src_roots:
+        src_info = load_json(os.path.join(src_root, INFO_PATH))
+        _check_features(info['features'], src_info['features'], src_root)
+        if src_info['fps'] != info['fps']:
+            raise ValueError(f'FPS of {src_root} ({src_info["fps"]}) does not match the destination ({info["fps"]}).')
+        for key in video_keys:
+            if not info['features'][key].get('info') and src_info['features'][key].get('info'):
+                info['features'][key]['info'] = src_info['features'][key]['info']
+        src_depth_info = load_depth_info(src_root)
+        if depth_info is None and src_depth_info is not None and info['total_episodes'] == 0:
+            depth_info = src_depth_info
+            write_json(depth_info, os.path.join(dst_root, DEPTH_INFO_PATH))
+        depth_storage = None if depth_info is None else (depth_info['storage'], depth_info['keys'])
+        src_depth_storage = None if src_depth_info is None else (src_depth_info['storage'], src_depth_info['keys'])
+        if depth_storage != src_depth_storage:
+            raise ValueError(f'Depth storage of {src_root} ({src_depth_storage}) does not match the destination ({depth_storage}).')
+
+        task_mapping, new_tasks = {}, []
+        for task in load_jsonlines(os.path.join(src_root, TASKS_PATH)):
+            if task['task'] not in tasks:
+                tasks[task['task']] = len(tasks)
+                new_tasks.append({'task_index': tasks[task['task']], 'task': task['task']})
+            task_mapping[task['task_index']] = tasks[task['task']]
+        append_jsonlines(new_tasks, os.path.join(dst_root, TASKS_PATH))
+
+        src_episodes_stats = {
+            item['episode_index']: item['stats']
+            for item in load_jsonlines(os.path.join(src_root, EPISODES_STATS_PATH))
+        }
+        src_episodes = sorted(load_jsonlines(os.path.join(src_root, EPISODES_PATH)), key=lambda x: x['episode_index'])
+
+        new_episodes, new_episodes_stats = [], []
+        for episode in src_episodes:
+            src_index = episode['episode_index']
+            dst_index = info['total_episodes']
+            src_chunk = src_index // src_info['chunks_size']
+            dst_chunk = dst_index // info['chunks_size']
+
+            src_data_path = os.path.join(src_root, src_info['data_path'].format(
+                episode_chunk=src_chunk, episode_index=src_index))
+            dst_data_path = os.path.join(dst_root, info['data_path'].format(
+                episode_chunk=dst_chunk, episode_index=dst_index))
+            table = pq.read_table(src_data_path)
+            num_frames = table.num_rows
+            columns = {
+                'episode_index': np.full(num_frames, dst_index),
+                'index': np.arange(info['total_frames'], info['total_frames'] + num_frames),
+                'task_index': np.array([task_mapping[i] for i in table.column('task_index').to_pylist()]),
+            }
+            for name, values in columns.items():
+                column_idx = table.schema.get_field_index(name)
+                column_type = table.schema.field(name).type
+                table = table.set_column(column_idx, name, pa.array(values, type=column_type))
+            os.makedirs(os.path.dirname(dst_data_path), exist_ok=True)
+            pq.write_table(table, dst_data_path)
+            if mode == 'move':
+                os.remove(src_data_path)
+
+            for key in video_keys:
+                src_video_path = os.path.join(src_root, src_info['video_path'].format(
+                    episode_chunk=src_chunk, video_key=key, episode_index=src_index))
+                dst_video_path = os.path.join(dst_root, info['video_path'].format(
+                    episode_chunk=dst_chunk, video_key=key, episode_index=dst_index))
+                transfer_file(src_video_path, dst_video_path, mode)
+
+            for key in [] if depth_info is None else depth_info['keys']:
+                transfer_file(os.path.join(src_root, get_depth_path(src_depth_info, key, src_index)),
+                               os.path.join(dst_root, get_depth_path(depth_info, key, dst_index)), mode)
+
+            src_imu_path = os.path.join(src_root, get_imu_path(src_index, src_info['chunks_size']))
+            if os.path.exists(src_imu_path):
+                transfer_file(src_imu_path, os.path.join(dst_root, get_imu_path(dst_index, info['chunks_size'])), mode)
+            src_actions_path = os.path.join(src_root, get_variant_actions_path(src_index, src_info['chunks_size']))
+            if os.path.exists(src_actions_path):
+                transfer_file(src_actions_path,
+                               os.path.join(dst_root, get_variant_actions_path(dst_index, info['chunks_size'])), mode)
+
+            new_episodes.append({**episode, 'episode_index': dst_index})
+            if src_index in src_episodes_stats:
+                stats = dict(src_episodes_stats[src_index])
+                for name, values in columns.items():
+                    if name in stats:
+                        stats[name] = _index_stats(values)
+                new_episodes_stats.append({'episode_index': dst_index, 'stats': stats})
+
+            info['total_episodes'] += 1
+            info['total_frames'] += num_frames
+            info['total_chunks'] = max(info['total_chunks'], dst_chunk + 1)
+            merged.append((src_root, src_index, dst_index))
+
+        append_jsonlines(new_episodes, os.path.join(dst_root, EPISODES_PATH))
+        append_jsonlines(new_episodes_stats, os.path.join(dst_root, EPISODES_STATS_PATH))
+
+        # the info is committed last, after every source: the lines of an interrupted source are beyond `total_episodes`,
+        # and are dropped by `reconcile_episodes_meta`
+        info['total_tasks'] = len(tasks)
+        info['total_videos'] = info['total_episodes'] * len(video_keys)
+        info['splits'] = {'train': f'0:{info["total_episodes"]}'}
+        write_json(info, os.path.join(dst_root, INFO_PATH))
+
+    return merged
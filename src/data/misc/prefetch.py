@@ -0,0 +1,96 @@
+"""
+This module is used to decode the frames of an episode on a thread pool ahead of the dataset writer,
+so that image decoding overlaps with `add_frame` / image writing instead of running in lockstep.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _frame_nbytes(frame):
+    return sum(getattr(value, 'nbytes', 0) for value in frame.values())
+
+
+class FramePrefetcher(object):
+    """
+    Iterate over decoded frames in order, with up to `depth` frames decoded (or being decoded) in advance.
+
+    Stall counters tell which side is the bottleneck:
+        - consumer_stalls / consumer_stall_time: the writer asked for a frame that was not decoded yet (decode-bound).
+        - producer_stalls: the decoders were idle because the prefetch window was full (writer-bound).
+
+    Attributes:
+        load_fn: Function loading the frame (dict of arrays) of an item.
+        items: Items to load, in order (e.g. frame indices).
+        num_threads: Number of decoding threads.
+        depth: Maximum number of frames prefetched ahead of the writer.
+        max_bytes: Memory cap of the prefetched frames (the window is shrunk once the frame size is known).
+
+    Examples:
+        ```python
+        with FramePrefetcher(load_frame, frame_indices, num_threads=8, depth=16) as frames:
+            for frame in frames:
+                dataset.add_frame(frame, task=instruction)
+        print(frames.stats)
+        ```
+    """
+
+    def __init__(self, load_fn, items, num_threads=4, depth=16, max_bytes=1 << 30):
+        self.load_fn = load_fn
+        self.items = iter(items)
+        self.depth = max(1, depth)
+        self.max_bytes = max_bytes
+        self.executor = ThreadPoolExecutor(max_workers=num_threads)
+        self.futures = deque()
+        self.exhausted = False
+        self.stats = {
+            'frames': 0,
+            'consumer_stalls': 0,
+            'consumer_stall_time': 0.0,
+            'producer_stalls': 0,
+        }
+
+    def _fill(self):
+        while not self.exhausted and len(self.futures) < self.depth:
+            try:
+                item = next(self.items)
+            except StopIteration:
+                self.exhausted = True
+                return
+            self.futures.append(self.executor.submit(self.load_fn, item))
+
+    def __iter__(self):
+        self._fill()
+        while len(self.futures) > 0:
+            if not self.exhausted and len(self.futures) == self.depth and all(future.done() for future in self.futures):
+                self.stats['producer_stalls'] += 1
+
+            future = self.futures.popleft()
+            if not future.done():
+                self.stats['consumer_stalls'] += 1
+                start_time = time.perf_counter()
+                frame = future.result()
+                self.stats['consumer_stall_time'] += time.perf_counter() - start_time
+            else:
+                frame = future.result()
+
+            if self.stats['frames'] == 0:
+                frame_bytes = _frame_nbytes(frame)
+                if frame_bytes > 0:
+                    self.depth = max(1, min(self.depth, self.max_bytes // frame_bytes))
+            self.stats['frames'] += 1
+
+            self._fill()
+            yield frame
+
+    def close(self):
+        for future in self.futures:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
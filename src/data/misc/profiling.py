@@ -0,0 +1,180 @@
+"""
+This module is used to profile the stages of a conversion (directory listing, JSON parsing, image decoding, transforms,
+`add_frame`, `save_episode`, ...) with cumulative timers and counters, aggregated per episode and per run.
+A disabled profiler hands out a shared no-op context, so that instrumented code costs nothing when profiling is off.
+"""
+
+import contextlib
+import cProfile
+import csv
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+class _Stage(object):
+
+    __slots__ = ('profiler', 'name', 'start_time')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler._add(self.name, time.perf_counter() - self.start_time)
+
+
+class StageProfiler(object):
+    """
+    Cumulative timers and counters of the stages of a conversion. Stage times are summed over threads
+    (e.g. the image decoding threads of `prefetch_threads`), so they may add up to more than the wall time.
+
+    Attributes:
+        enabled: If False, `stage` returns a shared no-op context and `count` does nothing.
+        cprofile_path: If set, the run is also profiled with cProfile and the stats are dumped to this path
+                       when the profiler is closed (readable with `pstats`, snakeviz, or converted for flamegraphs).
+
+    Examples:
+        ```python
+        profiler = StageProfiler()
+        profiler.start_episode('/path/to/episode0')
+        with profiler.stage('decode'):
+            image = load_image(path)
+        profiler.count('frames')
+        profiler.end_episode()
+        profiler.export('profile.json')  # or 'profile.csv'
+        ```
+    """
+
+    def __init__(self, enabled=True, cprofile_path=None):
+        self.enabled = enabled
+        self.cprofile_path = cprofile_path if enabled else None
+        self.lock = threading.Lock()
+        self.null_stage = contextlib.nullcontext()
+        self.episodes = []
+        self.run = self._new_record('run')
+        self.episode = None
+        self.start_time = time.perf_counter()
+        self.cprofile = None
+        if self.cprofile_path is not None:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    @staticmethod
+    def _new_record(name):
+        return {'name': name, 'wall_time': 0.0, 'times': defaultdict(float), 'calls': defaultdict(int), 'counts': defaultdict(int)}
+
+    def stage(self, name):
+        if not self.enabled:
+            return self.null_stage
+        return _Stage(self, name)
+
+    def _add(self, name, elapsed):
+        with self.lock:
+            for record in (self.run, self.episode):
+                if record is not None:
+                    record['times'][name] += elapsed
+                    record['calls'][name] += 1
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            for record in (self.run, self.episode):
+                if record is not None:
+                    record['counts'][name] += value
+
+    def start_episode(self, name):
+        if not self.enabled:
+            return
+        self.episode = self._new_record(name)
+        self.episode['start_time'] = time.perf_counter()
+
+    def end_episode(self):
+        if not self.enabled or self.episode is None:
+            return
+        self.episode['wall_time'] = time.perf_counter() - self.episode.pop('start_time')
+        self.episodes.append(self.episode)
+        self.episode = None
+
+    def merge(self, records):
+        """
+        Merge the records of another profiler (e.g. of a worker process, seeing `to_dict`) into this run.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            for episode in records['episodes']:
+                self.episodes.append(self._from_dict(episode))
+            for key in ['times', 'calls', 'counts']:
+                for name, value in records['run'][key].items():
+                    self.run[key][name] += value
+
+    @classmethod
+    def _from_dict(cls, data):
+        record = cls._new_record(data['name'])
+        record['wall_time'] = data['wall_time']
+        for key in ['times', 'calls', 'counts']:
+            record[key].update(data[key])
+        return record
+
+    @staticmethod
+    def _to_dict(record):
+        return {
+            'name': record['name'],
+            'wall_time': record['wall_time'],
+            'times': dict(record['times']),
+            'calls': dict(record['calls']),
+            'counts': dict(record['counts']),
+        }
+
+    def to_dict(self):
+        self.run['wall_time'] = time.perf_counter() - self.start_time
+        return {'run': self._to_dict(self.run), 'episodes': [self._to_dict(episode) for episode in self.episodes]}
+
+    def summary(self):
+        """
+        Human-readable summary of the run, stages sorted by time.
+        """
+        run = self.to_dict()['run']
+        lines = [f'Profile of {len(self.episodes)} episodes in {run["wall_time"]:.2f}s:']
+        for name, elapsed in sorted(run['times'].items(), key=lambda item: -item[1]):
+            calls = run['calls'][name]
+            lines.append(f'  {name:>16}: {elapsed:9.3f}s ({elapsed / max(run["wall_time"], 1e-9) * 100:5.1f}%), '
+                         f'{calls} calls, {elapsed / calls * 1e3:.3f} ms/call')
+        for name, value in sorted(run['counts'].items()):
+            lines.append(f'  {name:>16}: {value}')
+        return '\n'.join(lines)
+
+    def export(self, path):
+        """
+        Export the run and the episodes to a JSON file, or to a CSV file (one row per record and stage) if `path` ends with '.csv'.
+        """
+        data = self.to_dict()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if not path.endswith('.csv'):
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=4)
+            return
+
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['record', 'wall_time', 'kind', 'name', 'value', 'calls'])
+            for record in [data['run']] + data['episodes']:
+                for name, elapsed in record['times'].items():
+                    writer.writerow([record['name'], record['wall_time'], 'time', name, elapsed, record['calls'][name]])
+                for name, value in record['counts'].items():
+                    writer.writerow([record['name'], record['wall_time'], 'count', name, value, ''])
+
+    def close(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            os.makedirs(os.path.dirname(os.path.abspath(self.cprofile_path)), exist_ok=True)
+            self.cprofile.dump_stats(self.cprofile_path)
+            self.cprofile = None
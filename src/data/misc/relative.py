@@ -0,0 +1,115 @@
+"""
+This module is used to compute relative action representations ('ee_delta_base', 'ee_delta_gripper') at training time,
+from a dataset converted once with absolute actions ('ee_absolute', i.e. the next end effector state of every frame)
+and absolute states. The action of frame t relative to its state is `transform.pairs(state[t], action[t])`,
+so switching the control mode of an experiment needs neither a reconversion nor extra disk.
+"""
+
+import numpy as np
+import torch
+
+from .stats import FeatureStats, column_to_numpy
+from .transforms import get_transform
+
+
+def transform_chunks(transform, states, actions):
+    """
+    Transform windows of absolute actions with the absolute states of the same frames, batched over any leading dims.
+
+    Args:
+        transform (BaseTransform): Transform of `get_transform`.
+        states (np.ndarray): Absolute states of shape (..., 7 * num_arms).
+        actions (np.ndarray): Absolute actions (next states) of shape (..., 7 * num_arms).
+
+    Returns:
+        np.ndarray: Relative actions of the same shape as `actions`.
+    """
+    shape = actions.shape
+    return transform.pairs(states.reshape(-1, shape[-1]), actions.reshape(-1, shape[-1])).reshape(shape)
+
+
+class RelativeActionDataset(torch.utils.data.Dataset):
+    """
+    Wrap a `LeRobotDataset` converted with 'ee_absolute' actions to serve the actions of another transform, computed on the fly
+    in the DataLoader workers. The state is queried at the frames of the action window (the union with the window of the policy),
+    so that padded frames are clamped the same way as in a dataset converted with the transform.
+    The action stats of the dataset metadata are replaced with the stats of the transformed actions (one vectorized pass
+    over the action and state columns), so that the policy normalizes the actions it is trained on.
+    Other attributes (`meta`, `num_frames`, `episode_data_index`, ...) are the ones of the wrapped dataset.
+
+    Attributes:
+        dataset: The wrapped `LeRobotDataset`, with absolute actions and states.
+        transform_type: Transform of the served actions, e.g. 'ee_delta_gripper'.
+
+    Examples:
+        ```python
+        dataset = RelativeActionDataset(make_dataset(cfg), 'ee_delta_gripper')
+        item = dataset[0]
+        item['action'].shape  # (chunk_size, action_dim), relative to the state of every frame of the chunk
+        ```
+    """
+
+    def __init__(self, dataset, transform_type, action_key='action', state_key='observation.state'):
+        self.dataset = dataset
+        self.transform_type = transform_type
+        self.action_key = action_key
+        self.state_key = state_key
+        features = dataset.meta.features
+        if state_key not in features:
+            raise ValueError(f'Actions are transformed with the states, but the dataset has no {state_key} feature')
+        if features[state_key]['shape'] != features[action_key]['shape']:
+            raise ValueError(f'Actions of shape {features[action_key]["shape"]} are not absolute states of shape '
+                             f'{features[state_key]["shape"]}, convert the dataset with `transform_type` ee_absolute')
+        self.transform = get_transform(transform_type, features[action_key]['shape'][0] > 7)
+
+        delta_indices = dict(dataset.delta_indices or {})
+        self.action_window = action_key in delta_indices
+        self.state_window = state_key in delta_indices
+        action_offsets = list(delta_indices.get(action_key, [0]))
+        state_offsets = list(delta_indices.get(state_key, [0]))
+        offsets = sorted(set(action_offsets) | set(state_offsets))
+        # positions of the states of the action window, and of the states returned to the policy, in the queried window
+        self.action_state_positions = [offsets.index(offset) for offset in action_offsets]
+        self.state_positions = [offsets.index(offset) for offset in state_offsets]
+        delta_indices[action_key] = action_offsets
+        delta_indices[state_key] = offsets
+        dataset.delta_indices = delta_indices
+
+        dataset.meta.stats[action_key] = self.compute_action_stats().to_dict()
+
+    def compute_action_stats(self):
+        """
+        Stats of the transformed actions of every frame of the wrapped dataset.
+        """
+        table = self.dataset.hf_dataset.data
+        shape = self.dataset.meta.features[self.action_key]['shape']
+        states = column_to_numpy(table.column(self.state_key), shape)
+        actions = column_to_numpy(table.column(self.action_key), shape)
+        return FeatureStats().update(self.transform.pairs(states, actions))
+
+    def __getattr__(self, name):
+        if name == 'dataset':
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        item = self.dataset[idx]
+        states = item[self.state_key]
+        actions = transform_chunks(self.transform, states[self.action_state_positions].numpy(),
+                                   item[self.action_key].numpy())
+        item[self.action_key] = torch.from_numpy(actions.astype(np.float32))
+
+        state_pad_key, action_pad_key = f'{self.state_key}_is_pad', f'{self.action_key}_is_pad'
+        if self.state_window:
+            item[self.state_key] = states[self.state_positions]
+            item[state_pad_key] = item[state_pad_key][self.state_positions]
+        else:
+            item[self.state_key] = states[self.state_positions[0]]
+            item.pop(state_pad_key)
+        if not self.action_window:
+            item[self.action_key] = item[self.action_key][0]
+            item.pop(action_pad_key)
+        return item
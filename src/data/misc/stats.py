@@ -0,0 +1,364 @@
+"""
+This module is used to compute the statistics of converted LeRobot datasets in a streaming, mergeable way.
+Every feature is summarized by a `FeatureStats`: count, mean and M2 (merged with Chan's parallel algorithm),
+min, max and a bottom-k uniform sample (merged by keeping the k smallest random priorities) for quantiles.
+Episodes are summarized in parallel from their parquet files and a subsample of their video (or image) frames,
+and episode partials are combined into dataset stats without re-reading any data.
+"""
+
+import functools
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import av
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .images import load_image
+from .layout import EPISODES_PATH, EPISODES_STATS_PATH, INDEX_COLUMNS, INFO_PATH, load_json, load_jsonlines
+
+
+SKETCHES_PATH = 'meta/episodes_stats_sketches.npz'
+STATS_PATH = 'meta/stats.json'
+
+
+def estimate_num_samples(num_frames, min_num_samples=100, max_num_samples=10_000, power=0.75):
+    # the same heuristic as LeRobot, so that recomputed image stats use as many frames as the converter
+    if num_frames < min_num_samples:
+        min_num_samples = num_frames
+    return max(min_num_samples, min(int(num_frames ** power), max_num_samples))
+
+
+def sample_indices(num_frames):
+    num_samples = estimate_num_samples(num_frames)
+    return np.round(np.linspace(0, num_frames - 1, num_samples)).astype(int).tolist()
+
+
+class FeatureStats(object):
+    """
+    Mergeable statistics of a feature, reduced over the frames (and over the pixels of images).
+    The count is a number of frames, as in LeRobot's `episodes_stats.jsonl`.
+
+    Attributes:
+        sample_size: Number of rows kept for quantiles (0 disables quantiles). Rows are the values of a frame,
+                     or the channels of a pixel for images, and are only sampled for features of at most
+                     `max_sample_dim` values per row.
+        max_sample_dim: Maximum number of values per sampled row.
+
+    Examples:
+        ```python
+        stats = FeatureStats()
+        stats.update(actions)  # (N, D)
+        other = FeatureStats()
+        other.update(images / 255.0, axis=(0, 2, 3))  # (N, C, H, W), stats of shape (C, 1, 1)
+        stats.merge(other_episode_stats)
+        stats.to_dict(quantiles=[0.01, 0.99])  # {'min', 'max', 'mean', 'std', 'count', 'q01', 'q99'}
+        ```
+    """
+
+    def __init__(self, sample_size=1024, max_sample_dim=256):
+        self.sample_size = sample_size
+        self.max_sample_dim = max_sample_dim
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+        self.sample = None
+        self.priorities = None
+
+    def update(self, values, axis=(0,)):
+        """
+        Add a batch of frames, of shape (N, ...), reduced over `axis` (which must include the frame axis 0).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        axis = tuple(axis)
+        batch = FeatureStats(self.sample_size, self.max_sample_dim)
+        batch.count = values.shape[0]
+        batch.mean = values.mean(axis=axis, keepdims=True)[0]
+        batch.m2 = values.var(axis=axis, keepdims=True)[0] * batch.count
+        batch.min = values.min(axis=axis, keepdims=True)[0]
+        batch.max = values.max(axis=axis, keepdims=True)[0]
+
+        if 0 < self.sample_size and batch.mean.size <= self.max_sample_dim:
+            rows = np.moveaxis(values, axis, tuple(range(len(axis)))).reshape(-1, batch.mean.size)
+            priorities = np.random.random(len(rows))
+            keep = np.argsort(priorities)[:self.sample_size]
+            batch.sample, batch.priorities = rows[keep], priorities[keep]
+
+        self.merge(batch)
+        return self
+
+    def merge(self, other):
+        """
+        Merge the stats of other frames into these stats.
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            self.sample, self.priorities = other.sample, other.priorities
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / count
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+        if self.sample is None or other.sample is None:
+            self.sample, self.priorities = None, None
+        else:
+            priorities = np.concatenate([self.priorities, other.priorities])
+            keep = np.argsort(priorities)[:self.sample_size]
+            self.sample = np.concatenate([self.sample, other.sample])[keep]
+            self.priorities = priorities[keep]
+        return self
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count)
+
+    def quantile(self, q):
+        if self.sample is None:
+            raise ValueError('Quantiles are not available: no sample was kept for this feature.')
+        return np.quantile(self.sample, q, axis=0).reshape(self.mean.shape)
+
+    def to_dict(self, quantiles=()):
+        """
+        Stats in the format of LeRobot's `episodes_stats.jsonl`, with optional quantiles (e.g. 'q01' for 0.01).
+        """
+        stats = {
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'std': self.std,
+            'count': np.array([self.count]),
+        }
+        if self.sample is not None:
+            for q in quantiles:
+                stats[f'q{round(q * 100):02d}'] = self.quantile(q)
+        return stats
+
+    @classmethod
+    def from_dict(cls, stats):
+        """
+        Load stats in the format of LeRobot's `episodes_stats.jsonl` (without a sample, hence without quantiles).
+        """
+        feature_stats = cls()
+        feature_stats.count = int(np.asarray(stats['count']).reshape(-1)[0])
+        feature_stats.mean = np.asarray(stats['mean'], dtype=np.float64)
+        feature_stats.m2 = np.asarray(stats['std'], dtype=np.float64) ** 2 * feature_stats.count
+        feature_stats.min = np.asarray(stats['min'], dtype=np.float64)
+        feature_stats.max = np.asarray(stats['max'], dtype=np.float64)
+        return feature_stats
+
+
+def column_to_numpy(column, shape):
+    """
+    Convert a parquet column of fixed-shape features (list, fixed-size list or array columns) into an array of shape (N, *shape).
+    """
+    array = column.combine_chunks()
+    if isinstance(array, pa.ExtensionArray):
+        array = array.storage
+    while pa.types.is_list(array.type) or pa.types.is_fixed_size_list(array.type) or pa.types.is_large_list(array.type):
+        array = array.flatten()
+    return array.to_numpy(zero_copy_only=False).reshape(len(column), *shape)
+
+
+def _auto_downsample(frames, target_size=150, max_size_threshold=300):
+    # the same downsampling as LeRobot applies to the images sampled for stats
+    _, _, height, width = frames.shape
+    if max(width, height) < max_size_threshold:
+        return frames
+    factor = int(width / target_size) if width > height else int(height / target_size)
+    return frames[:, :, ::factor, ::factor]
+
+
+def read_video_samples(video_path, indices):
+    """
+    Decode the frames at the given indices of a video, as (N, C, H, W) uint8.
+    """
+    index_set, last_index = set(indices), max(indices)
+    frames = {}
+    with av.open(str(video_path)) as container:
+        for frame_index, frame in enumerate(container.decode(video=0)):
+            if frame_index in index_set:
+                frames[frame_index] = frame.to_ndarray(format='rgb24').transpose(2, 0, 1)
+            if frame_index >= last_index:
+                break
+    return np.stack([frames[i] for i in indices])
+
+
+def read_image_samples(dataset_root, column, indices):
+    """
+    Decode the images at the given rows of a parquet image column (structs of the encoded `bytes`, or of the `path`
+    of the image file if they are not embedded), as (N, C, H, W) uint8.
+    """
+    frames = []
+    for item in column.take(pa.array(indices, type=pa.int64())).to_pylist():
+        source = item['bytes'] if item['bytes'] is not None else os.path.join(dataset_root, item['path'])
+        image = load_image(source)
+        frames.append((image[:, :, None] if image.ndim == 2 else image[:, :, :3]).transpose(2, 0, 1))
+    return np.stack(frames)
+
+
+def compute_episode_stats(dataset_root, episode_index, sample_size=1024):
+    """
+    Compute the stats of all features of an episode, from its parquet file and a subsample of its video or image frames.
+
+    Returns:
+        Dict[str, FeatureStats]: Stats of every feature.
+    """
+    info = load_json(os.path.join(dataset_root, INFO_PATH))
+    episode_chunk = episode_index // info['chunks_size']
+    data_path = os.path.join(dataset_root, info['data_path'].format(
+        episode_chunk=episode_chunk, episode_index=episode_index))
+    table = pq.read_table(data_path)
+
+    stats = {}
+    for key, feature in info['features'].items():
+        if feature['dtype'] in ['string']:
+            continue
+        if feature['dtype'] in ['image', 'video']:
+            if feature['dtype'] == 'image':
+                frames = read_image_samples(dataset_root, table.column(key), sample_indices(table.num_rows))
+            else:
+                video_path = os.path.join(dataset_root, info['video_path'].format(
+                    episode_chunk=episode_chunk, video_key=key, episode_index=episode_index))
+                frames = read_video_samples(video_path, sample_indices(table.num_rows))
+            stats[key] = FeatureStats(sample_size).update(_auto_downsample(frames) / 255.0, axis=(0, 2, 3))
+        elif key in table.column_names:
+            values = column_to_numpy(table.column(key), feature['shape'])
+            stats[key] = FeatureStats(sample_size).update(values)
+    return stats
+
+
+def compute_index_stats(dataset_root, episode_index, sample_size=1024):
+    """
+    Compute the stats of the index columns of an episode (renumbered by `merge_datasets`) from its parquet file,
+    e.g. to update the sketches of merged episodes without reading their other columns.
+
+    Returns:
+        Dict[str, FeatureStats]: Stats of every index column.
+    """
+    info = load_json(os.path.join(dataset_root, INFO_PATH))
+    data_path = os.path.join(dataset_root, info['data_path'].format(
+        episode_chunk=episode_index // info['chunks_size'], episode_index=episode_index))
+    columns = [key for key in INDEX_COLUMNS if key in info['features']]
+    table = pq.read_table(data_path, columns=columns)
+    return {key: FeatureStats(sample_size).update(column_to_numpy(table.column(key), info['features'][key]['shape']))
+            for key in columns}
+
+
+def _compute_episode_stats(dataset_root, sample_size, episode_index):
+    return episode_index, compute_episode_stats(dataset_root, episode_index, sample_size)
+
+
+def compute_dataset_stats(dataset_root, episode_indices=None, num_workers=1, sample_size=1024):
+    """
+    Compute the stats of every episode of a dataset, in parallel over episodes.
+
+    Returns:
+        Dict[int, Dict[str, FeatureStats]]: Stats of every feature of every episode.
+    """
+    dataset_root = str(dataset_root)
+    if episode_indices is None:
+        episode_indices = [episode['episode_index'] for episode in load_jsonlines(os.path.join(dataset_root, EPISODES_PATH))]
+    compute_fn = functools.partial(_compute_episode_stats, dataset_root, sample_size)
+
+    if num_workers <= 1:
+        return dict(map(compute_fn, episode_indices))
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=context) as executor:
+        return dict(executor.map(compute_fn, episode_indices, chunksize=max(1, len(episode_indices) // (num_workers * 4))))
+
+
+def aggregate_stats(episodes_stats):
+    """
+    Combine the stats of episodes into the stats of the dataset, without re-reading any data.
+
+    Args:
+        episodes_stats (Iterable[Dict[str, FeatureStats]]): Stats of every feature of every episode.
+    """
+    stats = {}
+    for episode_stats in episodes_stats:
+        for key, feature_stats in episode_stats.items():
+            if key not in stats:
+                stats[key] = FeatureStats(feature_stats.sample_size, feature_stats.max_sample_dim)
+            stats[key].merge(feature_stats)
+    return stats
+
+
+def save_sketches(path, episodes_stats):
+    """
+    Save the mergeable state (including samples) of the stats of every episode into an npz file.
+    """
+    arrays = {}
+    for episode_index, episode_stats in episodes_stats.items():
+        for key, feature_stats in episode_stats.items():
+            prefix = f'{episode_index}/{key}/'
+            arrays[prefix + 'count'] = np.array(feature_stats.count)
+            for name in ['mean', 'm2', 'min', 'max', 'sample', 'priorities']:
+                if getattr(feature_stats, name) is not None:
+                    arrays[prefix + name] = getattr(feature_stats, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, **arrays)
+
+
+def load_sketches(path):
+    """
+    Load the stats of every episode saved by `save_sketches`.
+    """
+    episodes_stats = {}
+    with np.load(path) as arrays:
+        for name in arrays.files:
+            episode_index, remainder = name.split('/', 1)
+            key, field = remainder.rsplit('/', 1)
+            episode_stats = episodes_stats.setdefault(int(episode_index), {})
+            feature_stats = episode_stats.setdefault(key, FeatureStats())
+            value = arrays[name]
+            setattr(feature_stats, field, int(value) if field == 'count' else value)
+    return episodes_stats
+
+
+def load_episodes_stats(dataset_root):
+    """
+    Load LeRobot's `episodes_stats.jsonl` as stats of every feature of every episode (without quantiles).
+    """
+    return {
+        item['episode_index']: {key: FeatureStats.from_dict(stats) for key, stats in item['stats'].items()}
+        for item in load_jsonlines(os.path.join(dataset_root, EPISODES_STATS_PATH))
+    }
+
+
+def write_episodes_stats(dataset_root, episodes_stats):
+    """
+    Rewrite LeRobot's `episodes_stats.jsonl` from stats of every feature of every episode.
+    """
+    path = os.path.join(dataset_root, EPISODES_STATS_PATH)
+    with open(path + '.tmp', 'w') as f:
+        for episode_index in sorted(episodes_stats):
+            stats = {key: {name: value.tolist() for name, value in feature_stats.to_dict().items()}
+                     for key, feature_stats in episodes_stats[episode_index].items()}
+            f.write(json.dumps({'episode_index': episode_index, 'stats': stats}) + '\n')
+    os.replace(path + '.tmp', path)
+
+
+def write_stats(dataset_root, stats):
+    """
+    Write the stats of a dataset to `meta/stats.json` (LeRobot's v2.0 format, ignored by v2.1 which aggregates
+    `episodes_stats.jsonl` when loading), e.g. for consumers that only read the dataset stats.
+    """
+    path = os.path.join(dataset_root, STATS_PATH)
+    serialized = {key: {name: value.tolist() for name, value in feature_stats.to_dict().items()}
+                  for key, feature_stats in stats.items()}
+    with open(path + '.tmp', 'w') as f:
+        json.dump(serialized, f, indent=4)
+    os.replace(path + '.tmp', path)
@@ -0,0 +1,145 @@
+"""
+This module is used to synchronize the streams of a raw Pika episode recorded at different rates
+(RGB / depth cameras at ~30 fps, pose at ~125 Hz, gripper and IMU at ~150 Hz) by their timestamps.
+Every stream is matched to a common reference clock with vectorized `searchsorted` lookups,
+or interpolated at its ticks (linearly, and by SLERP for rotations) to resample an episode to another rate.
+"""
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+
+def build_reference_clock(timestamps, fps, reference=None):
+    """
+    Build the reference clock covering the time span shared by all streams.
+
+    Args:
+        timestamps (Dict[str, np.ndarray]): Sorted timestamps (in seconds) of every stream.
+        fps (int): Rate of the reference clock if no reference stream is given.
+        reference (str): Optional stream whose own timestamps are used as the reference clock.
+
+    Returns:
+        np.ndarray: Timestamps of the reference clock.
+    """
+    start = max(stream[0] for stream in timestamps.values())
+    end = min(stream[-1] for stream in timestamps.values())
+    if start > end:
+        raise ValueError(f'Streams do not overlap in time: latest start {start:.6f} > earliest end {end:.6f}')
+
+    if reference is not None:
+        clock = timestamps[reference]
+        return clock[(clock >= start) & (clock <= end)]
+
+    num_frames = int(np.floor((end - start) * fps + 1e-6)) + 1
+    return start + np.arange(num_frames) / fps
+
+
+def match_timestamps(timestamps, clock, method='nearest'):
+    """
+    Match every clock tick to a sample of a stream.
+
+    Args:
+        timestamps (np.ndarray): Sorted timestamps of the stream.
+        clock (np.ndarray): Timestamps of the reference clock.
+        method (str): 'nearest' (closest sample) or 'previous' (latest sample not after the tick).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Matched sample indices and absolute time skews, both of shape (len(clock),).
+    """
+    if method == 'nearest':
+        right = np.clip(np.searchsorted(timestamps, clock, side='left'), 0, len(timestamps) - 1)
+        left = np.clip(right - 1, 0, len(timestamps) - 1)
+        use_left = np.abs(clock - timestamps[left]) <= np.abs(timestamps[right] - clock)
+        indices = np.where(use_left, left, right)
+    elif method == 'previous':
+        indices = np.clip(np.searchsorted(timestamps, clock, side='right') - 1, 0, len(timestamps) - 1)
+    else:
+        raise ValueError(f'Unknown sync method: {method}')
+    return indices, np.abs(clock - timestamps[indices])
+
+
+def synchronize_streams(timestamps, fps, method='nearest', max_skew=0.05, reference=None):
+    """
+    Align all streams to a reference clock, dropping the ticks where any stream is further than `max_skew` away.
+
+    Args:
+        timestamps (Dict[str, np.ndarray]): Sorted timestamps (in seconds) of every stream.
+        fps (int): Rate of the reference clock if no reference stream is given.
+        method (str): 'nearest' or 'previous', see `match_timestamps`.
+        max_skew (float): Maximum tolerated time difference (in seconds) between a tick and its matched samples.
+        reference (str): Optional stream whose own timestamps are used as the reference clock.
+
+    Returns:
+        Tuple[np.ndarray, Dict[str, np.ndarray]]: The kept clock ticks and the matched sample indices of every stream.
+    """
+    empty_streams = [name for name, stream in timestamps.items() if len(stream) == 0]
+    if len(empty_streams) > 0:
+        raise ValueError(f'Cannot synchronize empty streams: {empty_streams}')
+
+    clock = build_reference_clock(timestamps, fps, reference)
+    indices, keep = {}, np.ones(len(clock), dtype=bool)
+    for name, stream in timestamps.items():
+        indices[name], skew = match_timestamps(stream, clock, method)
+        keep &= skew <= max_skew
+    return clock[keep], {name: stream_indices[keep] for name, stream_indices in indices.items()}
+
+
+def _interpolation_weights(timestamps, clock):
+    right = np.clip(np.searchsorted(timestamps, clock, side='right'), 1, max(1, len(timestamps) - 1))
+    left = right - 1
+    right = np.minimum(right, len(timestamps) - 1)
+    span = timestamps[right] - timestamps[left]
+    weights = np.clip((clock - timestamps[left]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+    return left, right, np.where(span > 0, weights, 0.0)
+
+
+def slerp_quaternions(q0, q1, weights):
+    """
+    Spherical linear interpolation between batches of unit quaternions of shape (N, 4), with weights of shape (N,).
+    """
+    dot = np.sum(q0 * q1, axis=1)
+    q1 = np.where(dot[:, None] < 0, -q1, q1)
+    theta = np.arccos(np.clip(np.abs(dot), 0.0, 1.0))
+    sin_theta = np.sin(theta)
+    # nearly identical rotations fall back to (normalized) linear interpolation
+    small = sin_theta < 1e-6
+    safe_sin = np.where(small, 1.0, sin_theta)
+    w0 = np.where(small, 1.0 - weights, np.sin((1.0 - weights) * theta) / safe_sin)
+    w1 = np.where(small, weights, np.sin(weights * theta) / safe_sin)
+    q = w0[:, None] * q0 + w1[:, None] * q1
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def interpolate_stream(timestamps, values, clock, euler_columns=None):
+    """
+    Interpolate the samples of a stream at the ticks of a clock: linearly for every column (e.g. position, gripper),
+    except for the roll / pitch / yaw columns, which are interpolated by SLERP of their rotations.
+    Ticks outside of the stream are clamped to its first / last sample.
+
+    Args:
+        timestamps (np.ndarray): Sorted timestamps of the stream, of shape (M,).
+        values (np.ndarray): Samples of the stream, of shape (M, D).
+        clock (np.ndarray): Timestamps to interpolate at, of shape (N,).
+        euler_columns (List[int]): Indices of the roll, pitch and yaw columns ('xyz' Euler angles), if any.
+
+    Returns:
+        np.ndarray: Interpolated samples of shape (N, D).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    left, right, weights = _interpolation_weights(timestamps, clock)
+    outputs = values[left] + weights[:, None] * (values[right] - values[left])
+
+    if euler_columns is not None:
+        quaternions = Rotation.from_euler('xyz', values[:, euler_columns]).as_quat()
+        slerped = slerp_quaternions(quaternions[left], quaternions[right], weights)
+        outputs[:, euler_columns] = Rotation.from_quat(slerped).as_euler('xyz')
+    return outputs
+
+
+def get_euler_columns(keys):
+    """
+    Indices of the 'roll', 'pitch' and 'yaw' keys, or None if the keys do not hold all three.
+    """
+    if not all(key in keys for key in ['roll', 'pitch', 'yaw']):
+        return None
+    return [keys.index(key) for key in ['roll', 'pitch', 'yaw']]
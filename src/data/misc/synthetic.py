@@ -0,0 +1,226 @@
+"""
+This module is used to generate synthetic raw Pika episodes on disk, in the same layout as the recordings
+that `PikaDataProcessor` converts (e.g. `camera/color/<camera>/<timestamp>.jpg`, `localization/pose/<arm>/<timestamp>.json`,
+`instructions.json`, `statistic.txt`), so that the conversion can be benchmarked reproducibly without real recordings.
+Every topic is sampled at its own rate with timestamp jitter and randomly dropped frames.
+"""
+
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+
+# approximate rates of the topics of a Pika recording (seeing `statistic.txt` of a recorded episode)
+TOPIC_RATES = {
+    'camera/color': 30.0,
+    'camera/depth': 30.0,
+    'localization/pose': 125.0,
+    'gripper/encoder': 150.0,
+    'imu/9axis': 150.0,
+}
+
+
+def _topic_rate(topic_dir, fps):
+    for prefix, rate in TOPIC_RATES.items():
+        if topic_dir.startswith(prefix):
+            return fps if prefix.startswith('camera') else rate
+    return fps
+
+
+def _sample_timestamps(rng, start_time, duration, rate, jitter, drop_rate):
+    timestamps = start_time + np.arange(int(duration * rate)) / rate
+    timestamps = timestamps + rng.normal(0.0, jitter, size=len(timestamps)) if jitter > 0 else timestamps
+    keep = rng.random(len(timestamps)) >= drop_rate
+    keep[0] = True
+    # filenames have microsecond resolution, jittered timestamps must not collide
+    return np.unique(np.round(timestamps[keep], 6))
+
+
+def _texture(rng, height, width, channels):
+    # smooth random texture, which compresses like a camera image rather than like white noise
+    coarse = rng.integers(0, 256, size=(height // 16 + 2, width // 16 + 2, channels), dtype=np.uint8)
+    image = Image.fromarray(coarse.squeeze(-1) if channels == 1 else coarse)
+    return np.asarray(image.resize(((width // 16 + 2) * 16, (height // 16 + 2) * 16), Image.BILINEAR))
+
+
+def _write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent='\t')
+
+
+def _write_images(rng, topic_dir, timestamps, height, width, depth=False, jpeg_quality=90):
+    texture = _texture(rng, height, width, 1 if depth else 3)
+    max_dy, max_dx = texture.shape[0] - height, texture.shape[1] - width
+    for i, timestamp in enumerate(timestamps):
+        # pan over the texture so that consecutive frames differ like a moving camera
+        dy, dx = int(max_dy * (0.5 + 0.5 * np.sin(i / 37.0))), int(max_dx * (0.5 + 0.5 * np.cos(i / 23.0)))
+        crop = texture[dy:dy + height, dx:dx + width]
+        if depth:
+            Image.fromarray(crop.astype(np.uint16) * 16).save(os.path.join(topic_dir, f'{timestamp:.6f}.png'))
+        else:
+            Image.fromarray(crop).save(os.path.join(topic_dir, f'{timestamp:.6f}.jpg'), quality=jpeg_quality)
+
+
+def _write_action_topic(rng, topic_dir, timestamps, keys, motion_window=None):
+    # random walk, with steps large enough that most frames pass the noop filters
+    values = np.cumsum(rng.normal(0.0, 0.002, size=(len(timestamps), len(keys))), axis=0)
+    if 'angle' in keys:
+        values[:, keys.index('angle')] = 0.85 + 0.85 * np.sin(np.arange(len(timestamps)) / 50.0)
+    if motion_window is not None:
+        # the operator holds still before and after the motion
+        indices = np.clip(np.arange(len(timestamps)), *np.searchsorted(timestamps, motion_window) - [0, 1])
+        values = values[indices]
+    if 'distance' in keys:
+        values[:, keys.index('distance')] = 0.0
+    if 'orientation.w' in keys:
+        values[:, keys.index('orientation.w')] = 1.0
+    for timestamp, row in zip(timestamps, values):
+        _write_json(os.path.join(topic_dir, f'{timestamp:.6f}.json'), _unflatten(dict(zip(keys, row.tolist()))))
+
+
+def _unflatten(data):
+    # {'angular_velocity.x': 0.1} -> {'angular_velocity': {'x': 0.1}}, as the IMU topics are recorded
+    outputs = {}
+    for key, value in data.items():
+        *parents, name = key.split('.')
+        node = outputs
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[name] = value
+    return outputs
+
+
+def _write_sync(episode_path, topic_timestamps, extensions, fps):
+    # match every topic to a common clock, as the recorder's `sync.txt` files do
+    start = max(timestamps[0] for timestamps in topic_timestamps.values())
+    end = min(timestamps[-1] for timestamps in topic_timestamps.values())
+    clock = np.arange(start, end, 1.0 / fps)
+    for topic_dir, timestamps in topic_timestamps.items():
+        indices = np.clip(np.searchsorted(timestamps, clock), 1, len(timestamps) - 1)
+        indices -= clock - timestamps[indices - 1] < timestamps[indices] - clock
+        with open(os.path.join(episode_path, topic_dir, 'sync.txt'), 'w') as f:
+            f.writelines(f'{timestamps[i]:.6f}{extensions[topic_dir]}\n' for i in indices)
+
+
+def _write_statistic(episode_path, topic_timestamps, duration):
+    # the recorder's summary of the episode: its duration, then the number of messages and the rate of every topic
+    lines = [f'{duration:.4f}', 'topic:']
+    for topic_dir, timestamps in topic_timestamps.items():
+        span = timestamps[-1] - timestamps[0]
+        lines.append(f'{topic_dir} {len(timestamps)} {(len(timestamps) - 1) / span if span > 0 else 0.0:.4f}')
+    with open(os.path.join(episode_path, 'statistic.txt'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def write_synthetic_episode(
+    episode_path,
+    num_frames=300,
+    rgb_dirs=(),
+    depth_dirs=(),
+    action_dirs=(),
+    action_keys_list=(),
+    imu_dirs=(),
+    imu_keys=(),
+    image_height=480,
+    image_width=640,
+    fps=30,
+    jitter=0.002,
+    drop_rate=0.01,
+    write_sync=False,
+    idle_duration=0.0,
+    instruction='null',
+    seed=0,
+):
+    """
+    Write a synthetic raw Pika episode.
+
+    Args:
+        episode_path (str): Directory of the episode, e.g. `/path/to/data/episode0`.
+        num_frames (int): Number of camera frames (before dropped frames), the other topics are sampled over the same duration.
+        rgb_dirs (List[str]): Camera topic directories, e.g. 'camera/color/camera_realsense_c'.
+        depth_dirs (List[str]): Depth topic directories, e.g. 'camera/depth/pikaDepthCamera_l'.
+        action_dirs (List[str]): JSON topic directories, e.g. 'localization/pose/pika_l'.
+        action_keys_list (List[List[str]]): Keys of the JSON files of every action topic.
+        imu_dirs (List[str]): IMU topic directories, e.g. 'imu/9axis/pika_l'.
+        imu_keys (List[str]): Flattened keys of the JSON files of the IMU topics, e.g. 'angular_velocity.x'.
+        image_height (int): Height of the camera frames.
+        image_width (int): Width of the camera frames.
+        fps (int): Rate of the camera topics.
+        jitter (float): Standard deviation in seconds of the timestamp noise.
+        drop_rate (float): Fraction of the frames of every topic that are dropped.
+        write_sync (bool): If True, a `sync.txt` aligning every topic to a common clock at `fps` is written.
+        idle_duration (float): Duration in seconds of the idle segments at the start and the end of the episode,
+                               where the action topics hold still.
+        instruction (str): Instruction written to `instructions.json` ('null' for none).
+        seed (int): Random seed.
+
+    Returns:
+        Dict[str, int]: Number of files written for every topic.
+    """
+    rng = np.random.default_rng(seed)
+    start_time = 1.7e9 + seed * 3600.0
+    duration = num_frames / fps
+
+    topic_timestamps, extensions = {}, {}
+    for topic_dir in list(rgb_dirs) + list(depth_dirs) + list(action_dirs) + list(imu_dirs):
+        os.makedirs(os.path.join(episode_path, topic_dir), exist_ok=True)
+        rate = _topic_rate(topic_dir, fps)
+        topic_timestamps[topic_dir] = _sample_timestamps(rng, start_time, duration, rate, jitter, drop_rate)
+
+    for topic_dir in rgb_dirs:
+        _write_images(rng, os.path.join(episode_path, topic_dir), topic_timestamps[topic_dir], image_height, image_width)
+        extensions[topic_dir] = '.jpg'
+    for topic_dir in depth_dirs:
+        _write_images(rng, os.path.join(episode_path, topic_dir), topic_timestamps[topic_dir],
+                      image_height, image_width, depth=True)
+        extensions[topic_dir] = '.png'
+    motion_window = (start_time + idle_duration, start_time + duration - idle_duration) if idle_duration > 0 else None
+    for topic_dir, keys in zip(action_dirs, action_keys_list):
+        _write_action_topic(rng, os.path.join(episode_path, topic_dir), topic_timestamps[topic_dir], list(keys), motion_window)
+        extensions[topic_dir] = '.json'
+    for topic_dir in imu_dirs:
+        _write_action_topic(rng, os.path.join(episode_path, topic_dir), topic_timestamps[topic_dir], list(imu_keys))
+        extensions[topic_dir] = '.json'
+
+    if write_sync:
+        _write_sync(episode_path, topic_timestamps, extensions, fps)
+    _write_statistic(episode_path, topic_timestamps, duration)
+    _write_json(os.path.join(episode_path, 'instructions.json'), {'instructions': [instruction]})
+    return {topic_dir: len(timestamps) for topic_dir, timestamps in topic_timestamps.items()}
+
+
+def generate_synthetic_dataset(source_data_root, num_episodes, config, num_frames=300, jitter=0.002,
+                               drop_rate=0.01, write_sync=False, idle_duration=0.0, seed=0):
+    """
+    Write `num_episodes` synthetic raw episodes (`episode0`, `episode1`, ...) for the topics of a `DataProcessorConfig`.
+
+    Returns:
+        int: Total size in bytes of the written files.
+    """
+    for episode_idx in range(num_episodes):
+        write_synthetic_episode(
+            os.path.join(source_data_root, f'episode{episode_idx}'),
+            num_frames=num_frames,
+            rgb_dirs=config.rgb_dirs,
+            depth_dirs=config.depth_dirs if config.use_depth else [],
+            action_dirs=config.action_dirs,
+            action_keys_list=config.action_keys_list,
+            imu_dirs=config.imu_dirs if config.use_imu else [],
+            imu_keys=config.imu_keys,
+            image_height=config.image_height,
+            image_width=config.image_width,
+            fps=config.fps,
+            jitter=jitter,
+            drop_rate=drop_rate,
+            write_sync=write_sync,
+            idle_duration=idle_duration,
+            seed=seed + episode_idx,
+        )
+    return get_dir_size(source_data_root)
+
+
+def get_dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, filename))
+               for root, _, filenames in os.walk(path) for filename in filenames)
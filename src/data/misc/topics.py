@@ -0,0 +1,114 @@
+"""
+This module is used to list and read the per-frame files of a raw Pika topic directory
+(e.g. `camera/color/pikaDepthCamera_l/<timestamp>.jpg` or `localization/pose/pika_l/<timestamp>.json`),
+on the file system or inside an archive (seeing `src/data/misc/archive.py`).
+"""
+
+import json
+import os
+
+import numpy as np
+
+from . import archive
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.png')
+JSON_EXTENSIONS = ('.json',)
+
+
+def get_topic_dirs(config):
+    """
+    Topic directories read by a conversion with a `DataProcessorConfig`, and their frame extensions.
+    """
+    topic_dirs = {topic_dir: IMAGE_EXTENSIONS for topic_dir in config.rgb_dirs}
+    if config.use_depth:
+        topic_dirs.update({topic_dir: IMAGE_EXTENSIONS for topic_dir in config.depth_dirs})
+    topic_dirs.update({topic_dir: JSON_EXTENSIONS for topic_dir in config.action_dirs})
+    if config.use_imu:
+        topic_dirs.update({topic_dir: JSON_EXTENSIONS for topic_dir in config.imu_dirs})
+    return topic_dirs
+
+
+def is_in_root(episode_path, source_data_root):
+    return os.path.normpath(episode_path).startswith(os.path.normpath(source_data_root) + os.sep)
+
+
+def find_source_index(source_indexes, episode_path):
+    """
+    Get the index of the source root of an episode among `source_indexes` (seeing `SourceIndex` in `src/data/misc/index.py`),
+    or None.
+    """
+    for source_index in source_indexes or []:
+        if is_in_root(episode_path, source_index.source_data_root):
+            return source_index
+    return None
+
+
+def load_sync(file_path):
+    with archive.open_file(file_path, 'r') as f:
+        filenames = f.readlines()
+    return [filename.strip() for filename in filenames]
+
+
+def filename_to_timestamp(filename):
+    return float(os.path.splitext(filename)[0])
+
+
+def filenames_to_timestamps(filenames):
+    return np.array([filename_to_timestamp(filename) for filename in filenames], dtype=np.float64)
+
+
+def list_topic_files(topic_dir, extensions, use_sync=True):
+    """
+    List the frame filenames of a topic directory, in the order given by `sync.txt` if it exists,
+    otherwise sorted by the timestamps in the filenames.
+
+    Args:
+        topic_dir (str): Path to the topic directory.
+        extensions (Tuple[str]): Allowed file extensions.
+        use_sync (bool): If False, `sync.txt` is ignored and all frames are listed (e.g. for high-rate topics).
+
+    Returns:
+        List[str]: Filenames relative to the topic directory.
+    """
+    sync_path = os.path.join(topic_dir, 'sync.txt')
+    if use_sync and archive.exists(sync_path):
+        return load_sync(sync_path)
+
+    filenames = [filename for filename in archive.listdir(topic_dir) if filename.endswith(extensions)]
+    filenames.sort(key=filename_to_timestamp)
+    return filenames
+
+
+def flatten_json(data, prefix=''):
+    """
+    Flatten the numeric leaves of a nested JSON object into a dict with dotted keys,
+    e.g. {'angular_velocity': {'x': 0.1}} -> {'angular_velocity.x': 0.1}.
+    """
+    outputs = {}
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            outputs.update(flatten_json(value, prefix=f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            outputs[name] = value
+    return outputs
+
+
+def read_json_topic(topic_dir, filenames):
+    """
+    Parse the JSON files of a topic into columns.
+
+    Args:
+        topic_dir (str): Path to the topic directory.
+        filenames (List[str]): Filenames to parse.
+
+    Returns:
+        Dict[str, np.ndarray]: Column of every (flattened) numeric key, each of shape (len(filenames),).
+    """
+    rows = []
+    for filename in filenames:
+        rows.append(flatten_json(json.loads(archive.read_bytes(os.path.join(topic_dir, filename)))))
+
+    keys = rows[0].keys() if len(rows) > 0 else []
+    return {key: np.array([row[key] for row in rows], dtype=np.float64) for key in keys}
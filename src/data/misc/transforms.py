@@ -18,6 +18,14 @@ def rotation_matrix_to_euler(matrix):
     return Rotation.from_matrix(matrix).as_euler('xyz')
 
 
+def eulers_to_rotation_matrices(eulers):
+    return Rotation.from_euler('xyz', eulers).as_matrix()
+
+
+def rotation_matrices_to_eulers(matrices):
+    return Rotation.from_matrix(matrices).as_euler('xyz')
+
+
 class BaseTransform(ABC):
     """
     Base class for end effector transforms.
@@ -33,6 +41,20 @@ class BaseTransform(ABC):
         """
         pass
 
+    def pairs(self, end_effector_states, next_end_effector_states):
+        """
+        Transform N (state, next state) pairs at once, both of shape (N, 7), into actions of shape (N, 7).
+        Subclasses override this with a vectorized implementation, the default falls back to per-pair calls.
+        """
+        return np.stack([self(state, next_state) for state, next_state 
+                         in zip(end_effector_states, next_end_effector_states)])
+
+    def batch(self, end_effector_states):
+        """
+        Transform the states of a whole episode of shape (T, 7) into the T-1 actions between consecutive states.
+        """
+        return self.pairs(end_effector_states[:-1], end_effector_states[1:])
+
 
 class AbsoluteTransform(BaseTransform):
     """
@@ -42,6 +64,9 @@ class AbsoluteTransform(BaseTransform):
     def __call__(self, end_effector_state, next_end_effector_state):
         return next_end_effector_state
 
+    def pairs(self, end_effector_states, next_end_effector_states):
+        return next_end_effector_states
+
 
 class AbsoluteToDeltaBaseTransform(BaseTransform):
     """
@@ -55,6 +80,11 @@ class AbsoluteToDeltaBaseTransform(BaseTransform):
         delta_euler = next_euler - current_euler
         return np.concatenate((delta_pos, delta_euler, np.array([gripper])), axis=0)
 
+    def pairs(self, end_effector_states, next_end_effector_states):
+        delta_pos = next_end_effector_states[:, :3] - end_effector_states[:, :3]
+        delta_euler = next_end_effector_states[:, 3:6] - end_effector_states[:, 3:6]
+        return np.concatenate((delta_pos, delta_euler, next_end_effector_states[:, 6:7]), axis=1)
+
 
 class AbsoluteToDeltaGripperTransform(BaseTransform):
     """
@@ -77,6 +107,17 @@ class AbsoluteToDeltaGripperTransform(BaseTransform):
 
         return np.concatenate((delta_pos, delta_euler, np.array([gripper])), axis=0)
 
+    def pairs(self, end_effector_states, next_end_effector_states):
+        current_rot_matrices = eulers_to_rotation_matrices(end_effector_states[:, 3:6])
+        next_rot_matrices = eulers_to_rotation_matrices(next_end_effector_states[:, 3:6])
+        current_rot_matrices_t = current_rot_matrices.transpose(0, 2, 1)
+        delta_rot_matrices = next_rot_matrices @ current_rot_matrices_t
+        delta_euler = rotation_matrices_to_eulers(delta_rot_matrices)
+
+        delta_pos = current_rot_matrices_t @ (next_end_effector_states[:, :3] - end_effector_states[:, :3])[:, :, None]
+
+        return np.concatenate((delta_pos[:, :, 0], delta_euler, next_end_effector_states[:, 6:7]), axis=1)
+
 
 class BiTransform:
     def __init__(self, transform):
@@ -91,6 +132,14 @@ class BiTransform:
         right_transformed = self.transform(right_end_effector_state, right_next_end_effector_state)
         return np.concatenate((left_transformed, right_transformed), axis=0)
 
+    def pairs(self, end_effector_states, next_end_effector_states):
+        left_transformed = self.transform.pairs(end_effector_states[:, :7], next_end_effector_states[:, :7])
+        right_transformed = self.transform.pairs(end_effector_states[:, 7:], next_end_effector_states[:, 7:])
+        return np.concatenate((left_transformed, right_transformed), axis=1)
+
+    def batch(self, end_effector_states):
+        return self.pairs(end_effector_states[:-1], end_effector_states[1:])
+
 
 def get_transform(transform_type, multi_arm=True):
     if transform_type == "ee_absolute":
@@ -105,4 +154,6 @@ def get_transform(transform_type, multi_arm=True):
     if multi_arm:
         transform = BiTransform(transform)
     
-    return transform
\ No newline at end of file
+    return transform
+
+
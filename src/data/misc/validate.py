@@ -0,0 +1,175 @@
+"""
+This module is used to validate raw Pika episodes without loading them, for `check_only` mode:
+only `statistic.txt`, `sync.txt` files and the directory listings of the topics are read (also inside archives),
+and episodes are scanned in parallel on a thread pool, which makes validating thousands of episodes take seconds.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import archive
+from .topics import filename_to_timestamp, find_source_index, get_topic_dirs, load_sync
+
+
+def parse_statistic(path):
+    """
+    Parse the `statistic.txt` of a recorded episode: its duration, then the number of messages and the rate of every topic.
+
+    Returns:
+        Dict: {'duration': float, 'topics': {topic_dir: {'count': int, 'rate': float}}}, or None if the file does not exist.
+    """
+    if not archive.exists(path):
+        return None
+    with archive.open_file(path, 'r') as f:
+        lines = [line.split() for line in f if line.strip()]
+
+    statistic = {'duration': float(lines[0][0]), 'topics': {}}
+    section = None
+    for line in lines[1:]:
+        if len(line) == 1 and line[0].endswith(':'):
+            section = line[0][:-1]
+        elif section == 'topic' and len(line) == 3:
+            statistic['topics'][line[0]] = {'count': int(line[1]), 'rate': float(line[2])}
+    return statistic
+
+
+def scan_topic(topic_dir, extensions):
+    """
+    List a topic directory (of the file system or of an archive).
+
+    Returns:
+        Tuple[Set[str], np.ndarray, List[str]]: Frame filenames, their sorted timestamps, and the lines of `sync.txt` (or None).
+    """
+    filenames, sync = set(), None
+    for name in archive.listdir(topic_dir):
+        if name.endswith(extensions):
+            filenames.add(name)
+        elif name == 'sync.txt':
+            sync = load_sync(os.path.join(topic_dir, name))
+    timestamps = np.sort(np.array([filename_to_timestamp(filename) for filename in filenames], dtype=np.float64))
+    return filenames, timestamps, sync
+
+
+def validate_episode(episode_path, topic_dirs, fps, instruction_path='instructions.json', sync_method='auto',
+                     max_gap=0.1, min_rate_ratio=0.9, source_index=None):
+    """
+    Validate a raw episode from its listings.
+
+    Issues are reported with a type among:
+        - 'missing_instructions': no instruction file.
+        - 'missing_topic': a topic directory is missing or has no frames.
+        - 'count_mismatch': the number of frames differs from `statistic.txt`, or between topics
+          (`sync.txt` lengths, or frame counts when `sync_method` is 'none').
+        - 'missing_files': `sync.txt` lists frames that do not exist.
+        - 'timestamp_gap': consecutive frames of a topic are more than `max_gap` seconds apart.
+        - 'low_rate': the rate of a topic is below `min_rate_ratio * fps`.
+        - 'no_overlap': the topics do not overlap in time.
+
+    Args:
+        episode_path (str): Path to the episode.
+        topic_dirs (Dict[str, Tuple[str]]): Topic directories to check and their frame extensions.
+        fps (int): Target frame rate of the dataset.
+        instruction_path (str): Path to the instruction file, relative to the episode.
+        sync_method (str): Sync method of the conversion (seeing `DataProcessorConfig.sync_method`).
+        max_gap (float): Maximum time in seconds between consecutive frames of a topic.
+        min_rate_ratio (float): Minimum rate of every topic, as a fraction of `fps`.
+        source_index (SourceIndex): Index of the source root (seeing `src/data/misc/index.py`), topics are listed from it if set.
+
+    Returns:
+        Dict: {'episode': str, 'ok': bool, 'issues': List[Dict], 'topics': Dict[str, Dict]} (JSON serializable).
+    """
+    issues = []
+    def report(issue_type, topic=None, **details):
+        issues.append({'type': issue_type, 'topic': topic, **details})
+
+    if not archive.exists(os.path.join(episode_path, instruction_path)):
+        report('missing_instructions', path=instruction_path)
+    statistic = parse_statistic(os.path.join(episode_path, 'statistic.txt'))
+
+    topics, sync_lens = {}, {}
+    for topic_dir, extensions in topic_dirs.items():
+        try:
+            if source_index is not None:
+                filenames, timestamps, sync = source_index.scan_topic(episode_path, topic_dir, extensions)
+            else:
+                filenames, timestamps, sync = scan_topic(os.path.join(episode_path, topic_dir), extensions)
+        except FileNotFoundError:
+            report('missing_topic', topic_dir)
+            continue
+        if len(filenames) == 0:
+            report('missing_topic', topic_dir)
+            continue
+
+        span = timestamps[-1] - timestamps[0]
+        rate = (len(timestamps) - 1) / span if span > 0 else 0.0
+        gaps = np.diff(timestamps)
+        max_topic_gap = float(gaps.max()) if len(gaps) > 0 else 0.0
+        topics[topic_dir] = {
+            'num_frames': len(filenames),
+            'start': float(timestamps[0]),
+            'end': float(timestamps[-1]),
+            'rate': rate,
+            'max_gap': max_topic_gap,
+        }
+
+        if statistic is not None and topic_dir in statistic['topics']:
+            expected = statistic['topics'][topic_dir]['count']
+            if expected != len(filenames):
+                report('count_mismatch', topic_dir, num_frames=len(filenames), expected=expected, source='statistic.txt')
+        if max_topic_gap > max_gap:
+            report('timestamp_gap', topic_dir, max_gap=max_topic_gap, num_gaps=int((gaps > max_gap).sum()))
+        if rate < min_rate_ratio * fps:
+            report('low_rate', topic_dir, rate=rate, fps=fps)
+        if sync is not None:
+            sync_lens[topic_dir] = len(sync)
+            num_missing = sum(filename not in filenames for filename in sync)
+            if num_missing > 0:
+                report('missing_files', topic_dir, num_missing=num_missing, source='sync.txt')
+
+    if len(set(sync_lens.values())) > 1:
+        report('count_mismatch', num_frames=sync_lens, source='sync.txt')
+    elif sync_method == 'none' and len(sync_lens) == 0 and len({topic['num_frames'] for topic in topics.values()}) > 1:
+        report('count_mismatch', num_frames={topic_dir: topic['num_frames'] for topic_dir, topic in topics.items()})
+    if len(topics) > 0 and max(topic['start'] for topic in topics.values()) > min(topic['end'] for topic in topics.values()):
+        report('no_overlap')
+
+    return {'episode': episode_path, 'ok': len(issues) == 0, 'issues': issues, 'topics': topics}
+
+
+def validate_episodes(episode_paths, config, num_workers=8, report_path=None, source_indexes=None):
+    """
+    Validate raw episodes in parallel for the topics of a `DataProcessorConfig`, and optionally write the report
+    as JSON lines (one line per episode). Topics are listed from the index of their source root among `source_indexes` if any.
+
+    Returns:
+        List[Dict]: Report of every episode (seeing `validate_episode`).
+    """
+    topic_dirs = get_topic_dirs(config)
+
+    def validate_fn(episode_path):
+        source_index = find_source_index(source_indexes, episode_path)
+        return validate_episode(episode_path, topic_dirs, config.fps, config.instruction_path, config.sync_method,
+                                config.check_max_gap, config.check_min_rate_ratio, source_index)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        reports = list(executor.map(validate_fn, episode_paths))
+    elapsed = time.perf_counter() - start_time
+
+    if report_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, 'w') as f:
+            f.writelines(json.dumps(report) + '\n' for report in reports)
+
+    issue_counts = {}
+    for report in reports:
+        for issue in report['issues']:
+            issue_counts[issue['type']] = issue_counts.get(issue['type'], 0) + 1
+    num_failed = sum(not report['ok'] for report in reports)
+    print(f'Checked {len(reports)} episodes in {elapsed:.2f}s '
+          f'({elapsed / max(1, len(reports)) * 1000:.2f}s per thousand episodes): {num_failed} with issues {issue_counts}')
+    return reports
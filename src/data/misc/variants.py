@@ -0,0 +1,151 @@
+"""
+This module is used to write several control-mode variants of a dataset (e.g. 'ee_absolute', 'ee_delta_base' and
+'ee_delta_gripper' actions) from a single conversion pass. The actions of the extra transforms are saved per episode
+next to the converted dataset (seeing `write_variant_actions`), and every variant dataset is then assembled from it:
+its parquet files are rewritten with the actions of the variant, while the encoded videos, depth and IMU side tables are hard-linked (no decoding or encoding).
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .layout import EPISODES_PATH, EPISODES_STATS_PATH, INFO_PATH, load_json, load_jsonlines, transfer_file
+from .stats import SKETCHES_PATH, STATS_PATH, FeatureStats, aggregate_stats, load_episodes_stats, write_stats
+
+
+# actions of the extra transforms of a conversion,
+# not parquet, LeRobot counts the parquet files of a dataset to check its episodes
+VARIANT_ACTIONS_PATH = 'variant_actions/chunk-{episode_chunk:03d}/episode_{episode_index:06d}.npz'
+# directories shared as they are by the variants
+SHARED_DIRS = ['videos', 'depth', 'imu']
+
+
+def get_variant_actions_path(episode_index, chunks_size=1000):
+    return VARIANT_ACTIONS_PATH.format(episode_chunk=episode_index // chunks_size, episode_index=episode_index)
+
+
+def write_variant_actions(path, actions):
+    """
+    Save the actions of an episode for every extra transform, `actions` maps transform types to arrays of shape (N, D).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, **{transform_type: np.asarray(values, dtype=np.float32) for transform_type, values in actions.items()})
+
+
+def get_variant_root(dataset_root, transform_type):
+    """
+    Root of a variant dataset, next to the converted dataset, e.g. `lerobot/pika` -> `lerobot/pika_ee_delta_base`.
+    """
+    return f'{str(dataset_root).rstrip(os.sep)}_{transform_type}'
+
+
+def _to_column(values, column_type):
+    flat = pa.array(values.reshape(-1), type=pa.float32())
+    if pa.types.is_fixed_size_list(column_type):
+        return pa.FixedSizeListArray.from_arrays(flat, values.shape[1]).cast(column_type)
+    offsets = pa.array(np.arange(len(values) + 1, dtype=np.int32) * values.shape[1])
+    return pa.ListArray.from_arrays(offsets, flat).cast(column_type)
+
+
+def _count_variant_episodes(dataset_root, variant_root):
+    """
+    Number of episodes of an existing variant that match the first episodes of the dataset (0 if there is no such variant).
+    """
+    if not os.path.exists(os.path.join(variant_root, INFO_PATH)):
+        return 0
+    num_episodes = load_json(os.path.join(variant_root, INFO_PATH))['total_episodes']
+    episodes = load_jsonlines(os.path.join(dataset_root, EPISODES_PATH))
+    if load_jsonlines(os.path.join(variant_root, EPISODES_PATH)) != episodes[:num_episodes] or \
+            len(load_jsonlines(os.path.join(variant_root, EPISODES_STATS_PATH))) != num_episodes:
+        return 0
+    return num_episodes
+
+
+def build_variant_dataset(dataset_root, variant_root, transform_type, action_key='action', mode='link', append=False):
+    """
+    Build the variant of a converted dataset for one of its extra transforms, replacing any existing variant,
+    or only adding the episodes appended to the dataset since the variant was built if `append` is True.
+    Parquet files are rewritten with the actions of the variant and the stats of the action are recomputed,
+    the other metadata is copied and the videos, depth and IMU files are transferred with `mode` ('link' or 'copy').
+    Sketches of the stats (seeing `src/scripts/data/compute_stats.py`) are not carried over.
+
+    Args:
+        dataset_root (str): Root of the converted dataset, with the actions of its extra transforms.
+        variant_root (str): Root of the variant dataset.
+        transform_type (str): Transform of the variant, e.g. 'ee_delta_base'.
+        action_key (str): Name of the action feature.
+        mode (str): How the shared files are transferred, 'link' (hard-link) or 'copy'.
+        append (bool): If True, the episodes of an existing variant are kept if they match the first episodes of the dataset
+                       (the variant is rebuilt otherwise), e.g. after an `incremental` conversion.
+
+    Returns:
+        int: Number of episodes added to the variant.
+
+    Examples:
+        ```python
+        root = '~/.cache/huggingface/lerobot/lerobot/pika'
+        build_variant_dataset(root, get_variant_root(root, 'ee_delta_base'), 'ee_delta_base')
+        ```
+    """
+    dataset_root, variant_root = os.path.expanduser(str(dataset_root)), os.path.expanduser(str(variant_root))
+    info = load_json(os.path.join(dataset_root, INFO_PATH))
+    num_kept = _count_variant_episodes(dataset_root, variant_root) if append else 0
+    if num_kept == 0:
+        shutil.rmtree(variant_root, ignore_errors=True)
+    episode_indices = range(num_kept, info['total_episodes'])
+
+    missing = [episode_index for episode_index in episode_indices
+               if not os.path.exists(os.path.join(dataset_root, get_variant_actions_path(episode_index, info['chunks_size'])))]
+    if len(missing) > 0:
+        raise ValueError(f'Episodes {missing} of {dataset_root} have no actions of the extra transforms, they were converted '
+                         f'without `extra_transform_types`: reconvert the dataset with {transform_type} in `extra_transform_types`.')
+
+    action_stats = {}
+    for episode_index in episode_indices:
+        actions_path = os.path.join(dataset_root, get_variant_actions_path(episode_index, info['chunks_size']))
+        with np.load(actions_path) as arrays:
+            if transform_type not in arrays.files:
+                raise ValueError(f'No {transform_type} actions in {actions_path}, convert with it in `extra_transform_types`')
+            actions = arrays[transform_type]
+
+        data_path = info['data_path'].format(episode_chunk=episode_index // info['chunks_size'], episode_index=episode_index)
+        table = pq.read_table(os.path.join(dataset_root, data_path))
+        if len(actions) != table.num_rows:
+            raise ValueError(f'Episode {episode_index} has {table.num_rows} frames but {len(actions)} {transform_type} actions')
+        field = table.schema.field(action_key)
+        table = table.set_column(table.schema.get_field_index(action_key), field, _to_column(actions, field.type))
+        os.makedirs(os.path.dirname(os.path.join(variant_root, data_path)), exist_ok=True)
+        pq.write_table(table, os.path.join(variant_root, data_path))
+        action_stats[episode_index] = FeatureStats().update(actions)
+
+    for directory in SHARED_DIRS:
+        for root, _, filenames in os.walk(os.path.join(dataset_root, directory)):
+            for filename in filenames:
+                src_path = os.path.join(root, filename)
+                dst_path = os.path.join(variant_root, os.path.relpath(src_path, dataset_root))
+                if not os.path.exists(dst_path):
+                    transfer_file(src_path, dst_path, mode)
+
+    # the stats of the kept episodes are the ones of the variant
+    episodes_stats = load_jsonlines(os.path.join(variant_root, EPISODES_STATS_PATH))[:num_kept]
+    for item in load_jsonlines(os.path.join(dataset_root, EPISODES_STATS_PATH))[num_kept:]:
+        item['stats'][action_key] = {name: value.tolist() for name, value in action_stats[item['episode_index']].to_dict().items()}
+        episodes_stats.append(item)
+    os.makedirs(os.path.join(variant_root, 'meta'), exist_ok=True)
+    with open(os.path.join(variant_root, EPISODES_STATS_PATH), 'w') as f:
+        for item in episodes_stats:
+            f.write(json.dumps(item) + '\n')
+    if os.path.exists(os.path.join(dataset_root, STATS_PATH)):
+        write_stats(variant_root, aggregate_stats(load_episodes_stats(variant_root).values()))
+
+    # the info is copied last, so that an interrupted build is detected and rebuilt by the next one
+    skipped = {EPISODES_STATS_PATH, STATS_PATH, SKETCHES_PATH, INFO_PATH}
+    for filename in os.listdir(os.path.join(dataset_root, 'meta')):
+        if os.path.join('meta', filename) not in skipped:
+            transfer_file(os.path.join(dataset_root, 'meta', filename), os.path.join(variant_root, 'meta', filename), 'copy')
+    transfer_file(os.path.join(dataset_root, INFO_PATH), os.path.join(variant_root, INFO_PATH), 'copy')
+    return len(episode_indices)
@@ -0,0 +1,264 @@
+"""
+This module is used to encode episode videos off the critical path of the conversion, either by:
+1. encoding the frames of an episode straight into its video while the episode is being added,
+   instead of writing temporary PNG images that are decoded again and encoded once the episode is saved.
+2. encoding the temporary images of finished episodes on a pool of background processes,
+   while the next episodes are being added.
+"""
+
+import glob
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import av
+from PIL import Image
+
+from .layout import INFO_PATH, load_json, write_json
+
+
+def _add_video_stream(output, fps, width, height, vcodec='libsvtav1', pix_fmt='yuv420p', g=2, crf=30):
+    options = {}
+    if g is not None:
+        options['g'] = str(g)
+    if crf is not None:
+        options['crf'] = str(crf)
+    stream = output.add_stream(vcodec, fps, options=options)
+    stream.pix_fmt = pix_fmt
+    stream.width = width
+    stream.height = height
+    return stream
+
+
+def encode_image_dir(image_dir, video_path, fps, vcodec='libsvtav1', pix_fmt='yuv420p', g=2, crf=30):
+    """
+    Encode the temporary images (frame_XXXXXX.png) of an episode into a video, like LeRobot's `encode_video_frames`.
+    Only PyAV and PIL are imported, which keeps the start-up of encoding processes cheap (no torch).
+    """
+    image_paths = sorted(glob.glob(os.path.join(str(image_dir), 'frame_' + '[0-9]' * 6 + '.png')))
+    if len(image_paths) == 0:
+        raise FileNotFoundError(f'No images found in {image_dir}.')
+    width, height = Image.open(image_paths[0]).size
+
+    logging.getLogger('libav').setLevel(logging.ERROR)
+    os.makedirs(os.path.dirname(str(video_path)), exist_ok=True)
+    with av.open(str(video_path), 'w') as output:
+        stream = _add_video_stream(output, fps, width, height, vcodec, pix_fmt, g, crf)
+        for image_path in image_paths:
+            frame = av.VideoFrame.from_image(Image.open(image_path).convert('RGB'))
+            output.mux(stream.encode(frame))
+        output.mux(stream.encode())
+
+
+class VideoStreamEncoder(object):
+    """
+    Encode frames into a video with PyAV, on a background thread fed by a bounded queue.
+    The encoder options default to the ones LeRobot uses to encode episode videos.
+
+    Attributes:
+        video_path: Path of the video to write.
+        fps: Frame rate of the video.
+        width: Width of the frames.
+        height: Height of the frames.
+        vcodec: Video codec, e.g. 'libsvtav1', 'h264' or 'hevc'.
+        pix_fmt: Pixel format of the encoded video.
+        g: Group of pictures size (keyframe interval).
+        crf: Constant rate factor (quality).
+        max_pending: Maximum number of frames queued for encoding, `write` blocks when the queue is full.
+        input_format: Pixel format of the written arrays, e.g. 'rgb24' for (H, W, 3) uint8 or 'gray16le' for (H, W) uint16.
+
+    Examples:
+        ```python
+        encoder = VideoStreamEncoder('episode_000000.mp4', fps=30, width=640, height=480)
+        for image in images:
+            encoder.write(image)
+        encoder.close()
+        ```
+    """
+
+    def __init__(self, video_path, fps, width, height, vcodec='libsvtav1', pix_fmt='yuv420p',
+                 g=2, crf=30, max_pending=16, input_format='rgb24'):
+        self.video_path = str(video_path)
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.stream_options = {'vcodec': vcodec, 'pix_fmt': pix_fmt, 'g': g, 'crf': crf}
+        self.input_format = input_format
+
+        self.queue = queue.Queue(maxsize=max(1, max_pending))
+        self.error = None
+        self.num_frames = 0
+        os.makedirs(os.path.dirname(self.video_path), exist_ok=True)
+        self.thread = threading.Thread(target=self._encode, daemon=True)
+        self.thread.start()
+
+    def _encode(self):
+        logging.getLogger('libav').setLevel(logging.ERROR)
+        finished = False
+        try:
+            with av.open(self.video_path, 'w') as output:
+                stream = _add_video_stream(output, self.fps, self.width, self.height, **self.stream_options)
+
+                while True:
+                    image = self.queue.get()
+                    if image is None:
+                        finished = True
+                        break
+                    frame = av.VideoFrame.from_ndarray(image, format=self.input_format)
+                    output.mux(stream.encode(frame))
+
+                output.mux(stream.encode())
+        except Exception as e:
+            self.error = e
+            # drain the queue so that `write` and `close` never block on a dead encoder
+            while not finished and self.queue.get() is not None:
+                pass
+
+    def write(self, image):
+        if self.error is not None:
+            raise RuntimeError(f'Encoding {self.video_path} failed') from self.error
+        self.queue.put(image)
+        self.num_frames += 1
+
+    def close(self):
+        """
+        Flush the encoder and finalize the video, raising if encoding failed.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise RuntimeError(f'Encoding {self.video_path} failed') from self.error
+        if not os.path.exists(self.video_path):
+            raise OSError(f'Video encoding did not work. File not found: {self.video_path}.')
+
+    def abort(self):
+        """
+        Stop encoding and remove the partial video.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        if os.path.exists(self.video_path):
+            os.remove(self.video_path)
+
+
+def encode_missing_videos(dataset_root):
+    """
+    Encode the videos of committed episodes that an interrupted run left unencoded,
+    from the temporary images kept for them (see `AsyncEpisodeEncoder`).
+
+    Returns:
+        List[int]: Indices of the episodes whose videos were encoded.
+    """
+    try:
+        # v2.1
+        from lerobot.datasets.video_utils import get_video_info
+    except ImportError:
+        # v2.0
+        from lerobot.common.datasets.video_utils import get_video_info
+
+    info = load_json(os.path.join(dataset_root, INFO_PATH))
+    video_keys = [key for key, feature in info['features'].items() if feature['dtype'] == 'video']
+    encoded = []
+    for episode_index in range(info['total_episodes']):
+        episode_chunk = episode_index // info['chunks_size']
+        for key in video_keys:
+            video_path = os.path.join(dataset_root, info['video_path'].format(
+                episode_chunk=episode_chunk, video_key=key, episode_index=episode_index))
+            if os.path.exists(video_path):
+                continue
+            image_dir = os.path.join(dataset_root, 'images', key, f'episode_{episode_index:06d}')
+            encode_image_dir(image_dir, video_path, info['fps'])
+            shutil.rmtree(image_dir)
+            if not info['features'][key].get('info'):
+                info['features'][key]['info'] = get_video_info(video_path)
+            if episode_index not in encoded:
+                encoded.append(episode_index)
+    if len(encoded) > 0:
+        write_json(info, os.path.join(dataset_root, INFO_PATH))
+    return encoded
+
+
+class AsyncEpisodeEncoder(object):
+    """
+    Encode the videos of finished episodes from their temporary images on a pool of worker processes,
+    one job per camera stream. Videos are encoded into `staging_root` and moved to their final path
+    once all streams of an episode are done, episode by episode in submission order.
+
+    Attributes:
+        staging_root: Directory the videos are encoded into before being moved into the dataset.
+        fps: Frame rate of the videos.
+        num_workers: Number of encoding processes.
+        max_pending_episodes: Maximum number of episodes being encoded, `submit` waits for the oldest beyond it.
+
+    Examples:
+        ```python
+        encoder = AsyncEpisodeEncoder('/path/to/staging', fps=30, num_workers=4)
+        for episode_index in ...:
+            ...  # write the images of the episode
+            for finished_index in encoder.submit(episode_index, {key: (image_dir, video_path)}):
+                ...  # the videos of `finished_index` are in place
+        for finished_index in encoder.drain():
+            ...
+        encoder.close()
+        ```
+    """
+
+    def __init__(self, staging_root, fps, num_workers=4, max_pending_episodes=2):
+        self.staging_root = str(staging_root)
+        self.fps = fps
+        self.max_pending_episodes = max(1, max_pending_episodes)
+        shutil.rmtree(self.staging_root, ignore_errors=True)
+        context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(max_workers=num_workers, mp_context=context)
+        self.pending = deque()
+
+    def submit(self, episode_index, videos):
+        """
+        Start encoding the videos of an episode.
+
+        Args:
+            episode_index (int): Index of the episode.
+            videos (Dict[str, Tuple[str, str]]): (image directory, video path) of every camera stream.
+
+        Returns:
+            List[int]: Indices of the episodes whose videos were finished and moved into place, in order.
+        """
+        jobs = []
+        for key, (image_dir, video_path) in videos.items():
+            staging_path = os.path.join(self.staging_root, f'episode_{episode_index:06d}', f'{key}.mp4')
+            future = self.executor.submit(encode_image_dir, image_dir, staging_path, self.fps)
+            jobs.append((future, staging_path, str(video_path)))
+        self.pending.append((episode_index, jobs))
+
+        finished = []
+        while len(self.pending) > self.max_pending_episodes:
+            finished.append(self._finish_oldest())
+        while len(self.pending) > 0 and all(future.done() for future, _, _ in self.pending[0][1]):
+            finished.append(self._finish_oldest())
+        return finished
+
+    def _finish_oldest(self):
+        episode_index, jobs = self.pending.popleft()
+        for future, staging_path, video_path in jobs:
+            future.result()
+            os.makedirs(os.path.dirname(video_path), exist_ok=True)
+            os.replace(staging_path, video_path)
+        return episode_index
+
+    def drain(self):
+        """
+        Wait for all pending episodes, returns their indices in order.
+        """
+        finished = []
+        while len(self.pending) > 0:
+            finished.append(self._finish_oldest())
+        return finished
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.staging_root, ignore_errors=True)
@@ -4,12 +4,23 @@ import os
 from collections import defaultdict
 
 from .dummy_data_processor import DummyDataProcessor
-
-
-def load_sync(file_path):
-    with open(file_path, 'r') as f:
-        filenames = f.readlines()
-    return [filename.strip() for filename in filenames]
+from .misc import archive
+from .misc.cache import EpisodeCache
+from .misc.images import load_depth, load_image, select_backend
+from .misc.imu import merge_imu_topics
+from .misc.index import SourceIndex, find_episode_paths
+from .misc.sync import get_euler_columns, interpolate_stream, synchronize_streams
+from .misc.topics import (
+    IMAGE_EXTENSIONS,
+    JSON_EXTENSIONS,
+    filenames_to_timestamps,
+    find_source_index,
+    get_topic_dirs,
+    list_topic_files,
+    load_sync,
+    read_json_topic,
+)
+from .misc.validate import validate_episodes
 
 
 class PikaDataProcessor(DummyDataProcessor):
@@ -43,51 +54,129 @@ class PikaDataProcessor(DummyDataProcessor):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.image_decoder = None if self.config.image_decoder == 'auto' else self.config.image_decoder
+        # indexes of the source roots, updated by `_list_episode_paths` or loaded on first use by worker processes
+        self.source_indexes = None
 
     def process_data(self):
-        for source_idx, source_data_root in enumerate(self.config.source_data_roots):
-            episode_dirs = [d for d in os.listdir(source_data_root)]
-            for episode_idx, episode_dir in enumerate(sorted(episode_dirs, key=lambda x: int(x[7:]))):
-                episode_path = os.path.join(source_data_root, episode_dir)
-                print(f'Processing source {source_idx + 1}/{len(self.config.source_data_roots)}, episode {episode_idx + 1}/{len(episode_dirs)}: {episode_path}')
-                self._add_episode(episode_path)
+        self._process_episodes(self._list_episode_paths())
+
+    def _list_episode_paths(self):
+        if self.config.use_source_index:
+            return self._update_source_indexes()
+        episode_paths = []
+        for source_data_root in self.config.source_data_roots:
+            episode_paths.extend(find_episode_paths(source_data_root))
+        return episode_paths
+
+    def _update_source_indexes(self):
+        topics = list(get_topic_dirs(self.config))
+        self.source_indexes = []
+        episode_paths = []
+        with self.profiler.stage('index'):
+            for source_data_root in self.config.source_data_roots:
+                source_index = SourceIndex(source_data_root, self.config.source_index_root)
+                if self.config.source_index_refresh or len(source_index.episodes) == 0:
+                    episode_paths.extend(source_index.update(topics, self.config.check_workers))
+                    source_index.save()
+                else:
+                    episode_paths.extend(source_index.episode_paths())
+                self.source_indexes.append(source_index)
+        if self.manifest is not None:
+            self.manifest.use_source_indexes(self.source_indexes, topics)
+        return episode_paths
+
+    def _get_source_index(self, episode_path):
+        if not self.config.use_source_index:
+            return None
+        if self.source_indexes is None:
+            self.source_indexes = [SourceIndex(source_data_root, self.config.source_index_root)
+                                   for source_data_root in self.config.source_data_roots]
+        return find_source_index(self.source_indexes, episode_path)
+
+    def _list_topic_files(self, episode_path, topic_dir, extensions, use_sync=True):
+        source_index = self._get_source_index(episode_path)
+        if source_index is None:
+            return list_topic_files(os.path.join(episode_path, topic_dir), extensions, use_sync)
+        return source_index.list_topic_files(episode_path, topic_dir, extensions, use_sync)
+
+    def _check_episodes(self, episode_paths):
+        source_indexes = self.source_indexes if self.config.use_source_index else None
+        return validate_episodes(episode_paths, self.config, self.config.check_workers, self.config.check_report_path,
+                                 source_indexes)
         
     def _load_episode(self, episode_path):
+        depth_dirs = self.config.depth_dirs if self.config.use_depth else []
+        # resampling works on the recorded frames, not on the ones selected by `sync.txt`
+        use_sync = self.config.sync_method != 'interpolate'
+        topic_filenames = {}
+        with self.profiler.stage('list'):
+            for topic_dir in self.config.rgb_dirs + depth_dirs:
+                topic_filenames[topic_dir] = self._list_topic_files(episode_path, topic_dir, IMAGE_EXTENSIONS, use_sync)
+            for topic_dir in self.config.action_dirs:
+                topic_filenames[topic_dir] = self._list_topic_files(episode_path, topic_dir, JSON_EXTENSIONS, use_sync)
+        with self.profiler.stage('sync'):
+            topic_filenames, clock = self._synchronize(episode_path, topic_filenames)
+
         raw_images = defaultdict(list)
         for rgb_dir, rgb_name in zip(self.config.rgb_dirs, self.config.rgb_names):
-            rgb_dir = os.path.join(episode_path, rgb_dir)
-            
-            if os.path.exists(os.path.join(rgb_dir, 'sync.txt')):
-                filenames = load_sync(os.path.join(rgb_dir, 'sync.txt'))
-            else:
-                filenames = os.listdir(rgb_dir)
-                filenames = [filename for filename in filenames if filename.endswith('.jpg') or filename.endswith('.png')]
-                filenames.sort(key=lambda x: float(x[:-4]))
-
-            for filename in filenames:
-                image_path = os.path.join(rgb_dir, filename)
-                raw_images[rgb_name].append(image_path)
+            rgb_dir_ = os.path.join(episode_path, rgb_dir)
+            raw_images[rgb_name] = [os.path.join(rgb_dir_, filename) for filename in topic_filenames[rgb_dir]]
+            if self.image_decoder is None and len(raw_images[rgb_name]) > 0:
+                self.image_decoder = select_backend(
+                    archive.read_bytes(raw_images[rgb_name][0]), self.config.image_height, self.config.image_width)
+                print(f'Selected image decoder: {self.image_decoder}')
             
+        cache = EpisodeCache(episode_path, self.config.json_cache_root) if self.config.use_json_cache else None
         raw_actions = defaultdict(list)
         for action_dir, action_keys in zip(self.config.action_dirs, self.config.action_keys_list):
             action_dir_ = os.path.join(episode_path, action_dir)
+            filenames = topic_filenames[action_dir]
+
+            with self.profiler.stage('json'):
+                if cache is not None:
+                    raw_actions[action_dir] = cache.load(action_dir, filenames, action_keys)
+                else:
+                    for filename in filenames:
+                        action_path = os.path.join(action_dir_, filename)
+                        action_data = json.loads(archive.read_bytes(action_path))
+                        action_data = np.array([action_data[key] for key in action_keys])
+                        raw_actions[action_dir].append(action_data)
+            self.profiler.count('json_files', len(filenames))
+
+            if clock is not None:
+                with self.profiler.stage('sync'):
+                    raw_actions[action_dir] = interpolate_stream(
+                        filenames_to_timestamps(filenames), np.stack(raw_actions[action_dir]), clock, get_euler_columns(action_keys))
+
+        # timestamps of the synchronized frames, at the rate of the recording unless resampled onto the clock
+        if clock is not None:
+            frame_timestamps = clock
+        else:
+            reference_dir = (self.config.rgb_dirs + self.config.action_dirs)[0]
+            frame_timestamps = filenames_to_timestamps(topic_filenames[reference_dir])
 
-            if os.path.exists(os.path.join(action_dir_, 'sync.txt')):
-                filenames = load_sync(os.path.join(action_dir_, 'sync.txt'))
-            else:
-                filenames = os.listdir(action_dir_)
-                filenames = [filename for filename in filenames if filename.endswith('.json')]
-                filenames.sort(key=lambda x: float(x[:-5]))
-
-            for filename in filenames:
-                action_path = os.path.join(action_dir_, filename)
-                with open(action_path, 'r') as f:
-                    action_data = json.load(f)
-                action_data = np.array([action_data[key] for key in action_keys])
-                raw_actions[action_dir].append(action_data)
+        if self.config.use_imu:
+            # the IMU topics are kept at their native rate, and resampled onto the frames by their timestamps
+            imu_topics = []
+            for imu_dir in self.config.imu_dirs:
+                with self.profiler.stage('list'):
+                    filenames = self._list_topic_files(episode_path, imu_dir, JSON_EXTENSIONS, use_sync=False)
+                with self.profiler.stage('json'):
+                    if cache is not None:
+                        values = cache.load(imu_dir, filenames, self.config.imu_keys)
+                    else:
+                        columns = read_json_topic(os.path.join(episode_path, imu_dir), filenames)
+                        values = np.stack([columns[key] for key in self.config.imu_keys], axis=1)
+                self.profiler.count('json_files', len(filenames))
+                imu_topics.append((filenames_to_timestamps(filenames), values))
+            imu_timestamps, imu_values = merge_imu_topics(imu_topics)
+
+        if cache is not None:
+            cache.save()
         
         instruction_path = os.path.join(episode_path, self.config.instruction_path)
-        with open(instruction_path, 'r') as f:
+        with archive.open_file(instruction_path, 'r') as f:
             instruction_data = json.load(f)
         
         instruction = instruction_data['instructions'][0]
@@ -97,35 +186,59 @@ class PikaDataProcessor(DummyDataProcessor):
         outputs = {
             'raw_images': raw_images,
             'raw_actions': raw_actions,
-            'instruction': instruction
+            'instruction': instruction,
+            'frame_timestamps': frame_timestamps,
         }
 
+        if self.config.use_imu:
+            outputs['raw_imu'] = {'timestamps': imu_timestamps, 'values': imu_values}
+
         if self.config.use_depth:
             raw_depths = defaultdict(list)
             for depth_dir, depth_name in zip(self.config.depth_dirs, self.config.depth_names):
-                depth_dir = os.path.join(episode_path, depth_dir)
-
-                if os.path.exists(os.path.join(depth_dir, 'sync.txt')):
-                    filenames = load_sync(os.path.join(depth_dir, 'sync.txt'))
-                else:
-                    filenames = os.listdir(depth_dir)
-                    filenames = [filename for filename in filenames if filename.endswith('.png') or filename.endswith('.jpg')]
-                    filenames.sort(key=lambda x: float(x[:-4]))
-                
-                for filename in filenames:
-                    depth_path = os.path.join(depth_dir, filename)
-                    raw_depths[depth_name].append(depth_path)
+                depth_dir_ = os.path.join(episode_path, depth_dir)
+                raw_depths[depth_name] = [os.path.join(depth_dir_, filename) for filename in topic_filenames[depth_dir]]
             outputs['raw_depths'] = raw_depths
         
-        lens = []
-        for rgb_name, images_list in raw_images.items():
-            lens.append(len(images_list))
-        for action_dir, actions_list in raw_actions.items():
-            lens.append(len(actions_list))
-        if self.config.use_depth:
-            for depth_name, depth_list in raw_images.items():
-                lens.append(len(depth_list))
-        
-        assert all(lens[0] == l for l in lens), "All lists must have the same length"
-        
         return outputs
+
+    def _read_image(self, source):
+        return load_image(archive.read_bytes(source), self.config.image_height, self.config.image_width, backend=self.image_decoder)
+
+    def _read_depth(self, source):
+        return load_depth(archive.read_bytes(source), self.config.image_height, self.config.image_width)
+
+    def _synchronize(self, episode_path, topic_filenames):
+        """
+        Align the frames of all topics. Topics of equal length are kept as they are (e.g. when `sync.txt` exists),
+        otherwise (or always, if `sync_method` is 'nearest' or 'previous') every topic is matched
+        by the timestamps in its filenames to a reference clock at `fps`.
+        With `sync_method` 'interpolate', image topics are matched to the clock and action topics are kept whole,
+        to be interpolated at its ticks.
+
+        Returns:
+            Tuple[Dict[str, List[str]], np.ndarray]: The aligned filenames of every topic, 
+                and the clock if the action topics must be interpolated at it (None otherwise).
+        """
+        lens = [len(filenames) for filenames in topic_filenames.values()]
+        equal_lens = all(lens[0] == l for l in lens)
+        method = self.config.sync_method
+        if method == 'none' or (method == 'auto' and equal_lens):
+            assert equal_lens, "All lists must have the same length, set `sync_method` to synchronize them by timestamps"
+            return topic_filenames, None
+        
+        timestamps = {topic_dir: filenames_to_timestamps(filenames) for topic_dir, filenames in topic_filenames.items()}
+        clock, indices = synchronize_streams(
+            timestamps,
+            self.config.fps,
+            method='previous' if method == 'previous' else 'nearest',
+            max_skew=self.config.sync_max_skew,
+            reference=self.config.sync_reference,
+        )
+        print(f'Synchronized {len(topic_filenames)} topics of {episode_path} (lengths {min(lens)}-{max(lens)}) '
+              f'to {len(clock)} frames at {self.config.fps} fps')
+        if method == 'interpolate':
+            interpolated = set(self.config.action_dirs)
+            return {topic_dir: filenames if topic_dir in interpolated else [filenames[i] for i in indices[topic_dir]]
+                    for topic_dir, filenames in topic_filenames.items()}, clock
+        return {topic_dir: [topic_filenames[topic_dir][i] for i in indices[topic_dir]] for topic_dir in topic_filenames}, None
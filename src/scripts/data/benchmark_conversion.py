@@ -0,0 +1,140 @@
+"""
+This script benchmarks the conversion of raw Pika data into a LeRobot dataset on synthetic episodes
+(seeing `src/data/misc/synthetic.py`), and reports the conversion throughput in frames/s and source MB/s.
+The synthetic episodes are written to `--source_data_root` (kept for later runs) or to a temporary directory,
+and with `--archive` they are packed into one tar / zip archive, or into one archive per episode, which is then converted directly.
+
+Example command:
+python src/scripts/data/benchmark_conversion.py --num_episodes 4 --num_frames 300 --num_cameras 3 --num_workers 2
+python src/scripts/data/benchmark_conversion.py --source_data_root /tmp/pika_synthetic --generate_only --num_episodes 20
+python src/scripts/data/benchmark_conversion.py --num_episodes 4 --archive tar --archive_per_episode
+"""
+
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from src.data.configuration_data_processor import (
+    RGBMultiArmDeltaGripperDataProcessorConfig,
+    RGBSingleArmDeltaGripperDataProcessorConfig,
+)
+from src.data.misc.archive import pack_directory
+from src.data.misc.synthetic import generate_synthetic_dataset, get_dir_size
+from src.data.pika_data_processor import PikaDataProcessor
+
+
+def make_config(args, source_data_root, data_root):
+    config_cls = RGBMultiArmDeltaGripperDataProcessorConfig if args.num_arms > 1 else RGBSingleArmDeltaGripperDataProcessorConfig
+    config = config_cls(
+        source_data_roots=[source_data_root],
+        data_root=data_root,
+        repo_id='lerobot/pika_benchmark',
+        image_height=args.image_height,
+        image_width=args.image_width,
+        image_decoder=args.image_decoder,
+        use_depth=args.use_depth,
+        depth_dirs=['camera/depth/pikaDepthCamera_l'] if args.use_depth else [],
+        depth_names=['observation.depths.left_wrist'] if args.use_depth else [],
+        depth_storage=args.depth_storage,
+        use_imu=args.use_imu,
+        imu_resample=args.imu_resample,
+        trim_idle=args.trim_idle,
+        num_workers=args.num_workers,
+        stream_video=args.stream_video,
+        encoding_workers=args.encoding_workers,
+        profile=args.profile_path is not None,
+        profile_path=args.profile_path,
+    )
+    if args.num_cameras > len(config.rgb_dirs):
+        raise ValueError(f'At most {len(config.rgb_dirs)} cameras with {args.num_arms} arm(s), got {args.num_cameras}')
+    config.rgb_dirs = config.rgb_dirs[:args.num_cameras]
+    config.rgb_names = config.rgb_names[:args.num_cameras]
+    return config
+
+
+def pack_source(source_data_root, archive_root, args):
+    start_time = time.perf_counter()
+    os.makedirs(archive_root, exist_ok=True)
+    if args.archive_per_episode:
+        for name in os.listdir(source_data_root):
+            pack_directory(os.path.join(source_data_root, name), os.path.join(archive_root, f'{name}.{args.archive}'))
+    else:
+        archive_root = pack_directory(source_data_root, os.path.join(archive_root, f'source.{args.archive}'))
+    print(f'Packed the episodes into {args.archive} archives in {time.perf_counter() - start_time:.1f}s')
+    return archive_root
+
+
+def benchmark(args):
+    work_root = tempfile.mkdtemp(prefix='pika_benchmark_')
+    source_data_root = args.source_data_root or os.path.join(work_root, 'source')
+    config = make_config(args, source_data_root, os.path.join(work_root, 'output'))
+
+    try:
+        if not os.path.exists(source_data_root):
+            start_time = time.perf_counter()
+            generate_synthetic_dataset(source_data_root, args.num_episodes, config, num_frames=args.num_frames,
+                                       jitter=args.jitter, drop_rate=args.drop_rate, write_sync=args.write_sync,
+                                       idle_duration=args.idle_duration, seed=args.seed)
+            print(f'Generated {args.num_episodes} episodes in {source_data_root} in {time.perf_counter() - start_time:.1f}s')
+        source_size = get_dir_size(source_data_root)
+        if args.generate_only:
+            print(f'Source size {source_size / 2**20:.1f} MB')
+            return
+        if args.archive is not None:
+            config.source_data_roots = [pack_source(source_data_root, os.path.join(work_root, 'archives'), args)]
+
+        start_time = time.perf_counter()
+        processor = PikaDataProcessor(config)
+        processor.process_data()
+        elapsed = time.perf_counter() - start_time
+
+        meta = processor.dataset.meta
+        num_frames = meta.total_frames
+        output_size = get_dir_size(processor.dataset.root)
+        print(f'Converted {meta.total_episodes} episodes, {num_frames} frames x {len(config.rgb_names)} cameras '
+              f'in {elapsed:.1f}s: {num_frames / elapsed:.1f} frames/s, '
+              f'{num_frames * len(config.rgb_names) / elapsed:.1f} camera frames/s, '
+              f'{source_size / 2**20 / elapsed:.1f} source MB/s '
+              f'(source {source_size / 2**20:.1f} MB, output {output_size / 2**20:.1f} MB)')
+    finally:
+        shutil.rmtree(work_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the conversion of synthetic raw Pika episodes.")
+    parser.add_argument('--source_data_root', type=str, default=None,
+                        help='Directory of the synthetic episodes, generated if it does not exist (temporary if not set).')
+    parser.add_argument('--generate_only', action='store_true', help='Only generate the synthetic episodes.')
+    parser.add_argument('--num_episodes', type=int, default=4, help='Number of episodes.')
+    parser.add_argument('--num_frames', type=int, default=300, help='Number of camera frames per episode.')
+    parser.add_argument('--num_arms', type=int, default=2, help='Number of arms (1 or 2).')
+    parser.add_argument('--num_cameras', type=int, default=3, help='Number of cameras.')
+    parser.add_argument('--image_height', type=int, default=480, help='Height of the camera frames.')
+    parser.add_argument('--image_width', type=int, default=640, help='Width of the camera frames.')
+    parser.add_argument('--use_depth', action='store_true', help='Also generate and convert a depth camera.')
+    parser.add_argument('--depth_storage', type=str, default='parquet', help='Depth storage of the converted dataset.')
+    parser.add_argument('--use_imu', action='store_true', help='Also generate and convert the IMU topics.')
+    parser.add_argument('--imu_resample', type=str, default='mean', help='How IMU samples are aligned to the frames.')
+    parser.add_argument('--jitter', type=float, default=0.002, help='Standard deviation in seconds of the timestamp noise.')
+    parser.add_argument('--drop_rate', type=float, default=0.01, help='Fraction of dropped frames of every topic.')
+    parser.add_argument('--write_sync', action='store_true', help='Write sync.txt files aligning the topics.')
+    parser.add_argument('--idle_duration', type=float, default=0.0,
+                        help='Duration in seconds of the idle segments at the start and the end of every episode.')
+    parser.add_argument('--trim_idle', action='store_true', help='Trim the idle segments of the episodes.')
+    parser.add_argument('--archive', type=str, default=None, choices=['tar', 'zip'],
+                        help='Pack the synthetic episodes into archives and convert them without extraction.')
+    parser.add_argument('--archive_per_episode', action='store_true', help='Pack one archive per episode.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed.')
+    parser.add_argument('--image_decoder', type=str, default='imageio', help='Image decoder of the conversion.')
+    parser.add_argument('--num_workers', type=int, default=1, help='Number of worker processes converting episodes.')
+    parser.add_argument('--stream_video', action='store_true', help='Encode camera frames straight into the videos.')
+    parser.add_argument('--encoding_workers', type=int, default=0, help='Number of background video encoding processes.')
+    parser.add_argument('--profile_path', type=str, default=None,
+                        help='Profile the stages of the conversion and export them to this JSON or CSV file.')
+    args = parser.parse_args()
+    benchmark(args)
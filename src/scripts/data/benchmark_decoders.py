@@ -0,0 +1,54 @@
+"""
+This script benchmarks the available image decoder backends on sample images at a target resolution,
+and prints the backend that `image_decoder='auto'` would select.
+Without `--image_path`, a synthetic 1280x720 JPEG is used.
+
+Example command:
+python src/scripts/data/benchmark_decoders.py --image_path /path/to/episode0/camera/color/pika_camera_l/0.jpg --image_height 480 --image_width 640
+"""
+
+import sys
+sys.path.append('.')
+
+import argparse
+import io
+
+import imageio.v3 as imageio
+import numpy as np
+
+from src.data.misc.images import available_backends, benchmark_backends, load_image
+
+
+def synthetic_jpeg(height=720, width=1280, seed=0):
+    rng = np.random.default_rng(seed)
+    image = np.cumsum(rng.integers(-8, 9, size=(height, width, 3)), axis=1)
+    image = np.clip(image + 128, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    imageio.imwrite(buffer, image, extension='.jpg')
+    return buffer.getvalue()
+
+
+def benchmark(args):
+    source = args.image_path if args.image_path is not None else synthetic_jpeg()
+    print(f'Available backends: {available_backends()}')
+    reference = load_image(source, args.image_height, args.image_width, backend='imageio').astype(np.float64)
+
+    latencies = benchmark_backends(source, args.image_height, args.image_width, repeats=args.repeats)
+    full_latency = benchmark_backends(source, backends=['imageio'], repeats=args.repeats)['imageio']
+    print(f'{"imageio (full)":>18}: {full_latency * 1e3:8.2f} ms')
+    for backend, latency in latencies.items():
+        image = load_image(source, args.image_height, args.image_width, backend=backend)
+        mean_diff = np.abs(image.astype(np.float64) - reference).mean()
+        print(f'{backend:>18}: {latency * 1e3:8.2f} ms, speedup {full_latency / latency:5.1f}x, '
+              f'shape {image.shape}, mean abs diff {mean_diff:.2f}')
+    print(f'Selected backend: {min(latencies, key=latencies.get)}')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image decoder backends.")
+    parser.add_argument('--image_path', type=str, default=None, help='Sample image (a synthetic JPEG if not given).')
+    parser.add_argument('--image_height', type=int, default=480, help='Target height.')
+    parser.add_argument('--image_width', type=int, default=640, help='Target width.')
+    parser.add_argument('--repeats', type=int, default=20, help='Number of timed repetitions.')
+    args = parser.parse_args()
+    benchmark(args)
@@ -0,0 +1,104 @@
+"""
+This script benchmarks the depth storage layouts (`depth_storage`): raw uint16 parquet features (as LeRobot stores them),
+lossless FFV1 videos and chunked compressed arrays, comparing disk size, conversion time and per-frame decode latency.
+The depth images of one camera are repeated up to `--num_frames` frames.
+
+Example command:
+python src/scripts/data/benchmark_depth.py --depth_dir examples/pika_example_data/episode0/camera/depth/pikaDepthCamera_l --num_frames 300
+"""
+
+import sys
+sys.path.append('.')
+
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import datasets
+import numpy as np
+
+from src.data.misc.depth import DepthReader, create_depth_info, get_depth_path, open_depth_writer
+from src.data.misc.images import load_depth
+
+
+def load_frames(depth_dir, num_frames):
+    paths = sorted(glob.glob(os.path.join(depth_dir, '*.png')))
+    if len(paths) == 0:
+        raise FileNotFoundError(f'No depth images found in {depth_dir}.')
+    frames = [load_depth(path) for path in paths]
+    return [frames[i % len(frames)] for i in range(num_frames)]
+
+
+def benchmark_parquet(frames, root):
+    height, width = frames[0].shape
+    path = os.path.join(root, 'episode_000000.parquet')
+    features = datasets.Features({'depth': datasets.Array2D(shape=(height, width), dtype='uint16')})
+
+    start_time = time.perf_counter()
+    datasets.Dataset.from_dict({'depth': frames}, features=features).to_parquet(path)
+    write_time = time.perf_counter() - start_time
+
+    dataset = datasets.Dataset.from_parquet(path, cache_dir=os.path.join(root, 'cache')).with_format('numpy')
+    read = lambda i: dataset[i]['depth']
+    return os.path.getsize(path), write_time, read
+
+
+def benchmark_storage(storage, frames, root, frames_per_chunk):
+    height, width = frames[0].shape
+    info = create_depth_info(root, storage, ['depth'], height, width, fps=30, frames_per_chunk=frames_per_chunk)
+
+    start_time = time.perf_counter()
+    writer = open_depth_writer(info, root, 'depth', 0)
+    for frame in frames:
+        writer.write(frame)
+    writer.close()
+    write_time = time.perf_counter() - start_time
+
+    reader = DepthReader(root)
+    read = lambda i: reader.read('depth', 0, i)
+    return os.path.getsize(os.path.join(root, get_depth_path(info, 'depth', 0))), write_time, read
+
+
+def time_reads(read, indices):
+    start_time = time.perf_counter()
+    for i in indices:
+        read(int(i))
+    return (time.perf_counter() - start_time) / len(indices)
+
+
+def benchmark(args):
+    frames = load_frames(args.depth_dir, args.num_frames)
+    raw_size = sum(frame.nbytes for frame in frames)
+    rng = np.random.default_rng(0)
+    random_indices = rng.integers(0, len(frames), size=args.repeats)
+    print(f'{len(frames)} frames of {frames[0].shape} uint16, raw size {raw_size / 2**20:.1f} MB')
+
+    for storage in ['parquet', 'ffv1', 'chunked']:
+        root = tempfile.mkdtemp(prefix=f'depth_{storage}_')
+        try:
+            if storage == 'parquet':
+                size, write_time, read = benchmark_parquet(frames, root)
+            else:
+                size, write_time, read = benchmark_storage(storage, frames, root, args.frames_per_chunk)
+            assert all(np.array_equal(read(int(i)), frames[i]) for i in random_indices[:10]), f'{storage} is not lossless'
+            random_time = time_reads(read, random_indices)
+            sequential_time = time_reads(read, range(len(frames)))
+            print(f'{storage:>8}: size {size / 2**20:8.2f} MB ({raw_size / size:5.1f}x), '
+                  f'write {write_time / len(frames) * 1e3:6.2f} ms/frame, '
+                  f'random read {random_time * 1e3:6.2f} ms/frame, sequential read {sequential_time * 1e3:6.2f} ms/frame')
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark depth storage layouts.")
+    parser.add_argument('--depth_dir', type=str, default='examples/pika_example_data/episode0/camera/depth/pikaDepthCamera_l',
+                        help='Directory of 16-bit depth PNGs.')
+    parser.add_argument('--num_frames', type=int, default=300, help='Number of frames of the benchmarked episode.')
+    parser.add_argument('--frames_per_chunk', type=int, default=1, help='Frames per chunk of the chunked storage.')
+    parser.add_argument('--repeats', type=int, default=50, help='Number of timed random reads.')
+    args = parser.parse_args()
+    benchmark(args)
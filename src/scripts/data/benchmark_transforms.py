@@ -0,0 +1,80 @@
+"""
+This script benchmarks the per-frame and the batched (whole-episode) action transforms,
+and checks that both paths give the same actions. It also times the transforms of action chunks computed on the fly
+at training time (seeing `src/data/misc/relative.py`), per sample (as in a DataLoader worker) and per batch.
+
+Example command:
+python src/scripts/data/benchmark_transforms.py --num_frames 700 --num_arms 2 --repeats 10
+"""
+
+import sys
+sys.path.append('.')
+
+import argparse
+import time
+
+import numpy as np
+
+from src.data.misc.relative import transform_chunks
+from src.data.misc.transforms import get_transform
+
+
+def random_walk_states(num_frames, num_arms, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.0, 0.01, size=(num_frames, num_arms, 7))
+    states = np.cumsum(steps, axis=0)
+    states[:, :, 6] = rng.uniform(0.0, 1.7, size=(num_frames, num_arms))
+    return states.reshape(num_frames, num_arms * 7)
+
+
+def benchmark(args):
+    states = random_walk_states(args.num_frames, args.num_arms)
+    for transform_type in ['ee_absolute', 'ee_delta_base', 'ee_delta_gripper']:
+        transform = get_transform(transform_type, args.num_arms > 1)
+
+        start_time = time.perf_counter()
+        for _ in range(args.repeats):
+            per_frame_actions = np.stack([transform(states[i], states[i + 1]) for i in range(len(states) - 1)])
+        per_frame_time = (time.perf_counter() - start_time) / args.repeats
+
+        start_time = time.perf_counter()
+        for _ in range(args.repeats):
+            batch_actions = transform.batch(states)
+        batch_time = (time.perf_counter() - start_time) / args.repeats
+
+        max_diff = np.abs(per_frame_actions - batch_actions).max()
+        print(f'{transform_type:>18}: per-frame {per_frame_time * 1e3:8.2f} ms, batch {batch_time * 1e3:8.2f} ms, '
+              f'speedup {per_frame_time / batch_time:7.1f}x, max abs diff {max_diff:.3e}')
+
+    # on the fly: windows of `chunk_size` (state, next state) pairs, one sample or a batch at a time
+    starts = np.arange(args.batch_size) % (len(states) - args.chunk_size)
+    chunk_indices = starts[:, None] + np.arange(args.chunk_size)[None, :]
+    chunk_states, chunk_actions = states[chunk_indices], states[chunk_indices + 1]
+    for transform_type in ['ee_delta_base', 'ee_delta_gripper']:
+        transform = get_transform(transform_type, args.num_arms > 1)
+
+        start_time = time.perf_counter()
+        for _ in range(args.repeats):
+            for sample_states, sample_actions in zip(chunk_states, chunk_actions):
+                transform_chunks(transform, sample_states, sample_actions)
+        sample_time = (time.perf_counter() - start_time) / args.repeats / args.batch_size
+
+        start_time = time.perf_counter()
+        for _ in range(args.repeats):
+            transform_chunks(transform, chunk_states, chunk_actions)
+        batch_time = (time.perf_counter() - start_time) / args.repeats / args.batch_size
+
+        print(f'{transform_type:>18}: chunks of {args.chunk_size}, per sample {sample_time * 1e6:8.1f} us '
+              f'({1 / sample_time:9.0f} samples/s), per batch of {args.batch_size} {batch_time * 1e6:8.1f} us/sample '
+              f'({1 / batch_time:9.0f} samples/s)')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-frame vs batched action transforms.")
+    parser.add_argument('--num_frames', type=int, default=700, help='Number of frames per episode.')
+    parser.add_argument('--num_arms', type=int, default=2, help='Number of arms (1 or 2).')
+    parser.add_argument('--repeats', type=int, default=10, help='Number of timed repetitions.')
+    parser.add_argument('--chunk_size', type=int, default=100, help='Number of actions per chunk transformed on the fly.')
+    parser.add_argument('--batch_size', type=int, default=64, help='Number of chunks per batch transformed on the fly.')
+    args = parser.parse_args()
+    benchmark(args)
@@ -0,0 +1,38 @@
+"""
+This script precomputes the action chunks of a converted LeRobot dataset into memory-mapped arrays
+(seeing `src/data/misc/chunks.py`), which `src/scripts/train.py` serves with `--action_chunks true`
+instead of re-assembling them from the parquet rows for every sample.
+The chunk must match the `action_delta_indices` of the policy: `--chunk_size` for ACT,
+or `--chunk_size <horizon> --start <1 - n_obs_steps>` for diffusion.
+
+Example command:
+python src/scripts/data/build_action_chunks.py --dataset_root ~/.cache/huggingface/lerobot/lerobot/pika --chunk_size 100
+python src/scripts/data/build_action_chunks.py --dataset_root ~/.cache/huggingface/lerobot/lerobot/pika --chunk_size 16 --start -1
+"""
+
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import time
+
+from src.data.misc.chunks import write_action_chunks
+
+
+def main(args):
+    start_time = time.perf_counter()
+    chunks_dir = write_action_chunks(os.path.expanduser(args.dataset_root), args.chunk_size, args.start, args.action_key)
+    size = sum(os.path.getsize(os.path.join(chunks_dir, filename)) for filename in os.listdir(chunks_dir))
+    print(f'Wrote the action chunks to {chunks_dir} ({size / 2**20:.1f} MB) '
+          f'in {time.perf_counter() - start_time:.1f}s')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the action chunks of a LeRobot dataset.")
+    parser.add_argument('--dataset_root', type=str, required=True, help='Root of the LeRobot dataset.')
+    parser.add_argument('--chunk_size', type=int, required=True, help='Number of actions per chunk.')
+    parser.add_argument('--start', type=int, default=0, help='Offset of the first action of a chunk, relative to the frame.')
+    parser.add_argument('--action_key', type=str, default='action', help='Name of the action feature.')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,52 @@
+"""
+This script packs the per-frame JSON topics of raw Pika episodes into one columnar sidecar cache per episode,
+which is then used by PikaDataProcessor when `use_json_cache=True`.
+
+Example command:
+python src/scripts/data/build_pika_cache.py --source_data_roots /path/to/data1 /path/to/data2 --num_workers 8
+"""
+
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from src.data.misc.cache import build_episode_cache
+
+
+DEFAULT_TOPICS = [
+    'localization/pose/pika_l',
+    'localization/pose/pika_r',
+    'gripper/encoder/pika_l',
+    'gripper/encoder/pika_r',
+    'imu/9axis/pika_l',
+    'imu/9axis/pika_r',
+]
+
+
+def main(args):
+    episode_paths = []
+    for source_data_root in args.source_data_roots:
+        episode_paths.extend(os.path.join(source_data_root, episode_dir)
+                             for episode_dir in sorted(os.listdir(source_data_root)))
+
+    start_time = time.perf_counter()
+    build = partial(build_episode_cache, topics=args.topics, cache_root=args.cache_root)
+    with ProcessPoolExecutor(max_workers=args.num_workers) as executor:
+        for episode_path, cache_path in zip(episode_paths, executor.map(build, episode_paths)):
+            print(f'Indexed {episode_path} -> {cache_path}')
+    print(f'Indexed {len(episode_paths)} episodes in {time.perf_counter() - start_time:.1f}s')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build columnar sidecar caches of raw Pika JSON topics.")
+    parser.add_argument('--source_data_roots', type=str, nargs='+', required=True, help='List of source data directories.')
+    parser.add_argument('--topics', type=str, nargs='+', default=DEFAULT_TOPICS, help='JSON topics to index.')
+    parser.add_argument('--cache_root', type=str, default=None, help='Cache directory (default: inside each episode).')
+    parser.add_argument('--num_workers', type=int, default=os.cpu_count(), help='Number of worker processes.')
+    args = parser.parse_args()
+    main(args)
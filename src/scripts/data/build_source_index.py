@@ -0,0 +1,50 @@
+"""
+This script builds or updates the parquet index of raw Pika source roots (seeing `src/data/misc/index.py`),
+which is then used by PikaDataProcessor when `use_source_index=True`, and prints the number of frames and bytes of every topic.
+Only the topics of new or changed episodes are listed again, so running it after every recording session is cheap.
+
+Example command:
+python src/scripts/data/build_source_index.py --source_data_roots /path/to/data1 /path/to/data2 --num_workers 16
+"""
+
+import sys
+sys.path.append('.')
+
+import argparse
+import time
+
+from src.data.configuration_data_processor import RGBMultiArmDeltaGripperDataProcessorConfig
+from src.data.misc.index import SourceIndex
+from src.data.misc.topics import get_topic_dirs
+
+
+def main(args):
+    config = RGBMultiArmDeltaGripperDataProcessorConfig(use_depth=args.use_depth, use_imu=args.use_imu)
+    topics = args.topics or list(get_topic_dirs(config))
+    for source_data_root in args.source_data_roots:
+        start_time = time.perf_counter()
+        source_index = SourceIndex(source_data_root, args.index_root)
+        num_indexed = len(source_index.episodes)
+        source_index.update(topics, args.num_workers)
+        num_updated = len(source_index.updates)
+        source_index.save()
+        print(f'Indexed {source_data_root} -> {source_index.index_path} in {time.perf_counter() - start_time:.2f}s '
+              f'({num_indexed} episodes before, {num_updated} topics listed)')
+
+        summary = source_index.summary()
+        print(f'{summary["episodes"]} episodes:')
+        for topic, stats in summary['topics'].items():
+            print(f'  {topic}: {stats["frames"]} frames, {stats["bytes"] / 2**20:.1f} MB, missing in {stats["missing"]} episodes')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the index of raw Pika source roots.")
+    parser.add_argument('--source_data_roots', type=str, nargs='+', required=True, help='List of source data directories.')
+    parser.add_argument('--topics', type=str, nargs='+', default=None,
+                        help='Topic directories to index (default: the topics of the dual-arm conversion).')
+    parser.add_argument('--use_depth', action='store_true', help='Also index the depth topics of the default topics.')
+    parser.add_argument('--use_imu', action='store_true', help='Also index the IMU topics of the default topics.')
+    parser.add_argument('--index_root', type=str, default=None, help='Index directory (default: inside each source root).')
+    parser.add_argument('--num_workers', type=int, default=16, help='Number of threads listing the topic directories.')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,80 @@
+"""
+This script recomputes the statistics of a converted LeRobot dataset with the streaming stats engine
+(seeing `src/data/misc/stats.py`), in parallel over episodes, and prints the dataset stats with quantiles.
+With `--write`, `meta/episodes_stats.jsonl` is rewritten and the mergeable per-episode sketches are saved,
+so that later runs with `--from_sketches` combine them without re-reading any data. Sketches that do not cover
+exactly the episodes of the dataset (e.g. after episodes were appended) are ignored for `episodes_stats.jsonl`.
+Image stats are recomputed from a subsample of the encoded video frames.
+
+Example command:
+python src/scripts/data/compute_stats.py --dataset_root ~/.cache/huggingface/lerobot/lerobot/pika --num_workers 8 --write
+python src/scripts/data/compute_stats.py --dataset_root ~/.cache/huggingface/lerobot/lerobot/pika --from_sketches
+"""
+
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src.data.misc.layout import EPISODES_PATH, load_jsonlines
+from src.data.misc.stats import (
+    SKETCHES_PATH,
+    aggregate_stats,
+    compute_dataset_stats,
+    load_episodes_stats,
+    load_sketches,
+    save_sketches,
+    write_episodes_stats,
+)
+
+
+def main(args):
+    dataset_root = os.path.expanduser(args.dataset_root)
+    sketches_path = os.path.join(dataset_root, SKETCHES_PATH)
+
+    start_time = time.perf_counter()
+    if args.from_sketches:
+        episodes_stats = load_sketches(sketches_path) if os.path.exists(sketches_path) else None
+        episode_indices = {episode['episode_index'] for episode in load_jsonlines(os.path.join(dataset_root, EPISODES_PATH))}
+        if episodes_stats is None:
+            print(f'No sketches found at {sketches_path}, combining episodes_stats.jsonl (no quantiles).')
+        elif set(episodes_stats) != episode_indices:
+            print(f'The sketches at {sketches_path} cover {len(set(episodes_stats) & episode_indices)} of the '
+                  f'{len(episode_indices)} episodes, and {len(set(episodes_stats) - episode_indices)} episodes that are '
+                  f'not in the dataset, combining episodes_stats.jsonl (no quantiles). Run with `--write` to update them.')
+            episodes_stats = None
+        if episodes_stats is None:
+            episodes_stats = load_episodes_stats(dataset_root)
+    else:
+        episodes_stats = compute_dataset_stats(dataset_root, num_workers=args.num_workers, sample_size=args.sample_size)
+    stats = aggregate_stats(episodes_stats.values())
+    elapsed = time.perf_counter() - start_time
+
+    num_frames = next(iter(stats.values())).count if len(stats) > 0 else 0
+    print(f'Stats of {len(episodes_stats)} episodes ({num_frames} frames) in {elapsed:.1f}s')
+    with np.printoptions(precision=4, suppress=True, threshold=16, edgeitems=3):
+        for key, feature_stats in stats.items():
+            print(f'{key}:')
+            for name, value in feature_stats.to_dict(args.quantiles).items():
+                print(f'    {name}: {np.squeeze(value)}')
+
+    if args.write and not args.from_sketches:
+        write_episodes_stats(dataset_root, episodes_stats)
+        save_sketches(sketches_path, episodes_stats)
+        print(f'Wrote the stats of {len(episodes_stats)} episodes and their sketches to {sketches_path}')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the statistics of a LeRobot dataset.")
+    parser.add_argument('--dataset_root', type=str, required=True, help='Root of the LeRobot dataset.')
+    parser.add_argument('--num_workers', type=int, default=1, help='Number of worker processes.')
+    parser.add_argument('--sample_size', type=int, default=1024, help='Number of values sampled per feature for quantiles.')
+    parser.add_argument('--quantiles', type=float, nargs='*', default=[0.01, 0.5, 0.99], help='Quantiles to print.')
+    parser.add_argument('--from_sketches', action='store_true', help='Combine the saved per-episode stats without re-reading data.')
+    parser.add_argument('--write', action='store_true', help='Rewrite episodes_stats.jsonl and save the per-episode sketches.')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,79 @@
+"""
+This script merges LeRobot datasets converted separately (e.g. the job shards of `pika2lerobot.py --shard i/N`)
+into one dataset, in the given order. Only the metadata and the episode / frame / task indices are rewritten,
+videos are transferred as they are (seeing `src/data/misc/merge.py`). The global stats are then recomputed
+from the per-episode stats without re-reading any data. The per-episode sketches (seeing `compute_stats.py`) are merged,
+with the stats of their renumbered index columns recomputed, if every episode of the merged dataset has one,
+and removed otherwise.
+
+Example command:
+python src/scripts/data/merge_datasets.py --dst_root /shared/lerobot/pika --src_roots /shared/shards/lerobot/pika_shard-* --mode move
+"""
+
+import sys
+sys.path.append('.')
+
+import argparse
+import os
+import shutil
+import time
+
+from src.data.misc.layout import INFO_PATH, load_json
+from src.data.misc.merge import merge_datasets
+from src.data.misc.stats import (
+    SKETCHES_PATH,
+    aggregate_stats,
+    compute_index_stats,
+    load_episodes_stats,
+    load_sketches,
+    save_sketches,
+    write_stats,
+)
+
+
+def main(args):
+    src_roots = [os.path.expanduser(src_root) for src_root in args.src_roots]
+    dst_root = os.path.expanduser(args.dst_root)
+    missing = [src_root for src_root in src_roots if not os.path.isdir(src_root)]
+    if len(missing) > 0:
+        raise FileNotFoundError(f'Source datasets not found: {missing}')
+    # sketches must be read before the sources are moved
+    has_sketches = all(os.path.exists(os.path.join(src_root, SKETCHES_PATH)) for src_root in src_roots)
+    src_sketches = {src_root: load_sketches(os.path.join(src_root, SKETCHES_PATH)) for src_root in src_roots} if has_sketches else {}
+
+    start_time = time.perf_counter()
+    merged = merge_datasets(dst_root, src_roots, mode=args.mode)
+    print(f'Merged {len(merged)} episodes of {len(src_roots)} datasets into {dst_root} in {time.perf_counter() - start_time:.1f}s')
+
+    dst_path = os.path.join(dst_root, SKETCHES_PATH)
+    sketches = load_sketches(dst_path) if has_sketches and os.path.exists(dst_path) else {}
+    if has_sketches:
+        for src_root, src_index, dst_index in merged:
+            sketches[dst_index] = {**src_sketches[src_root][src_index], **compute_index_stats(dst_root, dst_index)}
+    total_episodes = load_json(os.path.join(dst_root, INFO_PATH))['total_episodes']
+    if has_sketches and set(sketches) == set(range(total_episodes)):
+        save_sketches(dst_path, sketches)
+        print(f'Merged the per-episode sketches into {dst_path}')
+    elif os.path.exists(dst_path):
+        # sketches of a part of the episodes would give the stats of that part only
+        os.remove(dst_path)
+        print(f'Removed the per-episode sketches of {dst_path}, which do not cover every merged episode.')
+
+    stats = aggregate_stats(load_episodes_stats(dst_root).values())
+    write_stats(dst_root, stats)
+    print(f'Wrote the stats of {len(stats)} features aggregated over all episodes')
+
+    if args.mode == 'move' and args.remove_sources:
+        for src_root in src_roots:
+            shutil.rmtree(src_root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge LeRobot datasets.")
+    parser.add_argument('--dst_root', type=str, required=True, help='Root of the merged dataset (appended to if it exists).')
+    parser.add_argument('--src_roots', type=str, nargs='+', required=True, help='Roots of the datasets to merge, in order.')
+    parser.add_argument('--mode', type=str, default='copy', choices=['copy', 'move', 'link'],
+                        help='How data and video files are transferred.')
+    parser.add_argument('--remove_sources', action='store_true', help='Remove the source datasets after a merge with --mode move.')
+    args = parser.parse_args()
+    main(args)
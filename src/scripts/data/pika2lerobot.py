@@ -2,7 +2,16 @@
 This script processes Pika2LeRobot data using the PikaDataProcessor.
 
 Example command:
-python src/scripts/data/pika2lerobot.py --source_data_roots /path/to/data1 /path/to/data2
+python src/scripts/data/pika2lerobot.py --source_data_roots /path/to/data1 /path/to/data2 --num_workers 8
+python src/scripts/data/pika2lerobot.py --source_data_roots /path/to/data1.tar /path/to/data2.zip --num_workers 8
+python src/scripts/data/pika2lerobot.py --source_data_roots /path/to/data1 --check_only --check_report_path report.jsonl
+python src/scripts/data/pika2lerobot.py --source_data_roots /path/to/data1 --use_source_index --num_workers 8
+python src/scripts/data/pika2lerobot.py --source_data_roots /path/to/data1 --data_root /shared/shards --shard 3/8
+python src/scripts/data/pika2lerobot.py --source_data_roots /path/to/data1 --extra_transform_types ee_absolute ee_delta_base
+python src/scripts/data/pika2lerobot.py --source_data_roots /path/to/data1 --profile --profile_path profile.csv --profile_cprofile_path run.prof
+
+With `--shard i/N`, job i of N converts its part of the episodes into `<repo_id>_shard-<i>-of-<N>`,
+and the shards are then merged with `src/scripts/data/merge_datasets.py`.
 """
 
 import sys
@@ -14,9 +23,38 @@ from src.data.configuration_data_processor import RGBMultiArmDeltaGripperDataPro
 from src.data.pika_data_processor import PikaDataProcessor
 
 
+def parse_shard(shard):
+    shard_index, num_shards = (int(x) for x in shard.split('/'))
+    return shard_index, num_shards
+
+
 def main(args):
+    shard_index, num_shards = parse_shard(args.shard)
+    repo_id = args.repo_id
+    if num_shards > 1:
+        repo_id = f'{repo_id}_shard-{shard_index:03d}-of-{num_shards:03d}'
+
     config = RGBMultiArmDeltaGripperDataProcessorConfig(
-        source_data_roots=args.config.source_data_roots,
+        source_data_roots=args.source_data_roots,
+        repo_id=repo_id,
+        data_root=args.data_root,
+        shard_index=shard_index,
+        num_shards=num_shards,
+        num_workers=args.num_workers,
+        incremental=args.incremental,
+        check_only=args.check_only,
+        check_report_path=args.check_report_path,
+        use_source_index=args.use_source_index,
+        source_index_root=args.source_index_root,
+        source_index_refresh=not args.source_index_frozen,
+        stream_video=args.stream_video,
+        encoding_workers=args.encoding_workers,
+        extra_transform_types=args.extra_transform_types,
+        action_chunk_size=args.action_chunk_size,
+        action_chunk_start=args.action_chunk_start,
+        profile=args.profile,
+        profile_path=args.profile_path,
+        profile_cprofile_path=args.profile_cprofile_path,
     )
     processor = PikaDataProcessor(config)
     processor.process_data()
@@ -31,5 +69,108 @@ if __name__ == "__main__":
         required=True,
         help='List of source data directories to process.'
     )
+    parser.add_argument(
+        '--repo_id',
+        type=str,
+        default='lerobot/pika',
+        help='Repository ID of the dataset.'
+    )
+    parser.add_argument(
+        '--data_root',
+        type=str,
+        default=None,
+        help='Root directory of the dataset (the LeRobot cache directory if not set).'
+    )
+    parser.add_argument(
+        '--shard',
+        type=str,
+        default='0/1',
+        help='Job shard i/N converted by this process, out of N jobs splitting the episodes (e.g. 3/8), not with --incremental.'
+    )
+    parser.add_argument(
+        '--num_workers',
+        type=int,
+        default=1,
+        help='Number of worker processes converting episodes in parallel.'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Append only new episodes to the existing dataset (changed episodes are reported and skipped).'
+    )
+    parser.add_argument(
+        '--check_only',
+        action='store_true',
+        help='Only validate the source episodes, without converting them.'
+    )
+    parser.add_argument(
+        '--check_report_path',
+        type=str,
+        default=None,
+        help='Path of the JSON lines report of the validation.'
+    )
+    parser.add_argument(
+        '--use_source_index',
+        action='store_true',
+        help='List the episodes and their topics from a parquet index of every source root, updated incrementally.'
+    )
+    parser.add_argument(
+        '--source_index_root',
+        type=str,
+        default=None,
+        help='Directory of the source indexes (inside each source root if not set).'
+    )
+    parser.add_argument(
+        '--source_index_frozen',
+        action='store_true',
+        help='Trust existing source indexes as they are, without checking the source roots for changes.'
+    )
+    parser.add_argument(
+        '--stream_video',
+        action='store_true',
+        help='Encode camera frames straight into the episode videos instead of temporary images.'
+    )
+    parser.add_argument(
+        '--encoding_workers',
+        type=int,
+        default=0,
+        help='Number of background processes encoding the videos of saved episodes.'
+    )
+    parser.add_argument(
+        '--extra_transform_types',
+        type=str,
+        nargs='*',
+        default=[],
+        help='Additional action transforms written in the same pass into datasets <repo_id>_<transform_type> sharing the videos.'
+    )
+    parser.add_argument(
+        '--action_chunk_size',
+        type=int,
+        default=0,
+        help='Precompute the action chunks of this size for training (0 to skip).'
+    )
+    parser.add_argument(
+        '--action_chunk_start',
+        type=int,
+        default=0,
+        help='Offset of the first action of a precomputed chunk, relative to the frame.'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Time and count the stages of the conversion per episode and per run.'
+    )
+    parser.add_argument(
+        '--profile_path',
+        type=str,
+        default=None,
+        help='Path of the exported profile, JSON or CSV (if it ends with .csv).'
+    )
+    parser.add_argument(
+        '--profile_cprofile_path',
+        type=str,
+        default=None,
+        help='Path of the cProfile stats of the run, with --profile.'
+    )
     args = parser.parse_args()
     main(args)
@@ -55,6 +55,8 @@ from lerobot.utils.utils import (
 from lerobot.utils.wandb_utils import WandBLogger
 
 from src.configs.train import TrainPipelineConfig
+from src.data.misc.chunks import ActionChunkDataset
+from src.data.misc.relative import RelativeActionDataset
 from src.policies.factory import make_policy
 
 
@@ -134,6 +136,12 @@ def train(cfg: TrainPipelineConfig):
 
     logging.info("Creating dataset")
     dataset = make_dataset(cfg)
+    if cfg.action_chunks:
+        dataset = ActionChunkDataset(dataset)
+        logging.info(f"Serving action chunks from {dataset.chunks_dir}")
+    if cfg.action_transform is not None:
+        dataset = RelativeActionDataset(dataset, cfg.action_transform)
+        logging.info(f"Transforming actions to {cfg.action_transform} on the fly")
 
     # Create environment used for evaluating checkpoints during training on simulation data.
     # On real-world data, no need to create an environment as evaluations are done outside train.py,
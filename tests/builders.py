@@ -0,0 +1,110 @@
+"""
+Builders of tiny LeRobot datasets and raw Pika episode configurations for the tests, written to `tmp_path`.
+"""
+
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data.configuration_data_processor import RGBSingleArmDeltaGripperDataProcessorConfig
+from src.data.misc.layout import EPISODES_PATH, EPISODES_STATS_PATH, INFO_PATH, TASKS_PATH
+
+
+DATA_PATH = 'data/chunk-{episode_chunk:03d}/episode_{episode_index:06d}.parquet'
+
+
+def write_lines(items, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        for item in items:
+            f.write(json.dumps(item) + '\n')
+
+
+def make_dataset(root, tasks, episodes, chunks_size=1000):
+    """
+    Write a LeRobot v2.1 dataset without videos, `episodes` holds the (number of frames, task index) of every episode.
+    """
+    root = str(root)
+    features = {
+        'observation.state': {'dtype': 'float32', 'shape': [2], 'names': None},
+        'timestamp': {'dtype': 'float32', 'shape': [1], 'names': None},
+        'frame_index': {'dtype': 'int64', 'shape': [1], 'names': None},
+        'episode_index': {'dtype': 'int64', 'shape': [1], 'names': None},
+        'index': {'dtype': 'int64', 'shape': [1], 'names': None},
+        'task_index': {'dtype': 'int64', 'shape': [1], 'names': None},
+    }
+    total_frames = 0
+    episodes_meta, episodes_stats = [], []
+    for episode_index, (num_frames, task_index) in enumerate(episodes):
+        table = pa.table({
+            'observation.state': pa.array(np.full((num_frames, 2), episode_index, dtype=np.float32).tolist(),
+                                          type=pa.list_(pa.float32())),
+            'timestamp': pa.array(np.arange(num_frames) / 30, type=pa.float32()),
+            'frame_index': pa.array(np.arange(num_frames), type=pa.int64()),
+            'episode_index': pa.array(np.full(num_frames, episode_index), type=pa.int64()),
+            'index': pa.array(np.arange(total_frames, total_frames + num_frames), type=pa.int64()),
+            'task_index': pa.array(np.full(num_frames, task_index), type=pa.int64()),
+        })
+        data_path = os.path.join(root, DATA_PATH.format(episode_chunk=episode_index // chunks_size,
+                                                        episode_index=episode_index))
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        pq.write_table(table, data_path)
+        total_frames += num_frames
+
+        episodes_meta.append({'episode_index': episode_index, 'tasks': [tasks[task_index]], 'length': num_frames})
+        stats = {'observation.state': {'min': [episode_index] * 2, 'max': [episode_index] * 2,
+                                       'mean': [episode_index] * 2, 'std': [0.0] * 2, 'count': [num_frames]}}
+        for name in ['episode_index', 'index', 'task_index']:
+            values = table.column(name).to_numpy()
+            stats[name] = {'min': [int(values.min())], 'max': [int(values.max())], 'mean': [float(values.mean())],
+                           'std': [float(values.std())], 'count': [num_frames]}
+        episodes_stats.append({'episode_index': episode_index, 'stats': stats})
+
+    info = {
+        'codebase_version': 'v2.1',
+        'robot_type': 'pika',
+        'total_episodes': len(episodes),
+        'total_frames': total_frames,
+        'total_tasks': len(tasks),
+        'total_videos': 0,
+        'total_chunks': -(-len(episodes) // chunks_size),
+        'chunks_size': chunks_size,
+        'fps': 30,
+        'splits': {'train': f'0:{len(episodes)}'},
+        'data_path': DATA_PATH,
+        'video_path': None,
+        'features': features,
+    }
+    os.makedirs(os.path.join(root, 'meta'), exist_ok=True)
+    with open(os.path.join(root, INFO_PATH), 'w') as f:
+        json.dump(info, f, indent=4)
+    write_lines([{'task_index': i, 'task': task} for i, task in enumerate(tasks)], os.path.join(root, TASKS_PATH))
+    write_lines(episodes_meta, os.path.join(root, EPISODES_PATH))
+    write_lines(episodes_stats, os.path.join(root, EPISODES_STATS_PATH))
+    return root
+
+
+def read_episode(root, episode_index):
+    return pq.read_table(os.path.join(root, DATA_PATH.format(episode_chunk=0, episode_index=episode_index))).to_pydict()
+
+
+def make_pika_config(source_data_root, data_root, **kwargs):
+    """
+    Configuration of a fast conversion of tiny synthetic episodes (seeing `src/data/misc/synthetic.py`): one camera of 32x32.
+    """
+    config = RGBSingleArmDeltaGripperDataProcessorConfig(
+        source_data_roots=[str(source_data_root)],
+        data_root=str(data_root),
+        repo_id='lerobot/pika_test',
+        image_height=32,
+        image_width=32,
+        video_backend='pyav',
+        overwrite=False,
+        **kwargs,
+    )
+    config.rgb_dirs = config.rgb_dirs[:1]
+    config.rgb_names = config.rgb_names[:1]
+    return config
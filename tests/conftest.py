@@ -0,0 +1,11 @@
+"""
+Configuration of the tests: the repository root is put on the path, so that `src` is imported from any directory.
+
+Example command:
+python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,86 @@
+"""
+Tests of the reads of raw episodes inside tar and zip archives: every read matches the same read of the directory.
+"""
+
+import os
+import tarfile
+
+import numpy as np
+import pytest
+
+from builders import make_pika_config
+from src.data.misc import archive
+from src.data.misc.cache import EpisodeCache
+from src.data.misc.synthetic import generate_synthetic_dataset
+from src.data.misc.topics import IMAGE_EXTENSIONS, JSON_EXTENSIONS, list_topic_files
+from src.data.misc.validate import scan_topic
+
+
+@pytest.fixture
+def episode(tmp_path):
+    source_data_root = str(tmp_path / 'source')
+    config = make_pika_config(source_data_root, tmp_path / 'output')
+    generate_synthetic_dataset(source_data_root, 1, config, num_frames=10, drop_rate=0.0, write_sync=True)
+    return config, os.path.join(source_data_root, 'episode0')
+
+
+@pytest.mark.parametrize('extension', ['.tar', '.zip'])
+def test_archive_reads_match_directory(tmp_path, episode, extension):
+    config, episode_path = episode
+    archive_path = archive.pack_directory(episode_path, str(tmp_path / f'pika{extension}'))
+    archived_path = os.path.join(archive_path, 'episode0')
+
+    index, member_path = archive.split_archive_path(os.path.join(archived_path, 'statistic.txt'))
+    assert index.path == archive_path and member_path == 'episode0/statistic.txt'
+    assert archive.split_archive_path(episode_path) == (None, episode_path)
+    assert archive.is_archive_path(archived_path) and not archive.is_archive_path(episode_path)
+
+    assert archive.isdir(archived_path) and archive.exists(os.path.join(archived_path, 'instructions.json'))
+    assert not archive.exists(os.path.join(archived_path, 'missing.json'))
+    assert sorted(archive.listdir(archived_path)) == sorted(os.listdir(episode_path))
+    for topic_dir, extensions in [(config.rgb_dirs[0], IMAGE_EXTENSIONS), (config.action_dirs[0], JSON_EXTENSIONS)]:
+        directory, archived_directory = os.path.join(episode_path, topic_dir), os.path.join(archived_path, topic_dir)
+        assert archive.list_file_sizes(archived_directory) == archive.list_file_sizes(directory)
+        for use_sync in [True, False]:
+            assert (list_topic_files(archived_directory, extensions, use_sync)
+                    == list_topic_files(directory, extensions, use_sync))
+        for filename in os.listdir(directory):
+            assert archive.read_bytes(os.path.join(archived_directory, filename)) == archive.read_bytes(
+                os.path.join(directory, filename))
+        files, timestamps, sync = scan_topic(archived_directory, extensions)
+        expected_files, expected_timestamps, expected_sync = scan_topic(directory, extensions)
+        assert (files, sync) == (expected_files, expected_sync)
+        np.testing.assert_array_equal(timestamps, expected_timestamps)
+
+    with archive.open_file(os.path.join(archived_path, 'statistic.txt'), 'r') as f:
+        assert f.read() == archive.read_bytes(os.path.join(episode_path, 'statistic.txt')).decode()
+    with pytest.raises(FileNotFoundError):
+        archive.read_bytes(os.path.join(archived_path, 'missing.json'))
+    with pytest.raises(FileNotFoundError):
+        archive.listdir(os.path.join(archived_path, 'missing'))
+
+
+def test_cache_of_archived_episode(tmp_path, episode):
+    config, episode_path = episode
+    archive_path = archive.pack_directory(episode_path, str(tmp_path / 'pika.tar'))
+    archived_path = os.path.join(archive_path, 'episode0')
+    topic_dir = config.action_dirs[0]
+    filenames = list_topic_files(os.path.join(episode_path, topic_dir), JSON_EXTENSIONS)
+    keys = config.action_keys_list[0]
+
+    cache = EpisodeCache(archived_path)
+    np.testing.assert_array_equal(cache.load(topic_dir, filenames, keys),
+                                  EpisodeCache(episode_path).load(topic_dir, filenames, keys))
+    cache.save()
+    # the cache of an archived episode is written next to the archive
+    assert cache.cache_path.startswith(f'{archive_path}.pika_cache{os.sep}')
+    assert os.path.exists(cache.cache_path)
+
+
+def test_compressed_tar_is_refused(tmp_path, episode):
+    _, episode_path = episode
+    archive_path = str(tmp_path / 'pika.tar.gz')
+    with tarfile.open(archive_path, 'w:gz') as tar_file:
+        tar_file.add(episode_path, arcname='episode0')
+    with pytest.raises(ValueError, match='not an uncompressed tar archive'):
+        archive.ArchiveIndex(archive_path)
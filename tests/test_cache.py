@@ -0,0 +1,71 @@
+"""
+Tests of the columnar sidecar cache of the JSON topics of an episode: the cached columns match the parsed files,
+and a topic is re-indexed when its directory changes.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from src.data.misc.cache import EpisodeCache, build_episode_cache, get_cache_path
+from src.data.misc.topics import JSON_EXTENSIONS, list_topic_files
+
+
+TOPIC = 'sensor/imu/pika_l'
+
+
+def _write_frame(topic_dir, timestamp, x):
+    with open(os.path.join(topic_dir, f'{timestamp:.6f}.json'), 'w') as f:
+        json.dump({'x': x, 'angular_velocity': {'z': 2 * x}, 'frame_id': 'imu'}, f)
+
+
+def _make_episode(root, num_frames):
+    topic_dir = os.path.join(root, 'episode0', TOPIC)
+    os.makedirs(topic_dir)
+    for i in range(num_frames):
+        _write_frame(topic_dir, 1700000000 + i / 100, float(i))
+    return os.path.join(root, 'episode0'), topic_dir
+
+
+def test_cache_matches_parsed_files(tmp_path):
+    episode_path, topic_dir = _make_episode(str(tmp_path), 5)
+    filenames = list_topic_files(topic_dir, JSON_EXTENSIONS)
+
+    cache = EpisodeCache(episode_path)
+    values = cache.load(TOPIC, filenames[::-1], ['x', 'angular_velocity.z'])
+    np.testing.assert_array_equal(values, np.array([[i, 2 * i] for i in range(5)][::-1], dtype=np.float64))
+    assert cache.dirty
+    cache.save()
+    assert os.path.exists(get_cache_path(episode_path))
+
+    # the saved cache is read back without parsing the files again
+    cache = EpisodeCache(episode_path)
+    np.testing.assert_array_equal(cache.load(TOPIC, filenames, ['x']), values[::-1, :1])
+    assert not cache.dirty
+
+
+def test_cache_reindexes_changed_topic(tmp_path):
+    episode_path, topic_dir = _make_episode(str(tmp_path), 3)
+    build_episode_cache(episode_path, [TOPIC, 'missing/topic'])
+
+    _write_frame(topic_dir, 1700000001, 10.0)
+    mtime = os.stat(topic_dir).st_mtime_ns + 10 ** 9
+    os.utime(topic_dir, ns=(mtime, mtime))
+
+    cache = EpisodeCache(episode_path)
+    filenames = list_topic_files(topic_dir, JSON_EXTENSIONS)
+    assert cache.load(TOPIC, filenames, ['x'])[:, 0].tolist() == [0.0, 1.0, 2.0, 10.0]
+    assert cache.dirty
+
+
+def test_cache_root_keeps_source_read_only(tmp_path):
+    episode_path, _ = _make_episode(str(tmp_path / 'source'), 2)
+    cache_root = str(tmp_path / 'cache')
+
+    cache_path = build_episode_cache(episode_path, [TOPIC], cache_root=cache_root)
+    assert os.path.dirname(cache_path) == cache_root
+    assert cache_path == get_cache_path(episode_path, cache_root)
+    assert not os.path.exists(get_cache_path(episode_path))
+    # episodes with the same name in different roots get different caches
+    assert get_cache_path(str(tmp_path / 'other' / 'episode0'), cache_root) != cache_path
@@ -0,0 +1,67 @@
+"""
+Tests of the precomputed action chunk store: the stored chunks match the windows LeRobot queries from the parquet rows.
+"""
+
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import torch
+from lerobot.datasets.lerobot_dataset import LeRobotDataset
+
+from builders import DATA_PATH, make_dataset
+from src.data.misc.chunks import ActionChunkDataset, compute_action_chunks, get_chunk_offsets, write_action_chunks
+
+
+ACTION_KEY = 'observation.state'
+
+
+def _write_random_actions(root, num_episodes, rng):
+    # the states of `make_dataset` are constant within an episode, which would hide misaligned windows
+    for episode_index in range(num_episodes):
+        path = os.path.join(root, DATA_PATH.format(episode_chunk=0, episode_index=episode_index))
+        table = pq.read_table(path)
+        actions = rng.normal(size=(table.num_rows, 2)).astype(np.float32)
+        column = pa.array(actions.tolist(), type=pa.list_(pa.float32()))
+        pq.write_table(table.set_column(table.column_names.index(ACTION_KEY), ACTION_KEY, column), path)
+
+
+def _load_dataset(root, offsets):
+    return LeRobotDataset('lerobot/pika_test', root=root, delta_timestamps={ACTION_KEY: [i / 30 for i in offsets]})
+
+
+def test_compute_action_chunks_matches_clamped_windows():
+    actions = np.arange(12, dtype=np.float32).reshape(6, 2)
+    offsets = get_chunk_offsets(-2, 5)
+    chunks, is_pad = compute_action_chunks(actions, offsets)
+    assert chunks.shape == (6, 5, 2)
+    for i in range(6):
+        for j, offset in enumerate(offsets):
+            np.testing.assert_array_equal(chunks[i, j], actions[min(max(i + offset, 0), 5)])
+            assert is_pad[i, j] == (not 0 <= i + offset < 6)
+
+
+def test_action_chunk_dataset_matches_lerobot_queries(tmp_path):
+    root = make_dataset(tmp_path / 'dataset', ['pick'], [(5, 0), (3, 0), (7, 0)])
+    _write_random_actions(root, 3, np.random.default_rng(0))
+    offsets = get_chunk_offsets(-1, 4)
+    write_action_chunks(root, chunk_size=4, start=-1, action_key=ACTION_KEY)
+
+    expected_dataset = _load_dataset(root, offsets)
+    dataset = ActionChunkDataset(_load_dataset(root, offsets))
+    assert len(dataset) == len(expected_dataset) == 15
+    for idx in range(len(dataset)):
+        item, expected = dataset[idx], expected_dataset[idx]
+        torch.testing.assert_close(item[ACTION_KEY], expected[ACTION_KEY])
+        torch.testing.assert_close(item[f'{ACTION_KEY}_is_pad'], expected[f'{ACTION_KEY}_is_pad'])
+
+
+def test_action_chunk_dataset_refuses_other_offsets(tmp_path):
+    root = make_dataset(tmp_path / 'dataset', ['pick'], [(5, 0)])
+    write_action_chunks(root, chunk_size=4, action_key=ACTION_KEY)
+    with pytest.raises(ValueError, match='rebuild them'):
+        ActionChunkDataset(_load_dataset(root, get_chunk_offsets(0, 8)))
+    with pytest.raises(FileNotFoundError, match='No action chunks found'):
+        ActionChunkDataset(_load_dataset(root, get_chunk_offsets(0, 4)), chunks_dir=str(tmp_path / 'missing'))
@@ -0,0 +1,72 @@
+"""
+Tests of the depth storages outside of the parquet files: lossless round trip, random access and transfer by `merge_datasets`.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from builders import make_dataset
+from src.data.misc.depth import DepthReader, create_depth_info, open_depth_writer
+from src.data.misc.layout import get_depth_path, load_depth_info
+from src.data.misc.merge import merge_datasets
+
+
+def _random_depths(rng, num_frames, height=24, width=32):
+    return rng.integers(0, 65536, size=(num_frames, height, width), dtype=np.uint16)
+
+
+def _write_depths(root, storage, depths_list, frames_per_chunk=1):
+    info = create_depth_info(root, storage, ['depth'], *depths_list[0].shape[1:], fps=30, frames_per_chunk=frames_per_chunk)
+    for episode_index, depths in enumerate(depths_list):
+        writer = open_depth_writer(info, root, 'depth', episode_index)
+        for depth in depths:
+            writer.write(depth)
+        writer.close()
+    return info
+
+
+@pytest.mark.parametrize('storage, frames_per_chunk', [('chunked', 1), ('chunked', 4), ('ffv1', 1)])
+def test_depth_round_trip(tmp_path, storage, frames_per_chunk):
+    rng = np.random.default_rng(0)
+    root = str(tmp_path / 'dataset')
+    depths = [_random_depths(rng, 10), _random_depths(rng, 3)]
+    _write_depths(root, storage, depths, frames_per_chunk=frames_per_chunk)
+
+    with DepthReader(root) as reader:
+        for episode_index, expected in enumerate(depths):
+            np.testing.assert_array_equal(reader.read_episode('depth', episode_index), expected)
+        # random access, across chunks and back
+        for frame_index in [7, 0, 9, 4, 5]:
+            depth = reader.read('depth', 0, frame_index)
+            assert depth.dtype == np.uint16
+            np.testing.assert_array_equal(depth, depths[0][frame_index])
+        np.testing.assert_array_equal(reader.read('depth', 1, 2), depths[1][2])
+
+
+def test_create_depth_info_refuses_other_storage(tmp_path):
+    root = str(tmp_path / 'dataset')
+    info = create_depth_info(root, 'chunked', ['depth'], 24, 32, fps=30)
+    assert create_depth_info(root, 'chunked', ['depth'], 24, 32, fps=30) == info
+    with pytest.raises(ValueError, match='does not match'):
+        create_depth_info(root, 'ffv1', ['depth'], 24, 32, fps=30)
+    with pytest.raises(ValueError, match='Unknown depth storage'):
+        create_depth_info(str(tmp_path / 'other'), 'png', ['depth'], 24, 32, fps=30)
+
+
+def test_merge_datasets_transfers_depth(tmp_path):
+    rng = np.random.default_rng(0)
+    src_a = make_dataset(tmp_path / 'a', ['pick'], [(3, 0), (2, 0)])
+    src_b = make_dataset(tmp_path / 'b', ['pick'], [(4, 0)])
+    depths = [_random_depths(rng, 3), _random_depths(rng, 2), _random_depths(rng, 4)]
+    _write_depths(src_a, 'chunked', depths[:2], frames_per_chunk=2)
+    _write_depths(src_b, 'chunked', depths[2:], frames_per_chunk=2)
+
+    dst = str(tmp_path / 'merged')
+    merge_datasets(dst, [src_a, src_b])
+    assert load_depth_info(dst) == load_depth_info(src_a)
+    assert os.path.exists(os.path.join(dst, get_depth_path(load_depth_info(dst), 'depth', 2)))
+    with DepthReader(dst) as reader:
+        for episode_index, expected in enumerate(depths):
+            np.testing.assert_array_equal(reader.read_episode('depth', episode_index), expected)
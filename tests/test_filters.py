@@ -0,0 +1,53 @@
+"""
+Tests of the no-op frame filters: the vectorized keyframe selection against the greedy per-frame loop.
+"""
+
+import numpy as np
+
+from src.data.misc.filters import moved_mask, select_keyframes
+
+
+THRESHOLDS = (0.01, 0.05, 0.05)
+
+
+def _greedy_keyframes(states, position_threshold, rotation_threshold, gripper_threshold):
+    keyframes = [0]
+    for i in range(1, len(states)):
+        if moved_mask(states[i:i + 1], states[keyframes[-1]], position_threshold, rotation_threshold, gripper_threshold)[0]:
+            keyframes.append(i)
+    return np.array(keyframes)
+
+
+def _random_walk(rng, num_frames, num_arms):
+    # moving segments of random speeds (some below the thresholds, drifting slowly) between idle segments
+    steps = []
+    while sum(len(step) for step in steps) < num_frames:
+        length = int(rng.integers(1, 40))
+        if rng.random() < 0.4:
+            steps.append(np.zeros((length, 7 * num_arms)))
+        else:
+            steps.append(rng.normal(scale=rng.choice([0.002, 0.01, 0.05]), size=(length, 7 * num_arms)))
+    return np.cumsum(np.concatenate(steps)[:num_frames], axis=0)
+
+
+def test_select_keyframes_matches_greedy_loop():
+    rng = np.random.default_rng(0)
+    for num_arms in [1, 2]:
+        for num_frames in [1, 2, 17, 300, 1000]:
+            states = _random_walk(rng, num_frames, num_arms)
+            keyframes = select_keyframes(states, *THRESHOLDS, mode='keyframe')
+            np.testing.assert_array_equal(keyframes, _greedy_keyframes(states, *THRESHOLDS))
+
+
+def test_select_keyframes_pairwise():
+    rng = np.random.default_rng(1)
+    states = _random_walk(rng, 500, 2)
+    keyframes = select_keyframes(states, *THRESHOLDS, mode='pairwise')
+    expected = [0] + [i for i in range(1, len(states)) if moved_mask(states[i:i + 1], states[i - 1], *THRESHOLDS)[0]]
+    np.testing.assert_array_equal(keyframes, expected)
+
+
+def test_select_keyframes_idle_episode():
+    states = np.zeros((50, 14))
+    np.testing.assert_array_equal(select_keyframes(states, *THRESHOLDS, mode='keyframe'), [0])
+    np.testing.assert_array_equal(select_keyframes(states, *THRESHOLDS, mode='none'), np.arange(50))
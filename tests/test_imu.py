@@ -0,0 +1,77 @@
+"""
+Tests of the IMU ingestion: the vectorized resampling onto the frames agrees with a per-frame window loop.
+"""
+
+import numpy as np
+import pytest
+
+from src.data.misc.imu import get_imu_names, merge_imu_topics, resample_imu, write_imu_table
+
+
+def _imu_stream(rng, num_samples=60, rate=150.0):
+    timestamps = np.sort(rng.uniform(0.0, num_samples / rate, size=num_samples))
+    return timestamps, rng.normal(size=(num_samples, 3))
+
+
+def _windows(timestamps, frame_timestamps):
+    previous = -np.inf
+    for frame_timestamp in frame_timestamps:
+        yield np.flatnonzero((timestamps > previous) & (timestamps <= frame_timestamp))
+        previous = frame_timestamp
+
+
+def test_resample_imu_matches_per_frame_windows():
+    rng = np.random.default_rng(0)
+    timestamps, values = _imu_stream(rng)
+    # frames before the first sample, with empty windows, and after the last sample
+    frame_timestamps = np.concatenate([[-0.01], np.sort(rng.uniform(0.0, 0.4, size=20)), [0.5]])
+
+    expected_last, expected_mean, expected_stack = [], [], []
+    for frame_timestamp, window in zip(frame_timestamps, _windows(timestamps, frame_timestamps)):
+        last = max(np.flatnonzero(timestamps <= frame_timestamp), default=0)
+        expected_last.append(values[last])
+        expected_mean.append(values[window].mean(axis=0) if len(window) > 0 else values[last])
+        expected_stack.append(values[np.clip(np.arange(last - 2, last + 1), 0, None)].reshape(-1))
+
+    np.testing.assert_array_equal(resample_imu(timestamps, values, frame_timestamps, 'last'), expected_last)
+    np.testing.assert_allclose(resample_imu(timestamps, values, frame_timestamps, 'mean'), expected_mean)
+    np.testing.assert_array_equal(resample_imu(timestamps, values, frame_timestamps, 'stack', 3), expected_stack)
+    with pytest.raises(ValueError, match='Unknown IMU resample method'):
+        resample_imu(timestamps, values, frame_timestamps, 'median')
+
+
+def test_merge_imu_topics_matches_nearest_samples():
+    rng = np.random.default_rng(1)
+    left = _imu_stream(rng)
+    right_timestamps = left[0] + rng.uniform(-1e-4, 1e-4, size=len(left[0]))
+    order = np.argsort(right_timestamps)
+    right = (right_timestamps[order], rng.normal(size=(len(order), 2)))
+
+    timestamps, values = merge_imu_topics([left, right])
+    np.testing.assert_array_equal(timestamps, left[0])
+    assert values.shape == (len(timestamps), 5)
+    np.testing.assert_array_equal(values[:, :3], left[1])
+    expected = [right[1][np.argmin(np.abs(right[0] - timestamp))] for timestamp in timestamps]
+    np.testing.assert_array_equal(values[:, 3:], expected)
+
+
+def test_get_imu_names():
+    assert get_imu_names(['imu/9axis/pika_l', 'imu/9axis/pika_r'], ['a', 'b']) == [
+        'pika_l.a', 'pika_l.b', 'pika_r.a', 'pika_r.b']
+    assert get_imu_names(['imu/9axis/pika_l'], ['a', 'b'], method='stack', num_samples=2) == [
+        'pika_l.a[t-1]', 'pika_l.b[t-1]', 'pika_l.a[t-0]', 'pika_l.b[t-0]']
+
+
+def test_write_imu_table_tags_frame_windows(tmp_path):
+    rng = np.random.default_rng(2)
+    timestamps, values = _imu_stream(rng)
+    frame_timestamps = np.linspace(0.05, 0.35, 10)
+    path = str(tmp_path / 'imu' / 'episode_000000.npz')
+    write_imu_table(path, timestamps, values, ['x', 'y', 'z'], frame_timestamps)
+
+    with np.load(path) as table:
+        windows = list(_windows(timestamps, frame_timestamps))[1:]
+        kept = np.concatenate(windows)
+        np.testing.assert_allclose(table['timestamp'], timestamps[kept] - frame_timestamps[0])
+        np.testing.assert_array_equal(table['frame_index'], np.repeat(np.arange(9), [len(w) for w in windows]))
+        np.testing.assert_array_equal(np.stack([table['x'], table['y'], table['z']], axis=1), values[kept])
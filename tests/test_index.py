@@ -0,0 +1,106 @@
+"""
+Tests of the index of the raw episodes of a source root: the indexed listings match the listings of the episodes,
+and only new or changed topics are listed again.
+"""
+
+import os
+import shutil
+
+import numpy as np
+
+from builders import make_pika_config
+from src.data.misc import archive
+from src.data.misc.index import SourceIndex, find_episode_paths, get_index_path
+from src.data.misc.synthetic import generate_synthetic_dataset
+from src.data.misc.topics import IMAGE_EXTENSIONS, JSON_EXTENSIONS, get_topic_dirs, list_topic_files
+from src.data.misc.validate import scan_topic
+
+
+def _generate(tmp_path, num_episodes):
+    source_data_root = str(tmp_path / 'source')
+    config = make_pika_config(source_data_root, tmp_path / 'output')
+    generate_synthetic_dataset(source_data_root, num_episodes, config, num_frames=10, drop_rate=0.0, write_sync=True)
+    return config, source_data_root
+
+
+def _touch_dir(path):
+    mtime = os.stat(path).st_mtime_ns + 10 ** 9
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_find_episode_paths(tmp_path):
+    root = tmp_path / 'source'
+    for name in ['episode10', 'episode2', 'episode0', 'episode_tmp', 'notes']:
+        os.makedirs(root / name)
+    os.makedirs(root / 'packed' / 'episode1')
+    (root / 'packed' / 'episode1' / 'statistic.txt').write_text('1.0\n')
+    archive.pack_directory(str(root / 'packed' / 'episode1'), str(root / 'episode1.tar'))
+
+    assert find_episode_paths(str(root)) == [
+        str(root / 'episode0'), os.path.join(str(root / 'episode1.tar'), 'episode1'),
+        str(root / 'episode2'), str(root / 'episode10')]
+
+
+def test_index_matches_episode_listings(tmp_path):
+    config, source_data_root = _generate(tmp_path, 2)
+    topic_dirs = get_topic_dirs(config)
+    index = SourceIndex(source_data_root)
+    episode_paths = index.update(list(topic_dirs) + ['missing/topic'], num_workers=2)
+    index.save()
+    assert os.path.exists(get_index_path(source_data_root))
+
+    index = SourceIndex(source_data_root)
+    assert index.episode_paths() == episode_paths == find_episode_paths(source_data_root)
+    for episode_path in episode_paths:
+        for topic_dir, extensions in topic_dirs.items():
+            for use_sync in [True, False]:
+                assert (index.list_topic_files(episode_path, topic_dir, extensions, use_sync)
+                        == list_topic_files(os.path.join(episode_path, topic_dir), extensions, use_sync))
+            filenames, timestamps, sync = index.scan_topic(episode_path, topic_dir, extensions)
+            expected_filenames, expected_timestamps, expected_sync = scan_topic(os.path.join(episode_path, topic_dir), extensions)
+            assert (filenames, sync) == (expected_filenames, expected_sync)
+            np.testing.assert_array_equal(timestamps, expected_timestamps)
+
+    summary = index.summary()
+    assert summary['episodes'] == 2
+    assert summary['topics']['missing/topic'] == {'missing': 2, 'frames': 0, 'bytes': 0}
+    rgb_dir = config.rgb_dirs[0]
+    assert summary['topics'][rgb_dir]['frames'] == sum(
+        len(list_topic_files(os.path.join(episode_path, rgb_dir), IMAGE_EXTENSIONS, use_sync=False))
+        for episode_path in episode_paths)
+
+
+def test_index_update_relists_changed_topics(tmp_path):
+    config, source_data_root = _generate(tmp_path, 3)
+    topic_dirs = list(get_topic_dirs(config))
+    index = SourceIndex(source_data_root)
+    episode_paths = index.update(topic_dirs)
+    index.save()
+    action_dir = config.action_dirs[0]
+    fingerprints = [index.fingerprint(episode_path, topic_dirs) for episode_path in episode_paths]
+
+    # nothing changed
+    index = SourceIndex(source_data_root)
+    index.update(topic_dirs)
+    assert not index.dirty
+
+    # a frame is added to a topic of episode 1, episode 2 is removed and episode 3 is recorded
+    topic_dir = os.path.join(episode_paths[1], action_dir)
+    shutil.copy(os.path.join(topic_dir, os.listdir(topic_dir)[0]), os.path.join(topic_dir, '1800000000.000000.json'))
+    _touch_dir(topic_dir)
+    shutil.rmtree(episode_paths[2])
+    shutil.copytree(episode_paths[0], os.path.join(source_data_root, 'episode3'))
+
+    index = SourceIndex(source_data_root)
+    new_episode_paths = index.update(topic_dirs)
+    assert new_episode_paths == episode_paths[:2] + [os.path.join(source_data_root, 'episode3')]
+    assert set(index.updates) == {('episode1', action_dir)} | {('episode3', topic) for topic in topic_dirs}
+    index.save()
+
+    index = SourceIndex(source_data_root)
+    assert index.episode_paths() == new_episode_paths
+    assert index.fingerprint(episode_paths[0], topic_dirs) == fingerprints[0]
+    assert index.fingerprint(episode_paths[1], topic_dirs) != fingerprints[1]
+    assert index.fingerprint(episode_paths[1], topic_dirs)[0] == fingerprints[1][0] + 1
+    assert index.fingerprint(episode_paths[1], ['unindexed/topic']) is None
+    assert '1800000000.000000.json' in index.list_topic_files(episode_paths[1], action_dir, JSON_EXTENSIONS, use_sync=False)
@@ -0,0 +1,165 @@
+"""
+Tests of incremental, resumable conversion: the conversion manifest, the clean up of partially converted episodes
+and the reconciliation of the episode metadata with `info.json`.
+"""
+
+import json
+import os
+
+import pytest
+
+from builders import DATA_PATH, make_dataset, make_pika_config, write_lines
+from src.data.misc.manifest import MANIFEST_PATH, ConversionManifest, remove_partial_episodes
+from src.data.misc.layout import EPISODES_PATH, EPISODES_STATS_PATH, INFO_PATH, load_json, load_jsonlines
+from src.data.misc.merge import reconcile_episodes_meta
+from src.data.misc.synthetic import generate_synthetic_dataset
+from src.data.pika_data_processor import PikaDataProcessor
+
+
+def _make_source_episode(root, name, num_frames):
+    topic_dir = os.path.join(root, name, 'localization', 'pose', 'pika_l')
+    os.makedirs(topic_dir, exist_ok=True)
+    for i in range(num_frames):
+        with open(os.path.join(topic_dir, f'{1700000000 + i / 30:.6f}.json'), 'w') as f:
+            json.dump({'x': i}, f)
+    return os.path.join(root, name)
+
+
+def test_manifest_recover_and_filter(tmp_path):
+    dataset_root = str(tmp_path / 'dataset')
+    episode_paths = [_make_source_episode(str(tmp_path / 'source'), f'episode{i}', 3) for i in range(4)]
+
+    manifest = ConversionManifest(dataset_root)
+    assert manifest.filter(episode_paths[:3]) == episode_paths[:3]
+    manifest.start(episode_paths[0], 0)
+    manifest.finish(episode_paths[0], 0)
+    # the conversion crashes after committing episode 1, and before committing episode 2
+    manifest.start(episode_paths[1], 1)
+    manifest.start(episode_paths[2], 2)
+
+    manifest = ConversionManifest(dataset_root)
+    assert set(manifest.pending) == {episode_paths[1], episode_paths[2]}
+    manifest.recover(total_episodes=2)
+    assert manifest.pending == {}
+    assert manifest.episodes[episode_paths[1]]['status'] == 'done'
+    assert episode_paths[2] not in manifest.episodes
+    assert manifest.missing_episodes(2) == []
+    assert manifest.missing_episodes(3) == [2]
+
+    # the recovered records are on disk, and a changed episode is reported and skipped
+    with open(os.path.join(episode_paths[1], 'localization', 'pose', 'pika_l', '1800000000.000000.json'), 'w') as f:
+        json.dump({'x': -1}, f)
+    manifest = ConversionManifest(dataset_root)
+    assert manifest.filter(episode_paths) == episode_paths[2:]
+    assert manifest.changed == [episode_paths[1]]
+
+
+def test_manifest_finish_without_episode(tmp_path):
+    dataset_root = str(tmp_path / 'dataset')
+    episode_path = _make_source_episode(str(tmp_path / 'source'), 'episode0', 2)
+
+    manifest = ConversionManifest(dataset_root)
+    manifest.start(episode_path, 0)
+    manifest.finish(episode_path, None)
+    # an episode that produced no episode (e.g. filtered out) is not converted again
+    assert ConversionManifest(dataset_root).filter([episode_path]) == []
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+
+def test_remove_partial_episodes(tmp_path):
+    root = str(tmp_path)
+    kept, removed = [], []
+    for episode_index in range(3):
+        paths = [
+            os.path.join(root, DATA_PATH.format(episode_chunk=0, episode_index=episode_index)),
+            os.path.join(root, f'videos/chunk-000/observation.images.cam/episode_{episode_index:06d}.mp4'),
+            os.path.join(root, f'imu/chunk-000/episode_{episode_index:06d}.parquet'),
+        ]
+        for path in paths:
+            _touch(path)
+        (kept if episode_index < 2 else removed).extend(paths)
+    _touch(os.path.join(root, 'images/observation.images.cam/episode_000001/frame_000000.png'))
+    _touch(os.path.join(root, 'images/observation.images.cam/episode_000002/frame_000000.png'))
+
+    assert sorted(remove_partial_episodes(root, total_episodes=2)) == sorted(removed)
+    assert all(os.path.exists(path) for path in kept)
+    assert not any(os.path.exists(path) for path in removed)
+    assert os.listdir(os.path.join(root, 'images/observation.images.cam')) == ['episode_000001']
+
+
+def test_reconcile_episodes_meta_missing_lines(tmp_path):
+    # LeRobot commits the info of episode 2 before appending its stats line
+    root = make_dataset(tmp_path / 'dataset', ['pick'], [(3, 0), (2, 0), (4, 0)])
+    stats_path = os.path.join(root, EPISODES_STATS_PATH)
+    write_lines(load_jsonlines(stats_path)[:2], stats_path)
+
+    assert reconcile_episodes_meta(root) == 2
+    assert [item['episode_index'] for item in load_jsonlines(os.path.join(root, EPISODES_PATH))] == [0, 1]
+    info = load_json(os.path.join(root, INFO_PATH))
+    assert (info['total_episodes'], info['total_frames'], info['total_chunks']) == (2, 5, 1)
+    assert info['splits'] == {'train': '0:2'}
+
+
+def test_reconcile_episodes_meta_orphaned_lines(tmp_path):
+    # `merge_datasets` appends the lines of episode 1 (twice, after a retry) before committing the info
+    root = make_dataset(tmp_path / 'dataset', ['pick'], [(3, 0), (2, 0)])
+    info_path = os.path.join(root, INFO_PATH)
+    info = load_json(info_path)
+    info.update({'total_episodes': 1, 'total_frames': 3, 'splits': {'train': '0:1'}})
+    with open(info_path, 'w') as f:
+        json.dump(info, f, indent=4)
+    episodes_path = os.path.join(root, EPISODES_PATH)
+    write_lines(load_jsonlines(episodes_path) + load_jsonlines(episodes_path)[1:], episodes_path)
+
+    assert reconcile_episodes_meta(root) == 1
+    assert [item['episode_index'] for item in load_jsonlines(episodes_path)] == [0]
+    assert [item['episode_index'] for item in load_jsonlines(os.path.join(root, EPISODES_STATS_PATH))] == [0]
+    assert load_json(info_path) == info
+
+
+def test_reconcile_episodes_meta_consistent(tmp_path):
+    root = make_dataset(tmp_path / 'dataset', ['pick'], [(3, 0), (2, 0)])
+    info = load_json(os.path.join(root, INFO_PATH))
+    assert reconcile_episodes_meta(root) == 2
+    assert load_json(os.path.join(root, INFO_PATH)) == info
+
+
+def _convert(source_data_root, data_root, **kwargs):
+    processor = PikaDataProcessor(make_pika_config(source_data_root, data_root, **kwargs))
+    processor.process_data()
+    return processor.dataset.root
+
+
+def test_incremental_run_on_plain_conversion(tmp_path):
+    source_data_root = str(tmp_path / 'source')
+    config = make_pika_config(source_data_root, tmp_path / 'output')
+    generate_synthetic_dataset(source_data_root, 2, config, num_frames=10, drop_rate=0.0)
+
+    # a conversion without `incremental` records its episodes, so that an incremental run only appends new ones
+    dataset_root = _convert(source_data_root, tmp_path / 'output')
+    profile_path = str(tmp_path / 'profile.json')
+    _convert(source_data_root, tmp_path / 'output', incremental=True, profile=True, profile_path=profile_path)
+    assert load_json(os.path.join(dataset_root, INFO_PATH))['total_episodes'] == 2
+    # runs without new episodes are profiled as well
+    assert os.path.exists(profile_path)
+
+    generate_synthetic_dataset(source_data_root, 3, config, num_frames=10, drop_rate=0.0)
+    _convert(source_data_root, tmp_path / 'output', incremental=True)
+    assert load_json(os.path.join(dataset_root, INFO_PATH))['total_episodes'] == 3
+
+
+def test_incremental_run_refuses_unrecorded_episodes(tmp_path):
+    source_data_root = str(tmp_path / 'source')
+    config = make_pika_config(source_data_root, tmp_path / 'output')
+    generate_synthetic_dataset(source_data_root, 2, config, num_frames=10, drop_rate=0.0)
+    dataset_root = _convert(source_data_root, tmp_path / 'output')
+
+    # e.g. a dataset written by `merge_datasets`, whose episodes are not in the manifest
+    os.remove(os.path.join(dataset_root, MANIFEST_PATH))
+    with pytest.raises(ValueError, match='not recorded'):
+        _convert(source_data_root, tmp_path / 'output', incremental=True)
+    assert load_json(os.path.join(dataset_root, INFO_PATH))['total_episodes'] == 2
@@ -0,0 +1,122 @@
+"""
+Tests of the merge of LeRobot datasets: renumbered indices and tasks, rewritten metadata and merged stats sketches.
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from builders import make_dataset, read_episode
+from src.data.misc.layout import EPISODES_PATH, EPISODES_STATS_PATH, INFO_PATH, TASKS_PATH, load_json, load_jsonlines
+from src.data.misc.merge import merge_datasets
+from src.data.misc.stats import SKETCHES_PATH, compute_dataset_stats, load_sketches, save_sketches
+from src.scripts.data.merge_datasets import main as merge_main
+
+
+def test_merge_datasets_rewrites_indices_tasks_and_stats(tmp_path):
+    src_a = make_dataset(tmp_path / 'a', ['pick'], [(3, 0), (2, 0)])
+    src_b = make_dataset(tmp_path / 'b', ['place', 'pick'], [(4, 0), (1, 1)])
+    dst = str(tmp_path / 'merged')
+
+    merged = merge_datasets(dst, [src_a, src_b])
+    assert merged == [(src_a, 0, 0), (src_a, 1, 1), (src_b, 0, 2), (src_b, 1, 3)]
+
+    tasks = load_jsonlines(os.path.join(dst, TASKS_PATH))
+    assert tasks == [{'task_index': 0, 'task': 'pick'}, {'task_index': 1, 'task': 'place'}]
+
+    expected_tasks = [0, 0, 1, 0]
+    expected_lengths = [3, 2, 4, 1]
+    index = 0
+    for episode_index, (task_index, length) in enumerate(zip(expected_tasks, expected_lengths)):
+        data = read_episode(dst, episode_index)
+        assert data['episode_index'] == [episode_index] * length
+        assert data['index'] == list(range(index, index + length))
+        assert data['task_index'] == [task_index] * length
+        assert data['frame_index'] == list(range(length))
+        index += length
+
+    episodes = load_jsonlines(os.path.join(dst, EPISODES_PATH))
+    assert [episode['episode_index'] for episode in episodes] == [0, 1, 2, 3]
+    assert [episode['length'] for episode in episodes] == expected_lengths
+    assert [episode['tasks'] for episode in episodes] == [['pick'], ['pick'], ['place'], ['pick']]
+
+    episodes_stats = load_jsonlines(os.path.join(dst, EPISODES_STATS_PATH))
+    assert [item['episode_index'] for item in episodes_stats] == [0, 1, 2, 3]
+    stats = episodes_stats[2]['stats']
+    assert stats['episode_index']['min'] == [2] and stats['episode_index']['max'] == [2]
+    assert stats['index']['min'] == [5] and stats['index']['max'] == [8]
+    assert stats['task_index']['min'] == [1] and stats['task_index']['max'] == [1]
+    # the other features are copied as they are
+    assert stats['observation.state']['min'] == [0, 0]
+
+    info = load_json(os.path.join(dst, INFO_PATH))
+    assert info['total_episodes'] == 4
+    assert info['total_frames'] == 10
+    assert info['total_tasks'] == 2
+    assert info['total_chunks'] == 1
+    assert info['splits'] == {'train': '0:4'}
+
+
+def test_merge_datasets_appends_to_existing_dataset(tmp_path):
+    dst = make_dataset(tmp_path / 'dst', ['place'], [(2, 0)])
+    src = make_dataset(tmp_path / 'src', ['pick', 'place'], [(3, 1), (1, 0)])
+
+    merge_datasets(dst, [src])
+    assert load_jsonlines(os.path.join(dst, TASKS_PATH)) == [
+        {'task_index': 0, 'task': 'place'}, {'task_index': 1, 'task': 'pick'}]
+    assert read_episode(dst, 1)['index'] == [2, 3, 4]
+    assert read_episode(dst, 1)['task_index'] == [0, 0, 0]
+    assert read_episode(dst, 2)['task_index'] == [1]
+    info = load_json(os.path.join(dst, INFO_PATH))
+    assert (info['total_episodes'], info['total_frames'], info['total_tasks']) == (3, 6, 2)
+
+
+def _save_sketches(root):
+    save_sketches(os.path.join(root, SKETCHES_PATH), compute_dataset_stats(root))
+
+
+def _merge(dst_root, src_roots):
+    merge_main(argparse.Namespace(dst_root=dst_root, src_roots=src_roots, mode='copy', remove_sources=False))
+
+
+def test_merge_script_rewrites_index_sketches(tmp_path):
+    src_a = make_dataset(tmp_path / 'a', ['pick'], [(3, 0), (2, 0)])
+    src_b = make_dataset(tmp_path / 'b', ['place', 'pick'], [(4, 0), (1, 1)])
+    for root in [src_a, src_b]:
+        _save_sketches(root)
+    dst = str(tmp_path / 'merged')
+    _merge(dst, [src_a, src_b])
+
+    sketches = load_sketches(os.path.join(dst, SKETCHES_PATH))
+    assert sorted(sketches) == [0, 1, 2, 3]
+    # the index stats match the rewritten columns, the other stats are the ones of the source episodes
+    expected = compute_dataset_stats(dst)
+    for episode_index in range(4):
+        for key in ['episode_index', 'index', 'task_index', 'observation.state']:
+            np.testing.assert_allclose(sketches[episode_index][key].mean, expected[episode_index][key].mean)
+            np.testing.assert_allclose(sketches[episode_index][key].min, expected[episode_index][key].min)
+            np.testing.assert_allclose(sketches[episode_index][key].max, expected[episode_index][key].max)
+    assert sketches[2]['index'].min.item() == 5 and sketches[2]['task_index'].max.item() == 1
+
+
+def test_merge_script_drops_partial_sketches(tmp_path):
+    # the destination episodes have no sketches, the merged sketches would only cover the new episodes
+    dst = make_dataset(tmp_path / 'dst', ['pick'], [(2, 0)])
+    src = make_dataset(tmp_path / 'src', ['pick'], [(3, 0)])
+    _save_sketches(src)
+    _merge(dst, [src])
+    assert not os.path.exists(os.path.join(dst, SKETCHES_PATH))
+
+    # the sources have no sketches, the sketches of the destination would not cover the new episodes
+    _save_sketches(dst)
+    src = make_dataset(tmp_path / 'src2', ['pick'], [(3, 0)])
+    _merge(dst, [src])
+    assert not os.path.exists(os.path.join(dst, SKETCHES_PATH))
+
+    # every episode has a sketch
+    _save_sketches(dst)
+    src = make_dataset(tmp_path / 'src3', ['pick'], [(3, 0)])
+    _save_sketches(src)
+    _merge(dst, [src])
+    assert sorted(load_sketches(os.path.join(dst, SKETCHES_PATH))) == [0, 1, 2, 3]
@@ -0,0 +1,98 @@
+"""
+Tests of the relative actions computed at training time: a dataset converted with absolute actions serves the same
+actions (and action stats) as a dataset converted with the relative transform.
+"""
+
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import torch
+from lerobot.datasets.lerobot_dataset import LeRobotDataset
+
+from builders import DATA_PATH, make_dataset
+from src.data.misc.layout import INFO_PATH, load_json, write_json
+from src.data.misc.relative import RelativeActionDataset, transform_chunks
+from src.data.misc.stats import compute_dataset_stats, write_episodes_stats
+from src.data.misc.transforms import get_transform
+
+
+def _random_states(rng, num_frames, num_arms=1):
+    arms = [np.concatenate([rng.uniform(-1.0, 1.0, size=(num_frames, 3)), rng.uniform(-1.0, 1.0, size=(num_frames, 3)),
+                            rng.uniform(0.0, 1.0, size=(num_frames, 1))], axis=1) for _ in range(num_arms)]
+    return np.concatenate(arms, axis=1).astype(np.float32)
+
+
+def _make_converted_dataset(root, episodes_states, transform_type):
+    """
+    Write a dataset whose action of frame t is the transform of the states of frames t and t + 1 (the next state of
+    the last frame is itself), as the converter does.
+    """
+    root = make_dataset(root, ['pick'], [(len(states), 0) for states in episodes_states])
+    dim = episodes_states[0].shape[1]
+    transform = get_transform(transform_type, multi_arm=dim > 7)
+    for episode_index, states in enumerate(episodes_states):
+        path = os.path.join(root, DATA_PATH.format(episode_chunk=0, episode_index=episode_index))
+        actions = transform.pairs(states, np.concatenate([states[1:], states[-1:]])).astype(np.float32)
+        table = pq.read_table(path).drop(['observation.state'])
+        table = table.append_column('observation.state', pa.array(states.tolist(), type=pa.list_(pa.float32())))
+        table = table.append_column('action', pa.array(actions.tolist(), type=pa.list_(pa.float32())))
+        pq.write_table(table, path)
+
+    info = load_json(os.path.join(root, INFO_PATH))
+    for key in ['observation.state', 'action']:
+        info['features'][key] = {'dtype': 'float32', 'shape': [dim], 'names': None}
+    write_json(info, os.path.join(root, INFO_PATH))
+    write_episodes_stats(root, compute_dataset_stats(root))
+    return root
+
+
+def _load_dataset(root, action_offsets=None, state_offsets=None):
+    delta_timestamps = {}
+    if action_offsets is not None:
+        delta_timestamps['action'] = [i / 30 for i in action_offsets]
+    if state_offsets is not None:
+        delta_timestamps['observation.state'] = [i / 30 for i in state_offsets]
+    return LeRobotDataset('lerobot/pika_test', root=root, delta_timestamps=delta_timestamps or None)
+
+
+def test_transform_chunks_matches_transform_pairs():
+    rng = np.random.default_rng(0)
+    transform = get_transform('ee_delta_gripper', multi_arm=True)
+    states, actions = _random_states(rng, 12, 2).reshape(3, 4, 14), _random_states(rng, 12, 2).reshape(3, 4, 14)
+    expected = np.stack([[transform(state, action) for state, action in zip(*window)] for window in zip(states, actions)])
+    np.testing.assert_allclose(transform_chunks(transform, states, actions), expected, atol=1e-6)
+
+
+@pytest.mark.parametrize('transform_type', ['ee_delta_base', 'ee_delta_gripper'])
+@pytest.mark.parametrize('action_offsets, state_offsets', [(None, None), ([0, 1, 2, 3], None), ([0, 1, 2], [-1, 0])])
+def test_relative_actions_match_converted_dataset(tmp_path, transform_type, action_offsets, state_offsets):
+    rng = np.random.default_rng(1)
+    episodes_states = [_random_states(rng, 6), _random_states(rng, 4)]
+    absolute_root = _make_converted_dataset(tmp_path / 'absolute', episodes_states, 'ee_absolute')
+    relative_root = _make_converted_dataset(tmp_path / 'relative', episodes_states, transform_type)
+
+    dataset = RelativeActionDataset(_load_dataset(absolute_root, action_offsets, state_offsets), transform_type)
+    expected_dataset = _load_dataset(relative_root, action_offsets, state_offsets)
+    assert len(dataset) == len(expected_dataset) == 10
+    for idx in range(len(dataset)):
+        item, expected = dataset[idx], expected_dataset[idx]
+        assert set(item) == set(expected)
+        for key in ['action', 'observation.state', 'action_is_pad', 'observation.state_is_pad']:
+            if key in expected:
+                torch.testing.assert_close(item[key], expected[key], atol=1e-5, rtol=1e-5)
+
+    stats = dataset.meta.stats['action']
+    for name in ['mean', 'std', 'min', 'max']:
+        np.testing.assert_allclose(stats[name], expected_dataset.meta.stats['action'][name], atol=1e-5)
+
+
+def test_relative_actions_refuse_relative_dataset(tmp_path):
+    root = make_dataset(tmp_path / 'dataset', ['pick'], [(3, 0)])
+    info = load_json(os.path.join(root, INFO_PATH))
+    info['features']['action'] = {'dtype': 'float32', 'shape': [7], 'names': None}
+    write_json(info, os.path.join(root, INFO_PATH))
+    with pytest.raises(ValueError, match='ee_absolute'):
+        RelativeActionDataset(_load_dataset(root), 'ee_delta_gripper')
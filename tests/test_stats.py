@@ -0,0 +1,105 @@
+"""
+Tests of the streaming, mergeable stats engine and of the stats computed from the saved sketches.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from builders import DATA_PATH, make_dataset
+from src.data.misc.stats import (SKETCHES_PATH, FeatureStats, aggregate_stats, column_to_numpy, compute_dataset_stats,
+                                 load_sketches, save_sketches)
+from src.scripts.data.compute_stats import main as compute_stats_main
+
+
+def test_merged_stats_match_stats_of_all_frames():
+    rng = np.random.default_rng(0)
+    batches = [rng.normal(i, 1.0 + i, size=(n, 3)) for i, n in enumerate([7, 1, 20, 5])]
+    values = np.concatenate(batches)
+
+    merged = FeatureStats(sample_size=0)
+    for batch in batches:
+        merged.merge(FeatureStats(sample_size=0).update(batch))
+    stats = merged.to_dict()
+    np.testing.assert_allclose(stats['mean'], values.mean(axis=0))
+    np.testing.assert_allclose(stats['std'], values.std(axis=0))
+    np.testing.assert_array_equal(stats['min'], values.min(axis=0))
+    np.testing.assert_array_equal(stats['max'], values.max(axis=0))
+    assert stats['count'].tolist() == [len(values)]
+    assert merged.sample is None
+
+
+def test_image_stats_are_reduced_over_pixels():
+    rng = np.random.default_rng(1)
+    images = rng.random((4, 3, 8, 6))
+    stats = FeatureStats().update(images, axis=(0, 2, 3)).to_dict(quantiles=[0.5])
+    assert stats['mean'].shape == stats['q50'].shape == (3, 1, 1)
+    np.testing.assert_allclose(stats['mean'][:, 0, 0], images.mean(axis=(0, 2, 3)))
+    np.testing.assert_allclose(stats['std'][:, 0, 0], images.std(axis=(0, 2, 3)))
+    assert stats['count'].tolist() == [4]
+
+
+def test_sample_keeps_exact_quantiles_below_sample_size():
+    rng = np.random.default_rng(2)
+    batches = [rng.random((n, 2)) for n in [30, 50, 20]]
+    stats = aggregate_stats([{'action': FeatureStats(sample_size=100).update(batch)} for batch in batches])['action']
+    np.testing.assert_allclose(stats.quantile(0.25), np.quantile(np.concatenate(batches), 0.25, axis=0))
+
+    # beyond the sample size, the sample is a uniform subsample of all frames
+    stats = FeatureStats(sample_size=10).update(batches[0]).merge(FeatureStats(sample_size=10).update(batches[1]))
+    assert len(stats.sample) == 10
+    assert all(any(np.array_equal(row, other) for other in np.concatenate(batches[:2])) for row in stats.sample)
+
+
+def test_sketches_round_trip(tmp_path):
+    root = make_dataset(tmp_path / 'dataset', ['pick'], [(3, 0), (2, 0)])
+    episodes_stats = compute_dataset_stats(root)
+    path = os.path.join(root, SKETCHES_PATH)
+    save_sketches(path, episodes_stats)
+
+    loaded = load_sketches(path)
+    assert set(loaded) == {0, 1}
+    for episode_index, episode_stats in episodes_stats.items():
+        assert set(loaded[episode_index]) == set(episode_stats)
+        for key, feature_stats in episode_stats.items():
+            expected, actual = feature_stats.to_dict([0.5]), loaded[episode_index][key].to_dict([0.5])
+            assert set(actual) == set(expected)
+            for name in expected:
+                np.testing.assert_array_equal(actual[name], expected[name])
+
+    # the dataset stats aggregated from the episode sketches are the stats of the concatenated episodes
+    states = np.concatenate([
+        column_to_numpy(pq.read_table(os.path.join(root, DATA_PATH.format(episode_chunk=0, episode_index=i))).column(
+            'observation.state'), [2])
+        for i in range(2)])
+    stats = aggregate_stats(loaded.values())['observation.state'].to_dict()
+    np.testing.assert_allclose(stats['mean'], states.mean(axis=0))
+    np.testing.assert_allclose(stats['std'], states.std(axis=0))
+    assert stats['count'].tolist() == [5]
+
+
+def _compute_stats_from_sketches(root):
+    compute_stats_main(argparse.Namespace(dataset_root=root, from_sketches=True, num_workers=1, sample_size=1024,
+                                          quantiles=[0.5], write=False))
+
+
+def test_from_sketches_covering_the_dataset(tmp_path, capsys):
+    root = make_dataset(tmp_path / 'dataset', ['pick'], [(3, 0), (2, 0)])
+    save_sketches(os.path.join(root, SKETCHES_PATH), compute_dataset_stats(root))
+    _compute_stats_from_sketches(root)
+    output = capsys.readouterr().out
+    assert 'Stats of 2 episodes (5 frames)' in output
+    assert 'q50' in output
+
+
+def test_from_sketches_of_a_part_of_the_dataset(tmp_path, capsys):
+    # e.g. episodes appended by an incremental conversion after the sketches were saved
+    root = make_dataset(tmp_path / 'dataset', ['pick'], [(3, 0), (2, 0), (4, 0)])
+    episodes_stats = compute_dataset_stats(root)
+    save_sketches(os.path.join(root, SKETCHES_PATH), {0: episodes_stats[0], 1: episodes_stats[1]})
+    _compute_stats_from_sketches(root)
+    output = capsys.readouterr().out
+    assert 'cover 2 of the 3 episodes' in output
+    assert 'Stats of 3 episodes (9 frames)' in output
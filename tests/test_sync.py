@@ -0,0 +1,91 @@
+"""
+Tests of the synchronization of the streams of a raw Pika episode: the vectorized matches agree with a per-tick search,
+and the resampling interpolates positions linearly and rotations by SLERP.
+"""
+
+import numpy as np
+import pytest
+from scipy.spatial.transform import Rotation, Slerp
+
+from src.data.misc.sync import (build_reference_clock, get_euler_columns, interpolate_stream, match_timestamps,
+                                synchronize_streams)
+
+
+def _jittered_stream(rng, start, end, rate):
+    timestamps = np.arange(start, end, 1.0 / rate)
+    return np.sort(timestamps + rng.uniform(-0.2, 0.2, size=len(timestamps)) / rate)
+
+
+def test_match_timestamps_matches_per_tick_search():
+    rng = np.random.default_rng(0)
+    timestamps = _jittered_stream(rng, 0.0, 2.0, 125)
+    clock = rng.uniform(-0.1, 2.1, size=200)
+
+    indices, skews = match_timestamps(timestamps, clock, 'nearest')
+    np.testing.assert_array_equal(skews, [np.min(np.abs(timestamps - tick)) for tick in clock])
+    np.testing.assert_array_equal(skews, np.abs(clock - timestamps[indices]))
+
+    indices, _ = match_timestamps(timestamps, clock, 'previous')
+    expected = [max(np.flatnonzero(timestamps <= tick), default=0) for tick in clock]
+    np.testing.assert_array_equal(indices, expected)
+
+    with pytest.raises(ValueError, match='Unknown sync method'):
+        match_timestamps(timestamps, clock, 'linear')
+
+
+def test_build_reference_clock():
+    timestamps = {'camera': np.array([0.0, 0.5, 1.0, 1.5]), 'pose': np.array([0.2, 0.7, 1.2])}
+    np.testing.assert_allclose(build_reference_clock(timestamps, 10), 0.2 + np.arange(11) / 10)
+    np.testing.assert_array_equal(build_reference_clock(timestamps, 10, reference='camera'), [0.5, 1.0])
+
+    with pytest.raises(ValueError, match='do not overlap'):
+        build_reference_clock({'camera': np.array([0.0, 1.0]), 'pose': np.array([2.0, 3.0])}, 10)
+
+
+def test_synchronize_streams_drops_skewed_ticks():
+    rng = np.random.default_rng(1)
+    timestamps = {'camera': _jittered_stream(rng, 0.0, 2.0, 30), 'pose': _jittered_stream(rng, 0.0, 2.0, 125)}
+    # the pose stream drops out for 0.2 s
+    timestamps['pose'] = timestamps['pose'][(timestamps['pose'] < 0.9) | (timestamps['pose'] > 1.1)]
+
+    clock, indices = synchronize_streams(timestamps, 30, max_skew=0.02, reference='camera')
+    assert np.all((clock < 0.92) | (clock > 1.08))
+    for name, stream in timestamps.items():
+        assert len(indices[name]) == len(clock)
+        assert np.all(np.abs(stream[indices[name]] - clock) <= 0.02)
+    np.testing.assert_array_equal(timestamps['camera'][indices['camera']], clock)
+
+    with pytest.raises(ValueError, match='empty streams'):
+        synchronize_streams({'camera': timestamps['camera'], 'pose': np.array([])}, 30)
+
+
+def test_interpolate_stream_matches_linear_and_slerp():
+    rng = np.random.default_rng(2)
+    timestamps = np.sort(rng.uniform(0.0, 1.0, size=40))
+    eulers = Rotation.random(40, random_state=3).as_euler('xyz')
+    values = np.concatenate([rng.normal(size=(40, 3)), eulers, rng.uniform(size=(40, 1))], axis=1)
+    keys = ['x', 'y', 'z', 'roll', 'pitch', 'yaw', 'gripper']
+    clock = np.linspace(timestamps[0], timestamps[-1], 90)
+
+    outputs = interpolate_stream(timestamps, values, clock, get_euler_columns(keys))
+    for column in [0, 1, 2, 6]:
+        np.testing.assert_allclose(outputs[:, column], np.interp(clock, timestamps, values[:, column]))
+    expected = Slerp(timestamps, Rotation.from_euler('xyz', eulers))(clock)
+    np.testing.assert_allclose((Rotation.from_euler('xyz', outputs[:, 3:6]) * expected.inv()).magnitude(), 0.0, atol=1e-7)
+
+    # ticks outside of the stream are clamped, and without Euler columns every column is linear
+    outputs = interpolate_stream(timestamps, values, np.array([-1.0, 2.0]))
+    np.testing.assert_allclose(outputs, values[[0, -1]])
+
+
+def test_interpolate_stream_across_angle_wrap():
+    timestamps = np.array([0.0, 1.0])
+    values = np.array([[0.0, 0.0, np.pi - 0.1], [0.0, 0.0, -np.pi + 0.1]])
+    outputs = interpolate_stream(timestamps, values, np.array([0.5]), [0, 1, 2])
+    # the yaw goes the short way through pi instead of through 0
+    assert np.isclose(abs(outputs[0, 2]), np.pi)
+
+
+def test_get_euler_columns():
+    assert get_euler_columns(['yaw', 'x', 'roll', 'pitch']) == [2, 3, 0]
+    assert get_euler_columns(['x', 'roll', 'pitch']) is None
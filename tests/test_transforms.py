@@ -0,0 +1,32 @@
+"""
+Tests of the vectorized end effector transforms: the batched actions of an episode match the per-pair transforms.
+"""
+
+import numpy as np
+import pytest
+
+from src.data.misc.transforms import get_transform
+
+
+def _random_states(rng, num_frames, num_arms):
+    arms = []
+    for _ in range(num_arms):
+        pos = rng.uniform(-1.0, 1.0, size=(num_frames, 3))
+        euler = rng.uniform(-np.pi / 2, np.pi / 2, size=(num_frames, 3))
+        gripper = rng.uniform(0.0, 1.0, size=(num_frames, 1))
+        arms.append(np.concatenate((pos, euler, gripper), axis=1))
+    return np.concatenate(arms, axis=1)
+
+
+@pytest.mark.parametrize('transform_type', ['ee_absolute', 'ee_delta_base', 'ee_delta_gripper'])
+@pytest.mark.parametrize('multi_arm', [False, True])
+def test_batch_matches_per_pair_transform(transform_type, multi_arm):
+    rng = np.random.default_rng(0)
+    states = _random_states(rng, 16, 2 if multi_arm else 1)
+    transform = get_transform(transform_type, multi_arm=multi_arm)
+
+    expected = np.stack([transform(states[i], states[i + 1]) for i in range(len(states) - 1)])
+    actions = transform.batch(states)
+    assert actions.shape == expected.shape == (15, states.shape[1])
+    np.testing.assert_allclose(actions, expected, atol=1e-9)
+
@@ -0,0 +1,89 @@
+"""
+Tests of the validation of raw Pika episodes from their listings, for `check_only` mode.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from builders import make_pika_config
+from src.data.misc.synthetic import generate_synthetic_dataset
+from src.data.misc.topics import get_topic_dirs
+from src.data.misc.validate import parse_statistic, scan_topic, validate_episode, validate_episodes
+
+
+def _generate(tmp_path, num_episodes):
+    source_data_root = str(tmp_path / 'source')
+    config = make_pika_config(source_data_root, tmp_path / 'output')
+    generate_synthetic_dataset(source_data_root, num_episodes, config, num_frames=30, drop_rate=0.0, write_sync=True)
+    return config, [os.path.join(source_data_root, f'episode{i}') for i in range(num_episodes)]
+
+
+def _issue_types(report):
+    return sorted((issue['type'], issue['topic']) for issue in report['issues'])
+
+
+def test_scan_topic_and_statistic(tmp_path):
+    config, (episode_path,) = _generate(tmp_path, 1)
+    topic_dir = config.action_dirs[0]
+
+    filenames, timestamps, sync = scan_topic(os.path.join(episode_path, topic_dir), ('.json',))
+    assert filenames == {name for name in os.listdir(os.path.join(episode_path, topic_dir)) if name.endswith('.json')}
+    np.testing.assert_array_equal(timestamps, sorted(float(os.path.splitext(name)[0]) for name in filenames))
+    assert set(sync) <= filenames
+
+    statistic = parse_statistic(os.path.join(episode_path, 'statistic.txt'))
+    assert statistic['topics'][topic_dir]['count'] == len(filenames)
+    assert parse_statistic(os.path.join(episode_path, 'missing.txt')) is None
+
+
+def test_validate_episode_reports_issues(tmp_path):
+    config, episode_paths = _generate(tmp_path, 2)
+    topic_dirs = get_topic_dirs(config)
+    report = validate_episode(episode_paths[0], topic_dirs, config.fps)
+    assert report['ok'], report['issues']
+    assert set(report['topics']) == set(topic_dirs)
+
+    # a frame listed in `sync.txt` is lost, the instructions are missing and a topic was not recorded
+    episode_path = episode_paths[1]
+    rgb_dir, action_dir = config.rgb_dirs[0], config.action_dirs[0]
+    with open(os.path.join(episode_path, action_dir, 'sync.txt')) as f:
+        os.remove(os.path.join(episode_path, action_dir, f.readline().strip()))
+    os.remove(os.path.join(episode_path, 'instructions.json'))
+    for filename in os.listdir(os.path.join(episode_path, rgb_dir)):
+        os.remove(os.path.join(episode_path, rgb_dir, filename))
+
+    report = validate_episode(episode_path, topic_dirs, config.fps)
+    assert not report['ok']
+    assert _issue_types(report) == [('count_mismatch', action_dir), ('missing_files', action_dir),
+                                    ('missing_instructions', None), ('missing_topic', rgb_dir)]
+
+
+def test_validate_episode_reports_gaps_and_low_rates(tmp_path):
+    config, (episode_path,) = _generate(tmp_path, 1)
+    rgb_dir = config.rgb_dirs[0]
+    topic_dirs = {rgb_dir: ('.jpg',)}
+    filenames = sorted(name for name in os.listdir(os.path.join(episode_path, rgb_dir)) if name.endswith('.jpg'))
+    for filename in filenames[10:20]:
+        os.remove(os.path.join(episode_path, rgb_dir, filename))
+    os.remove(os.path.join(episode_path, 'statistic.txt'))
+    os.remove(os.path.join(episode_path, rgb_dir, 'sync.txt'))
+
+    report = validate_episode(episode_path, topic_dirs, config.fps, max_gap=0.1)
+    assert _issue_types(report) == [('low_rate', rgb_dir), ('timestamp_gap', rgb_dir)]
+    gap = next(issue for issue in report['issues'] if issue['type'] == 'timestamp_gap')
+    assert gap['num_gaps'] == 1 and 0.3 < gap['max_gap'] < 0.4
+
+
+def test_validate_episodes_writes_report(tmp_path, capsys):
+    config, episode_paths = _generate(tmp_path, 3)
+    os.remove(os.path.join(episode_paths[2], 'instructions.json'))
+    report_path = str(tmp_path / 'report.jsonl')
+
+    reports = validate_episodes(episode_paths, config, num_workers=2, report_path=report_path)
+    assert [report['episode'] for report in reports] == episode_paths
+    assert [report['ok'] for report in reports] == [True, True, False]
+    with open(report_path) as f:
+        assert [json.loads(line) for line in f] == reports
+    assert "1 with issues {'missing_instructions': 1}" in capsys.readouterr().out
@@ -0,0 +1,68 @@
+"""
+Tests of the control-mode variants of a converted dataset, built from the actions of its extra transforms.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from builders import DATA_PATH, make_dataset, read_episode
+from src.data.misc.layout import EPISODES_STATS_PATH, INFO_PATH, load_json, load_jsonlines
+from src.data.misc.variants import build_variant_dataset, get_variant_actions_path, get_variant_root, write_variant_actions
+
+
+ACTION_KEY = 'observation.state'
+
+
+def _make_converted_dataset(root, lengths, with_actions=None):
+    root = make_dataset(root, ['pick'], [(length, 0) for length in lengths])
+    actions = []
+    for episode_index, length in enumerate(lengths):
+        actions.append(np.arange(length * 2, dtype=np.float32).reshape(length, 2) + 100 * episode_index)
+        if with_actions is None or episode_index in with_actions:
+            write_variant_actions(os.path.join(root, get_variant_actions_path(episode_index)), {'ee_delta_base': actions[-1]})
+    return root, actions
+
+
+def _check_variant(variant_root, actions):
+    assert load_json(os.path.join(variant_root, INFO_PATH))['total_episodes'] == len(actions)
+    episodes_stats = load_jsonlines(os.path.join(variant_root, EPISODES_STATS_PATH))
+    assert [item['episode_index'] for item in episodes_stats] == list(range(len(actions)))
+    for episode_index, expected in enumerate(actions):
+        np.testing.assert_allclose(read_episode(variant_root, episode_index)[ACTION_KEY], expected)
+        np.testing.assert_allclose(episodes_stats[episode_index]['stats'][ACTION_KEY]['mean'], expected.mean(axis=0))
+
+
+def test_build_variant_dataset(tmp_path):
+    root, actions = _make_converted_dataset(tmp_path / 'pika', [3, 2])
+    variant_root = get_variant_root(root, 'ee_delta_base')
+    assert build_variant_dataset(root, variant_root, 'ee_delta_base', ACTION_KEY) == 2
+    _check_variant(variant_root, actions)
+    # the other columns are the ones of the dataset
+    assert read_episode(variant_root, 1)['index'] == read_episode(root, 1)['index']
+
+
+def test_append_to_variant_dataset(tmp_path):
+    root, _ = _make_converted_dataset(tmp_path / 'pika', [3, 2])
+    variant_root = get_variant_root(root, 'ee_delta_base')
+    build_variant_dataset(root, variant_root, 'ee_delta_base', ACTION_KEY)
+    first_path = os.path.join(variant_root, DATA_PATH.format(episode_chunk=0, episode_index=0))
+    first_mtime = os.stat(first_path).st_mtime_ns
+
+    # an incremental conversion appends an episode to the dataset
+    root, actions = _make_converted_dataset(tmp_path / 'pika', [3, 2, 4])
+    assert build_variant_dataset(root, variant_root, 'ee_delta_base', ACTION_KEY, append=True) == 1
+    _check_variant(variant_root, actions)
+    assert os.stat(first_path).st_mtime_ns == first_mtime
+
+    # a variant that does not match the dataset is rebuilt
+    root, actions = _make_converted_dataset(tmp_path / 'pika', [5, 2, 4])
+    assert build_variant_dataset(root, variant_root, 'ee_delta_base', ACTION_KEY, append=True) == 3
+    _check_variant(variant_root, actions)
+
+
+def test_variant_of_episodes_without_actions(tmp_path):
+    root, _ = _make_converted_dataset(tmp_path / 'pika', [3, 2, 4], with_actions=[2])
+    with pytest.raises(ValueError, match=r'Episodes \[0, 1\]'):
+        build_variant_dataset(root, get_variant_root(root, 'ee_delta_base'), 'ee_delta_base', ACTION_KEY)